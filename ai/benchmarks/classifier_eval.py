@@ -0,0 +1,112 @@
+"""Offline evaluation of the local category classifier.
+
+Uses the (product name, LLM category) pairs recorded in CACHE_DB_PATH. Every
+fifth sample is held out; the model is trained on the seed keywords plus the
+rest and scored on the held-out names. Until enough traffic has been recorded
+it scores the seed-only model on PROBES, hand-labelled seller names that
+include products outside every category (expected: no local answer).
+
+--sweep prints coverage and agreement for a range of thresholds. Pick
+CLASSIFIER_THRESHOLD with some margin above the point where local answers
+start to disagree with the labels: the probes stay at 100% down to 0.5, and
+0.8 still answers about 60% of them locally.
+
+    uv run python -m benchmarks.classifier_eval [--threshold 0.8] [--sweep]
+"""
+
+import argparse
+import statistics
+import time
+
+from config import settings
+from services import category_classifier
+
+SWEEP = (0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95, 0.99)
+
+PROBES: dict[str, list[tuple[str, str | None]]] = {
+    "describe": [
+        ("handwoven cotton saree", "Weaving"), ("pashmina shawl", "Weaving"), ("silk ikat dupatta", "Weaving"),
+        ("terracotta flower pot", "Pottery"), ("clay water matka", "Pottery"), ("ceramic coffee mug", "Pottery"), ("earthen diya set", "Pottery"),
+        ("chikankari embroidered kurta", "Embroidery"), ("phulkari embroidered dupatta", "Embroidery"), ("kantha quilt", "Embroidery"),
+        ("organic turmeric powder", "Food"), ("homemade mango pickle", "Food"), ("wild forest honey", "Food"), ("desi cow ghee", "Food"), ("ragi millet flour", "Food"),
+        ("oxidised silver earrings", "Jewellery"), ("beaded tribal necklace", "Jewellery"), ("brass bangles", "Jewellery"),
+        ("madhubani painting on canvas", "Painting"), ("warli art wall hanging", "Painting"), ("gond art painting", "Painting"),
+        ("bamboo fruit basket", "Basket Weaving"), ("cane storage basket", "Basket Weaving"), ("wicker picnic hamper", "Basket Weaving"),
+        ("cotton kurti", "Tailoring"), ("stitched silk blouse", "Tailoring"), ("girls frock", "Tailoring"),
+        ("steel water bottle", None), ("mobile phone cover", None), ("plastic chair", None), ("laptop stand", None),
+        ("led bulb", None), ("bluetooth speaker", None), ("steel lunch box", None), ("running shoes", None),
+    ],
+    "detect": [
+        ("handmade wall hanging", "handicraft"), ("decorative toran", "handicraft"),
+        ("cotton bedsheet", "textile"), ("printed kurta", "textile"),
+        ("terracotta flower pot", "pottery"), ("ceramic coffee mug", "pottery"), ("clay kulhad", "pottery"),
+        ("silver earrings", "jewelry"), ("beaded necklace", "jewelry"), ("brass bangles", "jewelry"),
+        ("basmati rice", "food_grain"), ("ragi flour", "food_grain"), ("turmeric powder", "spice"), ("red chilli powder", "spice"),
+        ("mango pickle", "pickle"), ("lemon achar", "pickle"), ("cold pressed mustard oil", "oil"), ("virgin coconut oil", "oil"),
+        ("bamboo fruit basket", "basket_weaving"), ("wicker basket", "basket_weaving"), ("chikankari embroidered kurta", "embroidery"),
+        ("kolhapuri chappal", "leather_craft"), ("leather wallet", "leather_craft"), ("brass diya lamp", "metal_craft"), ("copper water bottle", "metal_craft"),
+        ("channapatna wooden toy", "wood_craft"), ("wooden spoon set", "wood_craft"), ("bamboo table lamp", "bamboo_craft"),
+        ("jute shopping bag", "jute_product"), ("jute doormat", "jute_product"), ("raw forest honey", "honey"), ("desi ghee", "dairy_product"), ("fresh paneer", "dairy_product"),
+        ("organic vegetables box", "organic_produce"), ("neem herbal soap", "herbal_product"), ("amla hair oil", "herbal_product"),
+        ("handloom saree", "handloom"), ("khadi handwoven fabric", "handloom"),
+        ("steel water bottle", None), ("mobile phone cover", None), ("plastic chair", None), ("laptop stand", None),
+        ("led bulb", None), ("bluetooth speaker", None), ("steel lunch box", None), ("running shoes", None),
+    ],
+}
+
+
+def _score(predictions: list[tuple[str | None, float, str | None]], threshold: float) -> tuple[float, float | None]:
+    """(coverage, agreement when answered locally) at `threshold`."""
+    answered = [(predicted, expected) for predicted, confidence, expected in predictions
+                if predicted is not None and confidence >= threshold]
+    agreement = sum(p == e for p, e in answered) / len(answered) if answered else None
+    return len(answered) / len(predictions), agreement
+
+
+def evaluate(label_set: str, threshold: float, sweep: bool) -> None:
+    samples = category_classifier.load_samples(label_set)
+    if len(samples) >= 5:
+        test = samples[::5]
+        train = [sample for i, sample in enumerate(samples) if i % 5]
+        model = category_classifier.train(label_set, [(text, category) for text, category, _ in train])
+        source = f"{len(train)} train / {len(test)} held out"
+    else:
+        test = [(text, category, None) for text, category in PROBES[label_set]]
+        model = category_classifier.train(label_set, samples=[])
+        source = f"only {len(samples)} recorded samples; seed model on {len(test)} probe names"
+
+    started = time.perf_counter()
+    predictions = [(*model.predict(text), category) for text, category, _ in test]
+    predict_us = (time.perf_counter() - started) / len(test) * 1e6
+
+    agree = sum(predicted == category for predicted, _, category in predictions)
+    coverage, covered_agree = _score(predictions, threshold)
+    llm_ms = [ms for _, _, ms in samples if ms]
+    avg_llm_ms = statistics.mean(llm_ms) if llm_ms else None
+
+    print(f"[{label_set}] {source}, threshold {threshold}")
+    print(f"  agreement with labels (all):     {agree / len(test):.1%}")
+    print(f"  answered locally (coverage):     {coverage:.1%}")
+    print(f"  agreement when answered locally: {covered_agree:.1%}" if covered_agree is not None else "  agreement when answered locally: n/a")
+    print(f"  local latency:                   {predict_us:.0f} us/prediction")
+    if avg_llm_ms is not None:
+        print(f"  mean LLM latency:                {avg_llm_ms:.0f} ms")
+        print(f"  est. LLM time saved per request: {coverage * avg_llm_ms:.0f} ms")
+    if sweep:
+        print("  threshold  coverage  agreement")
+        for value in SWEEP:
+            coverage, covered_agree = _score(predictions, value)
+            print(f"  {value:9.2f}  {coverage:8.1%}  " + (f"{covered_agree:9.1%}" if covered_agree is not None else "      n/a"))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threshold", type=float, default=settings.classifier_threshold)
+    parser.add_argument("--sweep", action="store_true", help="Report coverage/agreement across thresholds")
+    args = parser.parse_args()
+    for label_set in category_classifier.SEEDS:
+        evaluate(label_set, args.threshold, args.sweep)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Compare inline vs process-pool execution of the CPU-heavy request stages.
+
+For each stage and input size this reports the wall time of the call and the
+longest event-loop stall observed while it ran (measured by a 1 ms ticker).
+
+    uv run python -m benchmarks.cpu_offload
+"""
+
+import asyncio
+import json
+import os
+import time
+
+from config import settings
+from scrapers.marketplace import _extract_prices_from_snippets
+from scrapers.web_search import _extract_text
+from services import cpu_pool
+from services.object_detection import _to_data_url
+
+
+def _html(size: int) -> str:
+    block = (
+        "<div class='item'><h2>Handwoven jute bag</h2><p>Price ₹1,299. Natural fibre, "
+        "handmade by artisans.</p><script>var x = 1;</script></div>\n"
+    )
+    return "<html><body><nav>menu</nav>" + block * (size // len(block)) + "</body></html>"
+
+
+def _snippets(size: int) -> list[dict]:
+    item = {"title": "Jute bag ₹499 - Amazon.in", "url": "https://www.amazon.in/x", "snippet": "Buy now at ₹499. " * 4}
+    return [dict(item) for _ in range(size // 120)]
+
+
+def _tool_result(size: int) -> dict:
+    listing = {"title": "Handloom cotton saree", "price_inr": 1499.0, "source": "flipkart"}
+    return {"product": "saree", "listings": [dict(listing) for _ in range(size // 70)]}
+
+
+STAGES = {
+    "html_extract": (lambda n: (_html(n), 3000), _extract_text),
+    "image_base64": (lambda n: (os.urandom(n),), _to_data_url),
+    "price_regex": (lambda n: (_snippets(n),), _extract_prices_from_snippets),
+    "json_dumps": (lambda n: (_tool_result(n),), json.dumps),
+}
+SIZES = [64 * 1024, 1024 * 1024, 8 * 1024 * 1024]
+
+
+async def _measure(stage: str, fn, args, size: int) -> tuple[float, float]:
+    stall = 0.0
+    running = True
+
+    async def ticker():
+        nonlocal stall
+        last = time.perf_counter()
+        while running:
+            await asyncio.sleep(0.001)
+            now = time.perf_counter()
+            stall = max(stall, now - last - 0.001)
+            last = now
+
+    tick = asyncio.create_task(ticker())
+    await asyncio.sleep(0.01)
+    started = time.perf_counter()
+    await cpu_pool.run(stage, fn, *args, size=size)
+    elapsed = time.perf_counter() - started
+    running = False
+    await tick
+    return elapsed * 1000, stall * 1000
+
+
+async def main() -> None:
+    settings.cpu_offload_min_bytes = 0
+    settings.cpu_offload_stage_min_bytes = {}
+    cpu_pool.start()
+    # warm the workers so process start-up is not counted
+    for name, (make_args, fn) in STAGES.items():
+        await cpu_pool.run(name, fn, *make_args(1024), size=1024)
+
+    print(f"{'stage':<14}{'size':>8}  {'inline ms':>10}{'stall ms':>10}  {'pool ms':>10}{'stall ms':>10}")
+    for name, (make_args, fn) in STAGES.items():
+        for size in SIZES:
+            args = make_args(size)
+            pool = cpu_pool._pool
+            cpu_pool._pool = None
+            inline = await _measure(name, fn, args, size)
+            cpu_pool._pool = pool
+            offloaded = await _measure(name, fn, args, size)
+            print(
+                f"{name:<14}{size // 1024:>6}KB  {inline[0]:>10.1f}{inline[1]:>10.1f}"
+                f"  {offloaded[0]:>10.1f}{offloaded[1]:>10.1f}"
+            )
+    cpu_pool.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
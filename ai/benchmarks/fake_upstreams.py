@@ -0,0 +1,221 @@
+"""Local stand-ins for OpenRouter and for web search / page fetching.
+
+`llm_app` speaks the OpenAI chat-completions API (plain and streaming) and
+answers from a script keyed on the request: describe/detect prompts get the
+JSON they ask for, agent calls with tools get one round of tool_calls (every
+offered tool, with arguments filled from its schema) followed by a final
+analysis. Latency is a time-to-first-token plus a per-chunk delay.
+
+`search_app` serves a SearxNG-style JSON search API whose results link back
+to its own HTML pages (with prices and ETags) and a suggestion endpoint.
+
+Used by benchmarks.load_test; each can also be run on its own:
+
+    uv run python -m benchmarks.fake_upstreams llm --port 9101
+    uv run python -m benchmarks.fake_upstreams search --port 9102
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import re
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import HTMLResponse, StreamingResponse
+
+LLM_LATENCY = {"ttft": 0.4, "chunk_delay": 0.01, "chunks": 40}
+SEARCH_LATENCY = {"search": 0.15, "page": 0.1, "suggest": 0.05}
+
+ANALYSIS = (
+    "SUGGESTED_PRICE: ₹450\nDEMAND_SCORE: 72/100\n"
+    "Handmade listings on Amazon.in and Flipkart sit between ₹350 and ₹600; "
+    "pricing at ₹450 keeps a healthy margin after platform fees and shipping. "
+)
+
+llm_app = FastAPI(title="Fake OpenRouter")
+search_app = FastAPI(title="Fake search")
+
+
+# --- LLM -----------------------------------------------------------------------------
+
+
+def _text(content) -> str:
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content or ""
+
+
+def _tool_args(tool: dict, page_url: str) -> dict:
+    schema = tool["function"].get("parameters", {})
+    args = {}
+    for name in schema.get("required", []):
+        kind = schema.get("properties", {}).get(name, {}).get("type")
+        if name == "url":
+            args[name] = page_url
+        elif kind in ("number", "integer"):
+            args[name] = 250 if "cost" in name else 450
+        else:
+            args[name] = "handwoven jute bag"
+    return args
+
+
+def _script(body: dict) -> dict:
+    """{"content": str} or {"tool_calls": [...]} for one request."""
+    messages = body.get("messages", [])
+    system = _text(messages[0].get("content")) if messages else ""
+    user = _text(messages[-1].get("content")) if messages else ""
+
+    if body.get("tools") and not any(m.get("role") == "tool" for m in messages):
+        page_url = llm_app.state.page_url
+        return {"tool_calls": [
+            {
+                "id": f"call_{i}",
+                "type": "function",
+                "function": {"name": tool["function"]["name"], "arguments": json.dumps(_tool_args(tool, page_url))},
+            }
+            for i, tool in enumerate(body["tools"])
+        ]}
+    if '"images"' in system:
+        count = len(re.findall(r"Image \d+", user)) or 1
+        entry = {"products": [{"name": "Jute bag", "category": "bags", "confidence": 0.9}], "suggested_categories": ["bags"]}
+        return {"content": json.dumps({"images": [{"image": i, **entry} for i in range(count)]})}
+    if '"products"' in system:
+        return {"content": json.dumps({
+            "products": [{"name": "Jute bag", "category": "bags", "confidence": 0.9}],
+            "suggested_categories": ["bags"],
+        })}
+    if "JSON array" in system:
+        ids = [int(n) for n in re.findall(r"^(\d+)[.:)]", user, re.MULTILINE)] or [0]
+        return {"content": json.dumps([
+            {"id": i, "description": "Handmade jute bag woven from natural fibre.", "category": "Weaving"} for i in ids
+        ])}
+    if '"description"' in system:
+        return {"content": json.dumps({"description": "Handmade jute bag woven from natural fibre.", "category": "Weaving"})}
+    return {"content": ANALYSIS * 3}
+
+
+def _usage(body: dict, completion_tokens: int) -> dict:
+    prompt_tokens = len(json.dumps(body.get("messages", []))) // 4
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+
+
+def _pieces(content: str, chunks: int) -> list[str]:
+    size = max(1, len(content) // max(1, chunks))
+    return [content[i:i + size] for i in range(0, len(content), size)]
+
+
+async def _stream(body: dict, reply: dict):
+    base = {"id": f"chatcmpl-{uuid.uuid4().hex[:12]}", "object": "chat.completion.chunk", "created": int(time.time()), "model": body["model"]}
+
+    def chunk(delta: dict, finish: str | None = None) -> str:
+        return f"data: {json.dumps({**base, 'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish}]})}\n\n"
+
+    await asyncio.sleep(LLM_LATENCY["ttft"])
+    if "tool_calls" in reply:
+        for i, call in enumerate(reply["tool_calls"]):
+            yield chunk({"role": "assistant", "tool_calls": [{"index": i, **call}]})
+        yield chunk({}, "tool_calls")
+        completion_tokens = 20 * len(reply["tool_calls"])
+    else:
+        pieces = _pieces(reply["content"], LLM_LATENCY["chunks"])
+        for piece in pieces:
+            yield chunk({"content": piece})
+            await asyncio.sleep(LLM_LATENCY["chunk_delay"])
+        yield chunk({}, "stop")
+        completion_tokens = len(reply["content"]) // 4
+    if (body.get("stream_options") or {}).get("include_usage"):
+        yield f"data: {json.dumps({**base, 'choices': [], 'usage': _usage(body, completion_tokens)})}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+@llm_app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    reply = _script(body)
+    if body.get("stream"):
+        return StreamingResponse(_stream(body, reply), media_type="text/event-stream")
+
+    calls = reply.get("tool_calls")
+    chunks = 1 if calls else len(_pieces(reply["content"], LLM_LATENCY["chunks"]))
+    await asyncio.sleep(LLM_LATENCY["ttft"] + chunks * LLM_LATENCY["chunk_delay"])
+    message = {"role": "assistant", "content": reply.get("content"), **({"tool_calls": calls} if calls else {})}
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body["model"],
+        "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if calls else "stop"}],
+        "usage": _usage(body, 20 * len(calls) if calls else len(reply["content"]) // 4),
+    }
+
+
+# --- Search / pages ------------------------------------------------------------------
+
+SOURCES = ["amazon.in", "flipkart.com", "indiamart.com", "meesho.com", "jiomart.com"]
+
+
+def _seed(text: str) -> int:
+    return int(hashlib.sha1(text.encode()).hexdigest()[:8], 16)
+
+
+@search_app.get("/search")
+async def search(request: Request, q: str):
+    await asyncio.sleep(SEARCH_LATENCY["search"])
+    seed = _seed(q)
+    base = str(request.base_url).rstrip("/")
+    site = re.search(r"site:(\S+)", q)
+    results = []
+    for i in range(10):
+        source = site.group(1) if site else SOURCES[(seed + i) % len(SOURCES)]
+        price = 150 + (seed >> i) % 1500
+        results.append({
+            "title": f"{q.split(' site:')[0].title()} - {source} listing {i + 1}",
+            "url": f"{base}/page/{seed % 10_000}-{i}?source={source}",
+            "content": f"Buy online at ₹{price:,}. Handmade, free delivery.",
+        })
+    return {"query": q, "results": results}
+
+
+@search_app.get("/page/{page_id}")
+async def page(request: Request, page_id: str):
+    etag = f'"{page_id}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    await asyncio.sleep(SEARCH_LATENCY["page"])
+    price = 150 + _seed(page_id) % 1500
+    block = f"<div class='item'><h2>Handwoven jute bag</h2><p>Price ₹{price:,}. Natural fibre.</p></div>\n"
+    html = f"<html><head><title>Listing {page_id}</title></head><body>{block * 40}</body></html>"
+    return HTMLResponse(html, headers={"ETag": etag})
+
+
+@search_app.get("/complete/search")
+async def suggest(q: str):
+    await asyncio.sleep(SEARCH_LATENCY["suggest"])
+    return [q, [f"{q} {suffix}" for suffix in ("price", "online", "handmade", "wholesale", "near me", "design")]]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("which", choices=["llm", "search"])
+    parser.add_argument("--port", type=int, required=True)
+    parser.add_argument("--page-url", default="http://127.0.0.1:9102/page/tool-0", help="URL the fake LLM passes to fetch_page")
+    parser.add_argument("--ttft", type=float, default=LLM_LATENCY["ttft"], help="LLM time to first token (s)")
+    parser.add_argument("--chunk-delay", type=float, default=LLM_LATENCY["chunk_delay"], help="Delay between streamed chunks (s)")
+    parser.add_argument("--chunks", type=int, default=LLM_LATENCY["chunks"], help="Chunks per streamed answer")
+    parser.add_argument("--search-latency", type=float, default=SEARCH_LATENCY["search"])
+    parser.add_argument("--page-latency", type=float, default=SEARCH_LATENCY["page"])
+    args = parser.parse_args()
+
+    LLM_LATENCY.update(ttft=args.ttft, chunk_delay=args.chunk_delay, chunks=args.chunks)
+    SEARCH_LATENCY.update(search=args.search_latency, page=args.page_latency)
+    llm_app.state.page_url = args.page_url
+    app = llm_app if args.which == "llm" else search_app
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Import-time budget for the app (`python -X importtime -c "import main"`).
+
+Imports `main` in fresh interpreters, takes the fastest of --runs, and prints
+the slowest modules. Exits 1 when the import takes longer than --budget-ms
+or when a dependency that is meant to load lazily (openai, ddgs, selectolax,
+fake_useragent, pandas) is imported eagerly, so CI can fail on startup
+regressions. tests/test_import_time.py runs the same check under pytest.
+
+    uv run python -m benchmarks.import_time
+    uv run python -m benchmarks.import_time --budget-ms 1200 --top 20
+"""
+
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+
+AI_DIR = Path(__file__).resolve().parent.parent
+
+LAZY = ("openai", "ddgs", "selectolax", "fake_useragent", "pandas")
+BUDGET_MS = 1500.0
+
+
+def _importtime() -> dict[str, tuple[int, int]]:
+    """Module -> (self µs, cumulative µs) for one `import main` in a fresh interpreter."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=AI_DIR, capture_output=True, text=True, check=True,
+    )
+    modules = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(own), int(cumulative))
+    return modules
+
+
+def check(budget_ms: float = BUDGET_MS, runs: int = 3) -> tuple[dict[str, tuple[int, int]], list[str]]:
+    """Fastest of `runs` imports, and what is wrong with it (empty when within budget)."""
+    best = min((_importtime() for _ in range(runs)), key=lambda modules: modules["main"][1])
+    total_ms = best["main"][1] / 1000
+    failures = []
+    if total_ms > budget_ms:
+        failures.append(f"import main took {total_ms:.0f} ms, over the {budget_ms:.0f} ms budget")
+    eager = [name for name in LAZY if name in best]
+    if eager:
+        failures.append(f"imported at startup but meant to load lazily: {', '.join(eager)}")
+    return best, failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Check the app's import time against a budget")
+    parser.add_argument("--budget-ms", type=float, default=BUDGET_MS, help="Max milliseconds for `import main`")
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters; the fastest run counts")
+    parser.add_argument("--top", type=int, default=15, help="Slowest modules to list (by own time)")
+    args = parser.parse_args()
+
+    best, failures = check(args.budget_ms, args.runs)
+    total_ms = best["main"][1] / 1000
+
+    print(f"import main: {total_ms:.0f} ms (best of {args.runs}, budget {args.budget_ms:.0f} ms)\n")
+    print(f"{'own ms':>8}{'cumul ms':>10}  module")
+    for name, (own, cumulative) in sorted(best.items(), key=lambda item: item[1][0], reverse=True)[: args.top]:
+        print(f"{own / 1000:>8.1f}{cumulative / 1000:>10.1f}  {name}")
+
+    for failure in failures:
+        print(f"\nFAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
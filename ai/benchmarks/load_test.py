@@ -0,0 +1,311 @@
+"""Offline load test: throughput and latency per endpoint against local stand-ins.
+
+Starts the fake LLM and search servers (benchmarks.fake_upstreams) and the
+service itself in subprocesses, pointed at each other through env vars, then
+drives each scenario with `--concurrency` closed-loop clients until
+`--requests` have completed. Stream scenarios also report time to first
+event. Product names vary per request so result caches do not hide the work.
+
+With --cassette the service instead replays a recording of real traffic
+(services/cassette.py), so agent loops keep production's tool calls, result
+sizes and (scaled) upstream timings.
+
+Results are written to benchmarks/results/<UTC time>-<git rev>.json and
+compared with the previous run there (or --baseline); throughput drops and
+latency increases beyond --threshold are flagged.
+
+    uv run python -m benchmarks.load_test
+    uv run python -m benchmarks.load_test --scenarios pricing,describe --concurrency 16 --requests 200
+    uv run python -m benchmarks.load_test --cassette cassettes/prod.jsonl --time-scale 0.5
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+from PIL import Image
+
+AI_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = AI_DIR / "benchmarks" / "results"
+
+PRODUCTS = ["handwoven jute bag", "terracotta vase", "kantha stitch dupatta", "mango pickle", "brass earrings",
+            "madhubani painting", "bamboo basket", "block print kurta"]
+
+
+def _product(i: int) -> str:
+    return f"{PRODUCTS[i % len(PRODUCTS)]} {i}"
+
+
+def _image(i: int) -> bytes:
+    rng = random.Random(i)
+    image = Image.new("RGB", (256, 256), tuple(rng.randrange(256) for _ in range(3)))
+    for _ in range(12):
+        x, y = rng.randrange(224), rng.randrange(224)
+        image.paste(tuple(rng.randrange(256) for _ in range(3)), (x, y, x + 32, y + 32))
+    out = io.BytesIO()
+    image.save(out, format="JPEG")
+    return out.getvalue()
+
+
+# name -> (method, path, request kwargs for request i, stream)
+SCENARIOS = {
+    "pricing": ("POST", "/api/pricing/", lambda i: {"json": {"product_name": _product(i), "cost_price": 250}}, False),
+    "pricing_stream": ("POST", "/api/pricing/stream", lambda i: {"json": {"product_name": _product(i), "cost_price": 250}}, True),
+    "demand": ("POST", "/api/demand/", lambda i: {"json": {"product_name": _product(i)}}, False),
+    "demand_stream": ("POST", "/api/demand/stream", lambda i: {"json": {"product_name": _product(i)}}, True),
+    "describe": ("POST", "/api/describe/", lambda i: {"json": {"product_name": _product(i)}}, False),
+    "detect": ("POST", "/api/detect/", lambda i: {"files": {"file": (f"{i}.jpg", _image(i), "image/jpeg")}}, False),
+    "competitors": ("POST", "/api/competitors/", lambda i: {"json": {"product_name": _product(i)}}, False),
+}
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _git_rev() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=AI_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _percentile(values: list[float], q: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _ms(seconds: float | None) -> float | None:
+    return round(seconds * 1000, 1) if seconds is not None else None
+
+
+async def _wait_ready(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(url, timeout=1.0)
+                return
+            except httpx.HTTPError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def _start_processes(args, workdir: str) -> tuple[str, list[subprocess.Popen]]:
+    llm_port, search_port, app_port = _free_port(), _free_port(), _free_port()
+    search_base = f"http://127.0.0.1:{search_port}"
+    fake = [sys.executable, "-m", "benchmarks.fake_upstreams"]
+    processes = [
+        subprocess.Popen([
+            *fake, "llm", "--port", str(llm_port), "--page-url", f"{search_base}/page/tool-0",
+            "--ttft", str(args.llm_ttft), "--chunk-delay", str(args.llm_chunk_delay), "--chunks", str(args.llm_chunks),
+        ], cwd=AI_DIR),
+        subprocess.Popen([
+            *fake, "search", "--port", str(search_port),
+            "--search-latency", str(args.search_latency), "--page-latency", str(args.page_latency),
+        ], cwd=AI_DIR),
+    ]
+    env = {
+        **os.environ,
+        "OPENROUTER_API_KEY": "load-test",
+        "OPENROUTER_BASE_URL": f"http://127.0.0.1:{llm_port}/v1",
+        "SEARCH_PROVIDER": "searxng",
+        "SEARCH_URL": f"{search_base}/search",
+        "SUGGEST_URL": f"{search_base}/complete/search",
+        "CACHE_DB_PATH": os.path.join(workdir, "results.sqlite3"),
+        "CACHE_ENABLED": str(args.cache).lower(),
+        "PRICE_INDEX_ENABLED": "false",
+        "TRACE_LOG_MIN_SECONDS": "3600",
+    }
+    if args.cassette:
+        env.update(CASSETTE_MODE="replay", CASSETTE_PATH=os.path.abspath(args.cassette), CASSETTE_TIME_SCALE=str(args.time_scale))
+    processes.append(subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(app_port), "--log-level", "warning"],
+        cwd=AI_DIR, env=env, stdout=subprocess.DEVNULL if args.quiet else None, stderr=subprocess.DEVNULL if args.quiet else None,
+    ))
+    return f"http://127.0.0.1:{app_port}", processes
+
+
+async def _one(client: httpx.AsyncClient, scenario: str, i: int) -> tuple[bool, float, float | None]:
+    """(ok, seconds, seconds to first stream event)."""
+    method, path, make, stream = SCENARIOS[scenario]
+    started = time.perf_counter()
+    first = None
+    try:
+        if stream:
+            async with client.stream(method, path, **make(i)) as resp:
+                ok = resp.status_code == 200
+                async for line in resp.aiter_lines():
+                    if line.startswith("data:"):
+                        first = first or time.perf_counter() - started
+                        ok = ok and '"type": "error"' not in line
+        else:
+            resp = await client.request(method, path, **make(i))
+            ok = resp.status_code == 200
+    except httpx.HTTPError:
+        ok = False
+    return ok, time.perf_counter() - started, first
+
+
+async def _run_scenario(base_url: str, scenario: str, concurrency: int, requests: int, offset: int) -> dict:
+    latencies, firsts, errors = [], [], 0
+    next_index = iter(range(requests))
+
+    async def worker(client: httpx.AsyncClient):
+        nonlocal errors
+        for i in next_index:
+            ok, seconds, first = await _one(client, scenario, offset + i)
+            if ok:
+                latencies.append(seconds)
+                if first is not None:
+                    firsts.append(first)
+            else:
+                errors += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120.0, limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    result = {
+        "requests": requests,
+        "errors": errors,
+        "seconds": round(elapsed, 2),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": _ms(_percentile(latencies, 0.5)),
+        "p90_ms": _ms(_percentile(latencies, 0.9)),
+        "p99_ms": _ms(_percentile(latencies, 0.99)),
+        "max_ms": _ms(max(latencies, default=None)),
+    }
+    if firsts:
+        result["first_event_p50_ms"] = _ms(_percentile(firsts, 0.5))
+        result["first_event_p99_ms"] = _ms(_percentile(firsts, 0.99))
+    return result
+
+
+def _previous(baseline: str | None, current: Path) -> dict | None:
+    if baseline:
+        return json.loads(Path(baseline).read_text())
+    runs = sorted(p for p in RESULTS_DIR.glob("*.json") if p != current)
+    return json.loads(runs[-1].read_text()) if runs else None
+
+
+def _compare(current: dict, previous: dict, threshold: float) -> list[str]:
+    """Human-readable regressions of `current` against `previous`."""
+    regressions = []
+    for scenario, now in current["scenarios"].items():
+        before = previous.get("scenarios", {}).get(scenario)
+        if not before:
+            continue
+        if before["throughput_rps"] and now["throughput_rps"] < before["throughput_rps"] * (1 - threshold):
+            regressions.append(f"{scenario}: throughput {before['throughput_rps']} -> {now['throughput_rps']} rps")
+        for key in ("p50_ms", "p99_ms", "first_event_p50_ms"):
+            if before.get(key) and now.get(key) and now[key] > before[key] * (1 + threshold):
+                regressions.append(f"{scenario}: {key} {before[key]} -> {now[key]}")
+        if now["errors"] > before["errors"]:
+            regressions.append(f"{scenario}: errors {before['errors']} -> {now['errors']}")
+    return regressions
+
+
+def _print(results: dict) -> None:
+    print(f"\n{'scenario':<16}{'req':>6}{'err':>5}{'rps':>9}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'first p50':>11}")
+    for name, r in results["scenarios"].items():
+        first = r.get("first_event_p50_ms")
+        print(
+            f"{name:<16}{r['requests']:>6}{r['errors']:>5}{r['throughput_rps']:>9}"
+            f"{r['p50_ms'] or '-':>10}{r['p90_ms'] or '-':>10}{r['p99_ms'] or '-':>10}{first or '-':>11}"
+        )
+
+
+async def run(args) -> int:
+    scenarios = args.scenarios.split(",")
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))} (choose from {', '.join(SCENARIOS)})")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        base_url, processes = _start_processes(args, workdir)
+        try:
+            await _wait_ready(f"{base_url}/health")
+            results = {
+                "rev": _git_rev(),
+                "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "config": {k: v for k, v in vars(args).items() if k not in ("baseline", "quiet")},
+                "scenarios": {},
+            }
+            for n, scenario in enumerate(scenarios):
+                print(f"{scenario}: {args.requests} requests, concurrency {args.concurrency}", flush=True)
+                await _run_scenario(base_url, scenario, args.concurrency, min(args.warmup, args.requests), -1_000_000 * (n + 1))
+                results["scenarios"][scenario] = await _run_scenario(
+                    base_url, scenario, args.concurrency, args.requests, 1_000_000 * n
+                )
+        finally:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.wait(timeout=10)
+
+    _print(results)
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    path = RESULTS_DIR / f"{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}-{results['rev']}.json"
+    path.write_text(json.dumps(results, indent=2) + "\n")
+    print(f"\nSaved {path.relative_to(AI_DIR)}")
+
+    previous = _previous(args.baseline, path)
+    if previous is None:
+        return 0
+    regressions = _compare(results, previous, args.threshold)
+    changed = sorted(k for k, v in results["config"].items() if previous.get("config", {}).get(k) != v)
+    if changed:
+        print(f"Note: settings differ from the baseline run: {', '.join(changed)}")
+    print(f"Compared with {previous['rev']} ({previous['started_at']}): ", end="")
+    if not regressions:
+        print("no regressions")
+        return 0
+    print(f"{len(regressions)} regression(s)")
+    for line in regressions:
+        print(f"  {line}")
+    return 1 if args.fail_on_regression else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline load test against local LLM and search stand-ins")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated scenario names")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=50, help="Measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=5, help="Unmeasured requests per scenario")
+    parser.add_argument("--cache", action="store_true", help="Leave the pricing/demand result cache on")
+    parser.add_argument("--llm-ttft", type=float, default=0.4, help="Fake LLM time to first token (s)")
+    parser.add_argument("--llm-chunk-delay", type=float, default=0.01, help="Fake LLM delay per streamed chunk (s)")
+    parser.add_argument("--llm-chunks", type=int, default=40, help="Chunks per fake LLM answer")
+    parser.add_argument("--search-latency", type=float, default=0.15, help="Fake search latency (s)")
+    parser.add_argument("--page-latency", type=float, default=0.1, help="Fake page fetch latency (s)")
+    parser.add_argument("--cassette", help="Replay this recorded cassette instead of the fake upstreams")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="Multiplier for recorded timings (0 = none)")
+    parser.add_argument("--baseline", help="Result file to compare against (default: previous run)")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Relative change reported as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit 1 when a regression is found")
+    parser.add_argument("--quiet", action="store_true", help="Hide the service's logs")
+    sys.exit(asyncio.run(run(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
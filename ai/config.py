@@ -3,9 +3,170 @@ from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     openrouter_api_key: str = ""
+    openrouter_base_url: str = "https://openrouter.ai/api/v1"
     llm_model: str = "moonshotai/kimi-k2.5"
     host: str = "0.0.0.0"
     port: int = 8000
+    # Import lazily loaded dependencies (openai, ddgs, ...) in the background after startup
+    prewarm: bool = True
+
+    # Production server (server.py): worker processes, event loop ("auto", "asyncio", "uvloop")
+    # and HTTP parser ("auto", "h11", "httptools"); server_limit_concurrency 0 = unlimited.
+    # On shutdown in-flight requests, streamed analyses and running jobs included, get
+    # server_shutdown_timeout seconds from the start of draining to finish; /health answers 503 while draining (and, if
+    # health_fail_when_saturated, while the LLM queue is backed up)
+    workers: int = 1
+    server_loop: str = "auto"
+    server_http: str = "auto"
+    server_keepalive_timeout: int = 5
+    server_backlog: int = 2048
+    server_limit_concurrency: int = 0
+    server_shutdown_timeout: float = 30.0
+    server_access_log: bool = False
+    health_fail_when_saturated: bool = False
+
+    # Web search backend: "ddgs" (DuckDuckGo), "searxng" (JSON API at search_url)
+    # or "fake" (offline, for load tests); suggest_url serves demand suggestions
+    search_provider: str = "ddgs"
+    search_url: str = ""
+    suggest_url: str = "https://suggestqueries.google.com/complete/search"
+    search_concurrency: int = 4
+    search_timeout: float = 10.0
+    search_fake_latency: float = 0.2
+    search_cache_ttl: float = 900.0
+    search_cache_size: int = 1024
+
+    # Shared scraper HTTP client
+    http_timeout: float = 10.0
+    http_connect_timeout: float = 5.0
+    http_max_connections: int = 100
+    http_max_keepalive: int = 20
+    http_keepalive_expiry: float = 30.0
+    http_per_host_limit: int = 8
+    http_http2: bool = False
+
+    # fetch_page: hard cap on bytes read per page, and how long extracted text is reused.
+    # Pages not fetched for page_cache_max_age seconds are dropped, and at most
+    # page_cache_max_entries are kept
+    fetch_max_bytes: int = 1048576
+    page_cache_ttl: float = 3600.0
+    page_cache_max_age: float = 604800.0
+    page_cache_max_entries: int = 5000
+
+    # Competitor price search: per-marketplace queries run concurrently (at most
+    # marketplace_concurrency per request) and whatever arrived by the deadline (seconds) is returned
+    marketplace_concurrency: int = 3
+    marketplace_deadline: float = 8.0
+    marketplace_results_per_query: int = 8
+
+    # Competitor price index (seconds): entries older than the TTL fall through to live search;
+    # every refresh interval the most requested products are re-fetched, a few at a time
+    price_index_enabled: bool = True
+    price_index_ttl: float = 21600.0
+    price_index_refresh_interval: float = 300.0
+    price_index_refresh_batch: int = 10
+    price_index_refresh_delay: float = 2.0
+    price_index_decay: float = 0.5
+    price_index_min_demand: float = 0.5
+
+    # CPU-heavy steps (HTML parsing, image encoding, ...) run in a process pool
+    # once their input reaches cpu_offload_min_bytes; 0 workers keeps them inline
+    cpu_workers: int = 2
+    cpu_offload_min_bytes: int = 262144
+    cpu_offload_stage_min_bytes: dict[str, int] = {"html_extract": 65536, "image_base64": 16777216}
+
+    # /api/detect uploads: size limit, downsizing before the vision call, result cache
+    detect_max_upload_bytes: int = 15728640
+    detect_max_dimension: int = 1280
+    detect_jpeg_quality: int = 82
+    detect_cache_ttl: float = 604800.0
+    detect_batch_group_size: int = 4
+    detect_batch_concurrency: int = 3
+    detect_batch_max_files: int = 12
+
+    # /api/describe/batch: products per LLM call and concurrent calls per request
+    describe_batch_size: int = 20
+    describe_batch_concurrency: int = 4
+    describe_batch_max_items: int = 500
+
+    # Local category classifier in front of the LLM
+    classifier_enabled: bool = True
+    classifier_threshold: float = 0.8
+    classifier_retrain_every: int = 50
+
+    # LLM scheduler: global concurrency, per-class caps (interactive / batch / analysis),
+    # queue length and queue-wait timeouts (seconds); cooldown after an upstream 429
+    llm_max_concurrency: int = 8
+    llm_class_limits: dict[str, int] = {"batch": 4, "analysis": 5}
+    llm_max_queue: int = 64
+    llm_queue_timeout: float = 30.0
+    llm_queue_timeouts: dict[str, float] = {"interactive": 10.0, "batch": 60.0, "analysis": 20.0}
+    llm_rate_limit_cooldown: float = 5.0
+
+    # LLM retries (full-jitter backoff) and hedging: a duplicate request is sent once a call
+    # outlives the endpoint's observed latency percentile. Both spend a per-endpoint budget
+    # refilled by llm_retry_budget_ratio per call (at most llm_retry_budget_burst saved up)
+    llm_request_timeout: float = 60.0
+    llm_max_retries: int = 2
+    llm_retry_base_delay: float = 0.5
+    llm_retry_max_delay: float = 8.0
+    llm_retry_budget_ratio: float = 0.1
+    llm_retry_budget_burst: float = 10.0
+    llm_hedge_endpoints: list[str] = ["describe", "detect"]
+    llm_hedge_percentile: float = 0.95
+    llm_hedge_min_samples: int = 20
+
+    # Per-task LLM routing: "task" or "task:iteration" -> model / reasoning effort
+    # ("default", "none", "low", "medium", "high") / max_tokens, merged over
+    # llm_routing.DEFAULT_ROUTES. Fast requests, and all calls while
+    # llm_downgrade_queue_depth calls are queued, get llm_fast_route on top.
+    llm_routes: dict[str, dict[str, str | int]] = {}
+    llm_fast_route: dict[str, str | int] = {"reasoning": "none"}
+    llm_downgrade_queue_depth: int = 16
+
+    # Agent prompt budget (estimated tokens per LLM call); tool results from earlier
+    # turns are compacted first, the latest turn's only when still over budget
+    context_token_budget: int = 12000
+    context_compact_older: bool = True
+
+    # Agent tool calls (seconds); tool_timeouts overrides per tool name
+    tool_timeout: float = 30.0
+    tool_timeouts: dict[str, float] = {"fetch_page": 15.0, "web_search": 15.0}
+
+    # Pricing / demand result cache (seconds); stale entries are served while refreshing
+    cache_enabled: bool = True
+    cache_db_path: str = "cache/results.sqlite3"
+    cache_memory_entries: int = 512
+    cache_pricing_ttl: float = 1800.0
+    cache_demand_ttl: float = 21600.0
+    cache_stale_ttl: float = 3600.0
+
+    # Async analysis jobs (/api/jobs): job_workers per server worker run queued jobs, and
+    # submits beyond job_max_queue queued jobs get 503. Events and a heartbeat are written
+    # every job_flush_interval seconds; a running job without a heartbeat for
+    # job_stale_after seconds is failed as interrupted. Finished jobs are kept job_ttl seconds
+    job_workers: int = 2
+    job_max_queue: int = 100
+    job_poll_interval: float = 1.0
+    job_flush_interval: float = 0.5
+    job_stale_after: float = 30.0
+    job_ttl: float = 86400.0
+
+    # Per-request traces: span summaries of requests slower than trace_log_min_seconds
+    # are logged. "X-Profile: 1" samples the event loop every profile_interval seconds
+    # (at most profile_max_seconds, one request at a time) when profiling is enabled
+    trace_enabled: bool = True
+    trace_log_min_seconds: float = 1.0
+    profile_enabled: bool = False
+    profile_interval: float = 0.005
+    profile_max_seconds: float = 60.0
+    profile_keep: int = 20
+
+    # Cassettes: "record" appends LLM, search and scraper HTTP traffic to cassette_path;
+    # "replay" serves it back offline, waiting the recorded time x cassette_time_scale
+    cassette_mode: str = "off"
+    cassette_path: str = "cassettes/recorded.jsonl"
+    cassette_time_scale: float = 1.0
 
     model_config = {"env_file": ".env"}
 
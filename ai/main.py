@@ -1,13 +1,64 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from loguru import logger
 
 from config import settings
-from routers import detection, demand, pricing, describe, competitors
+from routers import detection, demand, pricing, describe, competitors, jobs as jobs_api
+from scrapers import http_client, page_cache, price_index
+from scrapers.marketplace import fetch_competitor_data
+from scrapers.search_cache import search_cache
+from scrapers.web_search import fetch_stats
+from services import (
+    body_limit,
+    cassette,
+    category_classifier,
+    context_budget,
+    cpu_pool,
+    db,
+    health,
+    jobs,
+    llm_retry,
+    llm_routing,
+    llm_scheduler,
+    metrics,
+    object_detection,
+    prewarm,
+    profiler,
+    result_cache,
+    tracing,
+)
+from services.llm_scheduler import LLMBusyError
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await http_client.start()
+    await cassette.start()
+    await result_cache.open_db()
+    await page_cache.open_db()
+    cpu_pool.start()
+    await category_classifier.load()
+    price_index.start(fetch_competitor_data)
+    prewarm.start()
+    await jobs.start()
+    health.install_drain_hook()
+    health.mark_ready()
+    yield
+    health.begin_drain()
+    await jobs.stop()
+    await price_index.stop()
+    cpu_pool.shutdown()
+    await http_client.close()
+    db.close()
+
 
 app = FastAPI(
     title="Rangaayan AI",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -17,17 +68,69 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(body_limit.BodyLimitMiddleware, limits=detection.upload_limits)
+app.add_middleware(metrics.ASGIMetricsMiddleware)
+app.add_middleware(tracing.TracingMiddleware)
+
+
+@app.exception_handler(LLMBusyError)
+async def llm_busy_handler(request: Request, exc: LLMBusyError):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after_seconds)},
+    )
+
 
 app.include_router(detection.router, prefix="/api/detect", tags=["Object Detection"])
 app.include_router(describe.router, prefix="/api/describe", tags=["Description"])
 app.include_router(pricing.router, prefix="/api/pricing", tags=["AI Pricing"])
 app.include_router(competitors.router, prefix="/api/competitors", tags=["Competitors"])
 app.include_router(demand.router, prefix="/api/demand", tags=["Demand Insights"])
+app.include_router(jobs_api.router, prefix="/api/jobs", tags=["Analysis Jobs"])
 
 
 @app.get("/health")
-async def health():
-    return {"status": "ok"}
+async def health_check(response: Response):
+    """Readiness (503 while starting or draining) and saturation of this worker."""
+    response.status_code, body = health.report()
+    return body
+
+
+@app.get("/stats")
+async def stats():
+    return {
+        "http_pool": http_client.pool_stats(),
+        "search_cache": search_cache.stats(),
+        "page_fetch": fetch_stats(),
+        "price_index": price_index.stats(),
+        "result_cache": result_cache.stats(),
+        "cpu_pool": cpu_pool.stats(),
+        "llm_scheduler": llm_scheduler.stats(),
+        "llm_retries": llm_retry.stats(),
+        "llm_routing": llm_routing.stats(),
+        "context_budget": context_budget.stats(),
+        "detect_images": object_detection.stats(),
+        "category_classifier": category_classifier.stats(),
+        "profiler": profiler.stats(),
+        "cassette": cassette.stats(),
+        "prewarm": prewarm.stats(),
+        "jobs": jobs.stats(),
+    }
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/debug/profiles/{profile_id}", include_in_schema=False)
+async def get_profile(profile_id: str):
+    """Collapsed stacks of a request sent with "X-Profile: 1" (id from its X-Profile-Id header)."""
+    profile = profiler.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(profile.collapsed())
 
 
 if __name__ == "__main__":
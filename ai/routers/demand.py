@@ -1,9 +1,10 @@
 import json
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Response
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
+from services import llm_scheduler, tracing
 from services.demand_insights import get_demand_insights, get_demand_insights_stream
 
 router = APIRouter()
@@ -13,26 +14,35 @@ class DemandRequest(BaseModel):
     product_name: str
     category: str | None = None
     location: str | None = None
+    fast: bool = False
 
 
 @router.post("/")
-async def analyze_demand(req: DemandRequest):
-    return await get_demand_insights(
+async def analyze_demand(req: DemandRequest, response: Response):
+    result = await get_demand_insights(
         product_name=req.product_name,
         category=req.category,
         location=req.location,
+        fast=req.fast,
     )
+    response.headers["X-Cache"] = result["cache"]
+    return result
 
 
 @router.post("/stream")
 async def analyze_demand_stream(req: DemandRequest):
+    llm_scheduler.check_admission(llm_scheduler.ANALYSIS)
+
     async def event_generator():
         async for event in get_demand_insights_stream(
             product_name=req.product_name,
             category=req.category,
             location=req.location,
+            fast=req.fast,
         ):
             yield f"data: {json.dumps(event)}\n\n"
+        if (timing := tracing.timing_event()) is not None:
+            yield f"data: {json.dumps(timing)}\n\n"
 
     return StreamingResponse(
         event_generator(),
@@ -1,7 +1,12 @@
+import json
+
 from fastapi import APIRouter
-from pydantic import BaseModel
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ConfigDict, Field
 
-from services.description import generate_description
+from config import settings
+from services import llm_scheduler
+from services.description import classify_category, generate_description, generate_descriptions
 
 router = APIRouter()
 
@@ -9,6 +14,23 @@ router = APIRouter()
 class DescribeRequest(BaseModel):
     product_name: str
     category: str | None = None
+    fast: bool = False
+
+
+class CategoryRequest(BaseModel):
+    product_name: str
+
+
+class DescribeBatchItem(BaseModel):
+    # Each chunk is one LLM call, so per-item options such as "fast" are rejected rather than ignored.
+    model_config = ConfigDict(extra="forbid")
+
+    product_name: str
+    category: str | None = None
+
+
+class DescribeBatchRequest(BaseModel):
+    products: list[DescribeBatchItem] = Field(min_length=1, max_length=settings.describe_batch_max_items)
 
 
 @router.post("/")
@@ -16,5 +38,31 @@ async def describe_product(req: DescribeRequest):
     result = await generate_description(
         product_name=req.product_name,
         category=req.category,
+        fast=req.fast,
     )
     return result
+
+
+@router.post("/category")
+async def categorize_product(req: CategoryRequest):
+    return await classify_category(req.product_name)
+
+
+@router.post("/batch")
+async def describe_products(req: DescribeBatchRequest):
+    """NDJSON stream: one {"index", "product_name", "description", "category"} line per product.
+
+    Products whose LLM call failed get an {"index", "product_name", "error"} line instead.
+    If the LLM runs out of capacity mid-stream, a final {"error", "retry_after"} line is sent.
+    """
+    llm_scheduler.check_admission(llm_scheduler.BATCH)
+
+    async def line_generator():
+        try:
+            async for results in generate_descriptions([p.model_dump() for p in req.products]):
+                for item in results:
+                    yield json.dumps(item) + "\n"
+        except llm_scheduler.LLMBusyError as e:
+            yield json.dumps({"error": str(e), "retry_after": e.retry_after_seconds}) + "\n"
+
+    return StreamingResponse(line_generator(), media_type="application/x-ndjson")
@@ -1,13 +1,49 @@
-from fastapi import APIRouter, UploadFile, File
-from services.object_detection import detect_products, PRODUCT_CATEGORIES
+from fastapi import APIRouter, File, Form, HTTPException, UploadFile
+
+from config import settings
+from services.object_detection import detect_products, detect_products_batch, PRODUCT_CATEGORIES
 
 router = APIRouter()
 
+_CHUNK = 256 * 1024
+
+
+def upload_limits() -> dict[str, int]:
+    """Largest request body per endpoint, enforced by BodyLimitMiddleware before form parsing."""
+    single = settings.detect_max_upload_bytes
+    return {
+        "/api/detect/": single + _CHUNK,  # slack for multipart framing
+        "/api/detect/batch": single * settings.detect_batch_max_files + _CHUNK,
+    }
+
+
+async def read_upload(file: UploadFile) -> bytes:
+    """Read an already received upload in chunks, enforcing the per-file limit within a batch."""
+    limit = settings.detect_max_upload_bytes
+    data = bytearray()
+    while chunk := await file.read(_CHUNK):
+        data += chunk
+        if len(data) > limit:
+            raise HTTPException(status_code=413, detail=f"Upload exceeds {limit} bytes")
+    return bytes(data)
+
 
 @router.post("/")
-async def detect(file: UploadFile = File(...)):
-    image_bytes = await file.read()
-    return await detect_products(image_bytes)
+async def detect(file: UploadFile = File(...), product_name: str | None = Form(None)):
+    image_bytes = await read_upload(file)
+    try:
+        return await detect_products(image_bytes, product_name=product_name)
+    except ValueError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+
+
+@router.post("/batch")
+async def detect_batch(files: list[UploadFile] = File(...)):
+    max_files = settings.detect_batch_max_files
+    if len(files) > max_files:
+        raise HTTPException(status_code=413, detail=f"At most {max_files} images per batch")
+    images = [await read_upload(file) for file in files]
+    return await detect_products_batch(images)
 
 
 @router.get("/categories")
@@ -0,0 +1,54 @@
+import json
+
+from fastapi import APIRouter, Header, HTTPException, Response
+from fastapi.responses import StreamingResponse
+
+from routers.demand import DemandRequest
+from routers.pricing import PricingRequest
+from services import jobs
+
+router = APIRouter()
+
+
+async def _submit(kind: str, params: dict, response: Response) -> dict:
+    job = await jobs.submit(kind, params)
+    response.status_code = 202
+    response.headers["Location"] = f"/api/jobs/{job['id']}"
+    return jobs.public(job)
+
+
+@router.post("/pricing")
+async def submit_pricing(req: PricingRequest, response: Response):
+    return await _submit("pricing", req.model_dump(), response)
+
+
+@router.post("/demand")
+async def submit_demand(req: DemandRequest, response: Response):
+    return await _submit("demand", req.model_dump(), response)
+
+
+@router.get("/{job_id}")
+async def get_job(job_id: str):
+    job = await jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return jobs.public(job)
+
+
+@router.get("/{job_id}/events")
+async def job_events(job_id: str, after: int = 0, last_event_id: str | None = Header(default=None)):
+    """SSE stream of the job's events from the start, or after Last-Event-ID / `after` on reconnect."""
+    if await jobs.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if last_event_id and last_event_id.isdigit():
+        after = int(last_event_id)
+
+    async def event_generator():
+        async for seq, event in jobs.events(job_id, after):
+            yield f"id: {seq}\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
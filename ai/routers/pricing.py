@@ -1,9 +1,10 @@
 import json
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Response
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
+from services import llm_scheduler, tracing
 from services.ai_pricing import get_pricing_suggestion, get_pricing_suggestion_stream
 
 router = APIRouter()
@@ -15,21 +16,27 @@ class PricingRequest(BaseModel):
     category: str | None = None
     quality: str | None = None
     location: str | None = None
+    fast: bool = False
 
 
 @router.post("/")
-async def suggest_pricing(req: PricingRequest):
-    return await get_pricing_suggestion(
+async def suggest_pricing(req: PricingRequest, response: Response):
+    result = await get_pricing_suggestion(
         product_name=req.product_name,
         cost_price=req.cost_price,
         category=req.category,
         quality=req.quality,
         location=req.location,
+        fast=req.fast,
     )
+    response.headers["X-Cache"] = result["cache"]
+    return result
 
 
 @router.post("/stream")
 async def suggest_pricing_stream(req: PricingRequest):
+    llm_scheduler.check_admission(llm_scheduler.ANALYSIS)
+
     async def event_generator():
         async for event in get_pricing_suggestion_stream(
             product_name=req.product_name,
@@ -37,8 +44,11 @@ async def suggest_pricing_stream(req: PricingRequest):
             category=req.category,
             quality=req.quality,
             location=req.location,
+            fast=req.fast,
         ):
             yield f"data: {json.dumps(event)}\n\n"
+        if (timing := tracing.timing_event()) is not None:
+            yield f"data: {json.dumps(timing)}\n\n"
 
     return StreamingResponse(
         event_generator(),
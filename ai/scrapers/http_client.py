@@ -0,0 +1,189 @@
+"""Shared pooled HTTP client for all scrapers.
+
+One `httpx.AsyncClient` per process, opened and closed by the FastAPI lifespan,
+so tool calls reuse keep-alive connections instead of paying a TCP+TLS
+handshake each time. Requests are additionally capped per host; slots of
+idle hosts are dropped, oldest first, once more than _MAX_IDLE_HOSTS are kept.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from collections.abc import AsyncIterator
+from urllib.parse import urlsplit
+
+import httpx
+from loguru import logger
+
+from config import settings
+from services import cassette, tracing
+
+_client: httpx.AsyncClient | None = None
+_MAX_IDLE_HOSTS = 256
+
+_host_slots: OrderedDict[str, asyncio.Semaphore] = OrderedDict()
+_host_users: dict[str, int] = {}
+_stats = {"requests": 0, "connections_opened": 0, "errors": 0}
+
+
+async def _trace(event_name: str, info: dict) -> None:
+    if event_name == "connection.connect_tcp.complete":
+        _stats["connections_opened"] += 1
+
+
+async def _on_request(request: httpx.Request) -> None:
+    _stats["requests"] += 1
+    request.extensions["trace"] = _trace
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _build_client() -> httpx.AsyncClient:
+    http2 = settings.http_http2
+    if http2 and not _http2_available():
+        logger.warning("HTTP_HTTP2 is set but the 'h2' package is missing; using HTTP/1.1")
+        http2 = False
+    return httpx.AsyncClient(
+        http2=http2,
+        follow_redirects=True,
+        timeout=httpx.Timeout(settings.http_timeout, connect=settings.http_connect_timeout),
+        limits=httpx.Limits(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive,
+            keepalive_expiry=settings.http_keepalive_expiry,
+        ),
+        event_hooks={"request": [_on_request]},
+    )
+
+
+def get_client() -> httpx.AsyncClient:
+    """Return the shared client, creating it if the lifespan has not started it."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+    return _client
+
+
+async def start() -> None:
+    get_client()
+    logger.info(f"Shared HTTP client started (per-host limit {settings.http_per_host_limit})")
+
+
+async def close() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+@asynccontextmanager
+async def host_slot(url: str) -> AsyncIterator[None]:
+    """Hold one of the per-host request slots for the duration of the block."""
+    host = urlsplit(url).hostname or ""
+    _host_users[host] = _host_users.get(host, 0) + 1
+    slot = _host_slots.get(host)
+    if slot is None:
+        slot = _host_slots[host] = asyncio.Semaphore(settings.http_per_host_limit)
+        _evict_idle_hosts()
+    _host_slots.move_to_end(host)
+    try:
+        async with slot:
+            yield
+    finally:
+        _host_users[host] -= 1
+        if not _host_users[host]:
+            del _host_users[host]
+
+
+def _evict_idle_hosts() -> None:
+    """Drop least recently used slots of hosts nobody holds or waits for."""
+    excess = len(_host_slots) - _MAX_IDLE_HOSTS
+    for host in list(_host_slots):
+        if excess <= 0:
+            break
+        if host not in _host_users:
+            del _host_slots[host]
+            excess -= 1
+
+
+async def get(url: str, **kwargs) -> httpx.Response:
+    """GET through the shared client, respecting the per-host limit."""
+    with tracing.span(f"http:{urlsplit(url).hostname}") as span:
+        if cassette.replaying():
+            return await cassette.replay_http(url, kwargs.get("params"))
+        async with host_slot(url):
+            started = time.perf_counter()
+            try:
+                resp = await get_client().get(url, **kwargs)
+            except Exception:
+                _stats["errors"] += 1
+                raise
+        span.set(status=resp.status_code)
+        if cassette.recording():
+            await cassette.record_http(url, kwargs.get("params"), resp, resp.content, started)
+        return resp
+
+
+@asynccontextmanager
+async def stream(url: str, **kwargs) -> AsyncIterator[httpx.Response]:
+    """Streaming GET through the shared client; the body is read by the caller."""
+    with tracing.span(f"http:{urlsplit(url).hostname}") as span:
+        if cassette.replaying():
+            yield await cassette.replay_http(url, kwargs.get("params"))
+            return
+        async with host_slot(url):
+            started = time.perf_counter()
+            client = get_client()
+            request = client.build_request("GET", url, **kwargs)
+            try:
+                resp = await client.send(request, stream=True)
+            except Exception:
+                _stats["errors"] += 1
+                raise
+            span.set(status=resp.status_code)
+            try:
+                if cassette.recording():
+                    resp = await _recorded_body(url, kwargs.get("params"), resp, started)
+                yield resp
+            finally:
+                await resp.aclose()
+
+
+# Describe the bytes on the wire; the recorded copy holds the decoded body instead.
+_WIRE_HEADERS = ("content-encoding", "content-length", "transfer-encoding")
+
+
+async def _recorded_body(url: str, params: dict | None, resp: httpx.Response, started: float) -> httpx.Response:
+    """Read the body (up to FETCH_MAX_BYTES), record it, and hand the caller a copy to stream.
+
+    aiter_bytes() already undoes gzip / br, so the copy drops the wire headers;
+    otherwise httpx would try to decompress the decoded body a second time.
+    """
+    body = bytearray()
+    async for chunk in resp.aiter_bytes():
+        body += chunk
+        if len(body) >= settings.fetch_max_bytes:
+            break
+    await resp.aclose()
+    await cassette.record_http(url, params, resp, bytes(body), started)
+    headers = [(k, v) for k, v in resp.headers.multi_items() if k.lower() not in _WIRE_HEADERS]
+    return httpx.Response(resp.status_code, headers=headers, content=bytes(body), request=resp.request)
+
+
+def pool_stats() -> dict:
+    """Connection reuse counters collected by the request / trace hooks."""
+    requests = _stats["requests"]
+    opened = _stats["connections_opened"]
+    return {
+        **_stats,
+        "reused": max(requests - opened, 0),
+        "reuse_ratio": round(1 - opened / requests, 3) if requests else None,
+        "hosts": len(_host_slots),
+    }
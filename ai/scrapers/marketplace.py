@@ -2,10 +2,13 @@
 
 import asyncio
 import re
+import time
 
-import httpx
 from loguru import logger
 
+from config import settings
+from scrapers import http_client, price_index
+from services import cpu_pool, metrics
 from scrapers.web_search import web_search
 
 
@@ -29,6 +32,7 @@ def _extract_prices_from_snippets(results: list[dict]) -> list[dict]:
                     "title": r.get("title", ""),
                     "price_inr": price,
                     "source": _detect_source(r.get("url", "")),
+                    "url": r.get("url", ""),
                 })
             except ValueError:
                 continue
@@ -50,34 +54,94 @@ def _detect_source(url: str) -> str:
     return "other"
 
 
-async def _search_marketplace_prices(product_name: str) -> list[dict]:
-    """Search for prices across Indian marketplaces via web search."""
-    queries = [
-        f"{product_name} price buy India",
-        f"{product_name} price site:amazon.in OR site:flipkart.com OR site:meesho.com",
-    ]
+# source name -> site: filter
+MARKETPLACES = {
+    "amazon.in": "amazon.in",
+    "flipkart": "flipkart.com",
+    "meesho": "meesho.com",
+    "indiamart": "indiamart.com",
+    "jiomart": "jiomart.com",
+}
 
-    all_results = []
-    for query in queries:
-        results = await web_search(query, num_results=8)
-        all_results.extend(results)
 
-    return _extract_prices_from_snippets(all_results)
+def _query_plan(product_name: str) -> list[tuple[str, str]]:
+    """(source, query) pairs: one per marketplace, plus the unfiltered query as source "web"."""
+    plan = [("web", f"{product_name} price buy India")]
+    plan.extend((source, f"{product_name} price site:{site}") for source, site in MARKETPLACES.items())
+    return plan
+
+
+def _dedupe(items: list[dict]) -> list[dict]:
+    """Drop listings seen under the same URL or (case-insensitive) title."""
+    seen = set()
+    unique = []
+    for item in items:
+        keys = {item["url"], item["title"].strip().lower()} - {""}
+        if keys & seen:
+            continue
+        seen |= keys
+        unique.append(item)
+    return unique
+
+
+async def _timed_search(source: str, query: str, slots: asyncio.Semaphore) -> tuple[list[dict], dict]:
+    """One source's search; `ms` counts from when it got one of the request's `slots`."""
+    async with slots:
+        started = time.perf_counter()
+        results = await web_search(query, num_results=settings.marketplace_results_per_query)
+    timing = {"ms": round((time.perf_counter() - started) * 1000), "results": len(results), "status": "ok"}
+    return results, timing
+
+
+async def _search_marketplace_prices(product_name: str) -> tuple[list[dict], dict]:
+    """Run the query plan concurrently until MARKETPLACE_DEADLINE; returns (listings, per-source timing).
+
+    Sources still running at the deadline are cancelled and reported as "timeout";
+    listings from the ones that finished are returned. At most MARKETPLACE_CONCURRENCY
+    of this request's queries run at once; the search provider bounds the total.
+    """
+    started = time.perf_counter()
+    slots = asyncio.Semaphore(settings.marketplace_concurrency)
+    tasks = {
+        asyncio.create_task(_timed_search(source, query, slots), name=f"marketplace:{source}"): source
+        for source, query in _query_plan(product_name)
+    }
+    done, pending = await asyncio.wait(tasks, timeout=settings.marketplace_deadline)
+    for task in pending:
+        task.cancel()
+
+    all_results = []
+    sources = {}
+    for task, source in tasks.items():
+        if task in pending:
+            sources[source] = {"ms": round((time.perf_counter() - started) * 1000), "results": 0, "status": "timeout"}
+        elif task.exception() is not None:
+            logger.warning(f"Marketplace search failed for {source}: {task.exception()}")
+            sources[source] = {"ms": None, "results": 0, "status": "error"}
+        else:
+            results, sources[source] = task.result()
+            all_results.extend(results)
+
+    size = cpu_pool.approx_size(all_results, cpu_pool.threshold("price_regex"))
+    items = await cpu_pool.run("price_regex", _extract_prices_from_snippets, all_results, size=size)
+    return _dedupe(items), sources
 
 
 async def _google_suggestions(query: str) -> dict:
     """Get demand signals from Google search suggestions."""
     suggestions = []
-    url = f"https://suggestqueries.google.com/complete/search?client=firefox&q={query.replace(' ', '+')}"
 
-    async with httpx.AsyncClient() as client:
-        try:
-            resp = await client.get(url, timeout=10)
-            data = resp.json()
-            if isinstance(data, list) and len(data) > 1:
-                suggestions = data[1][:10]
-        except Exception as e:
-            logger.warning(f"Google suggestions failed: {e}")
+    started = time.perf_counter()
+    outcome = "ok"
+    try:
+        resp = await http_client.get(settings.suggest_url, params={"client": "firefox", "q": query})
+        data = resp.json()
+        if isinstance(data, list) and len(data) > 1:
+            suggestions = data[1][:10]
+    except Exception as e:
+        outcome = "error"
+        logger.warning(f"Google suggestions failed: {e}")
+    metrics.upstream_seconds.observe(time.perf_counter() - started, "suggest", outcome)
 
     return {
         "query": query,
@@ -87,14 +151,19 @@ async def _google_suggestions(query: str) -> dict:
 
 
 async def get_competitor_data(product_name: str) -> dict:
-    """Aggregate competitor data from search-based sources."""
+    """Competitor data from the local price index, falling back to a live lookup on a miss."""
+    return await price_index.get_or_fetch(product_name, fetch_competitor_data)
+
+
+async def fetch_competitor_data(product_name: str) -> dict:
+    """Aggregate competitor data from search-based sources (live)."""
     prices, trends = await asyncio.gather(
         _search_marketplace_prices(product_name),
         _google_suggestions(product_name),
         return_exceptions=True,
     )
 
-    prices = prices if isinstance(prices, list) else []
+    prices, sources = prices if isinstance(prices, tuple) else ([], {})
     trends = trends if isinstance(trends, dict) else {"demand_signal": "unknown"}
 
     numeric_prices = [p["price_inr"] for p in prices if "price_inr" in p]
@@ -109,4 +178,5 @@ async def get_competitor_data(product_name: str) -> dict:
             "avg": round(sum(numeric_prices) / len(numeric_prices), 2) if numeric_prices else None,
             "count": len(numeric_prices),
         },
+        "sources": sources,
     }
@@ -0,0 +1,125 @@
+"""Disk cache of extracted page text for fetch_page_content.
+
+Rows live in the same SQLite file as the result cache. Entries younger than
+`page_cache_ttl` are served without touching the network; older ones keep
+their ETag / Last-Modified so the next fetch can be a conditional request.
+Every _PRUNE_EVERY writes, entries not fetched for `page_cache_max_age` are
+deleted and the table is cut back to the `page_cache_max_entries` most
+recently fetched pages.
+"""
+
+import asyncio
+import sqlite3
+import time
+
+from loguru import logger
+
+from config import settings
+from services import db
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT PRIMARY KEY, text TEXT NOT NULL, max_chars INTEGER NOT NULL,
+    etag TEXT, last_modified TEXT, fetched REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS pages_fetched ON pages (fetched);
+"""
+_PRUNE_EVERY = 100
+
+_writes = 0
+_counters = {"page_hits": 0, "page_revalidations": 0, "page_misses": 0, "page_pruned": 0}
+
+
+def _connect() -> sqlite3.Connection:
+    return db.connect(_SCHEMA)
+
+
+async def open_db() -> None:
+    """Open (and prune) the SQLite file at startup, once per worker, instead of on the first request."""
+    if settings.cache_enabled:
+        await asyncio.to_thread(_prune)
+
+
+def _get(url: str) -> tuple | None:
+    with db.lock:
+        return _connect().execute(
+            "SELECT text, max_chars, etag, last_modified, fetched FROM pages WHERE url = ?", (url,)
+        ).fetchone()
+
+
+def _set(url: str, text: str, max_chars: int, etag: str | None, last_modified: str | None) -> None:
+    global _writes
+    with db.lock:
+        conn = _connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO pages (url, text, max_chars, etag, last_modified, fetched) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (url, text, max_chars, etag, last_modified, time.time()),
+        )
+        conn.commit()
+    _writes += 1
+    if _writes % _PRUNE_EVERY == 0:
+        _prune()
+
+
+def _prune() -> None:
+    """Drop pages older than PAGE_CACHE_MAX_AGE, then all but the newest PAGE_CACHE_MAX_ENTRIES."""
+    with db.lock:
+        conn = _connect()
+        pruned = conn.execute("DELETE FROM pages WHERE fetched < ?", (time.time() - settings.page_cache_max_age,)).rowcount
+        pruned += conn.execute(
+            "DELETE FROM pages WHERE fetched <= "
+            "(SELECT fetched FROM pages ORDER BY fetched DESC LIMIT 1 OFFSET ?)",
+            (settings.page_cache_max_entries,),
+        ).rowcount
+        conn.commit()
+    _counters["page_pruned"] += pruned
+
+
+def _touch(url: str) -> None:
+    with db.lock:
+        conn = _connect()
+        conn.execute("UPDATE pages SET fetched = ? WHERE url = ?", (time.time(), url))
+        conn.commit()
+
+
+async def get(url: str, max_chars: int) -> dict | None:
+    """Cached text for `url` if it covers `max_chars`, flagged fresh or needing revalidation."""
+    if not settings.cache_enabled:
+        return None
+    try:
+        row = await asyncio.to_thread(_get, url)
+    except sqlite3.Error as e:
+        logger.warning(f"Page cache read failed: {e}")
+        return None
+    # A shorter cached extract only answers a larger request if it was the whole page.
+    if row is None or (row[1] < max_chars and len(row[0]) >= row[1]):
+        _counters["page_misses"] += 1
+        return None
+    text, _, etag, last_modified, fetched = row
+    fresh = time.time() - fetched < settings.page_cache_ttl
+    if not fresh and not (etag or last_modified):
+        _counters["page_misses"] += 1
+        return None
+    _counters["page_hits" if fresh else "page_revalidations"] += 1
+    return {"text": text, "etag": etag, "last_modified": last_modified, "fresh": fresh}
+
+
+async def set(url: str, text: str, max_chars: int, etag: str | None, last_modified: str | None) -> None:
+    if not settings.cache_enabled:
+        return
+    try:
+        await asyncio.to_thread(_set, url, text, max_chars, etag, last_modified)
+    except sqlite3.Error as e:
+        logger.warning(f"Page cache write failed: {e}")
+
+
+async def touch(url: str) -> None:
+    """Mark a revalidated (304) entry fresh again."""
+    try:
+        await asyncio.to_thread(_touch, url)
+    except sqlite3.Error as e:
+        logger.warning(f"Page cache write failed: {e}")
+
+
+def stats() -> dict:
+    return dict(_counters)
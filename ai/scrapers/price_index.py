@@ -0,0 +1,258 @@
+"""Local competitor price index, kept warm by a background refresher.
+
+Rows are keyed on the normalized product name and live in the same SQLite
+file as the other caches. Lookups are counted in memory and added to the
+products' demand scores in one write at the start of each refresher cycle; the
+refresher periodically re-fetches the most requested products before their
+entry expires, a few at a time with a pause in between, so competitor lookups
+are a local read in the common case. Concurrent misses for the same product
+share one live lookup. Scores decay each cycle so products nobody asks for
+anymore drop out of the refresh queue.
+
+Only one process refreshes at a time (a lease row in the same database), so
+several workers sharing the file do not multiply upstream traffic.
+"""
+
+import asyncio
+import json
+import sqlite3
+import time
+import uuid
+from collections.abc import Awaitable, Callable
+
+from loguru import logger
+
+from config import settings
+from scrapers.search_cache import normalize_query
+from services import db
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS price_index (
+    key TEXT PRIMARY KEY, product TEXT NOT NULL, data TEXT, refreshed REAL,
+    demand REAL NOT NULL DEFAULT 0, last_requested REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS price_index_lease (
+    id INTEGER PRIMARY KEY CHECK (id = 1), owner TEXT NOT NULL, expires REAL NOT NULL);
+"""
+_task: asyncio.Task | None = None
+_owner = uuid.uuid4().hex
+# normalized product -> [product, requests since the last flush, last requested at]
+_demand: dict[str, list] = {}
+_inflight: dict[str, asyncio.Task] = {}
+_counters = {"hits": 0, "misses": 0, "coalesced": 0, "refreshed": 0, "refresh_failures": 0, "cycles": 0}
+
+
+def _connect() -> sqlite3.Connection:
+    return db.connect(_SCHEMA)
+
+
+def _lookup(key: str) -> tuple | None:
+    """The (data, refreshed) row for `key`, if any."""
+    with db.lock:
+        return _connect().execute("SELECT data, refreshed FROM price_index WHERE key = ?", (key,)).fetchone()
+
+
+def _add_demand(rows: list[tuple[str, str, int, float]]) -> None:
+    with db.lock:
+        conn = _connect()
+        conn.executemany(
+            "INSERT INTO price_index (key, product, demand, last_requested) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET demand = demand + excluded.demand, "
+            "last_requested = max(last_requested, excluded.last_requested)",
+            rows,
+        )
+        conn.commit()
+
+
+def _store(key: str, product: str, data: dict) -> None:
+    with db.lock:
+        conn = _connect()
+        conn.execute(
+            "INSERT INTO price_index (key, product, data, refreshed, last_requested) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET data = excluded.data, refreshed = excluded.refreshed",
+            (key, product, json.dumps(data), time.time(), time.time()),
+        )
+        conn.commit()
+
+
+def _due(limit: int) -> list[tuple[str, str]]:
+    """Most requested products whose entry is missing or will expire before the next cycle."""
+    cutoff = time.time() - settings.price_index_ttl + settings.price_index_refresh_interval
+    with db.lock:
+        return _connect().execute(
+            "SELECT key, product FROM price_index "
+            "WHERE demand >= ? AND (refreshed IS NULL OR refreshed < ?) "
+            "ORDER BY demand DESC LIMIT ?",
+            (settings.price_index_min_demand, cutoff, limit),
+        ).fetchall()
+
+
+def _decay() -> None:
+    with db.lock:
+        conn = _connect()
+        conn.execute("UPDATE price_index SET demand = demand * ?", (settings.price_index_decay,))
+        # Forget products that are both unpopular and long expired.
+        conn.execute(
+            "DELETE FROM price_index WHERE demand < ? AND (refreshed IS NULL OR refreshed < ?)",
+            (settings.price_index_min_demand, time.time() - 4 * settings.price_index_ttl),
+        )
+        conn.commit()
+
+
+def _acquire_lease(duration: float) -> bool:
+    now = time.time()
+    with db.lock:
+        conn = _connect()
+        conn.execute(
+            "INSERT INTO price_index_lease (id, owner, expires) VALUES (1, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET owner = excluded.owner, expires = excluded.expires "
+            "WHERE price_index_lease.expires < ? OR price_index_lease.owner = excluded.owner",
+            (_owner, now + duration, now),
+        )
+        conn.commit()
+        row = conn.execute("SELECT owner FROM price_index_lease WHERE id = 1").fetchone()
+    return row is not None and row[0] == _owner
+
+
+def _count_request(key: str, product: str) -> None:
+    if settings.price_index_refresh_interval <= 0:
+        return  # demand only steers the refresher
+    entry = _demand.get(key)
+    if entry is None:
+        _demand[key] = [product, 1, time.time()]
+    else:
+        entry[1] += 1
+        entry[2] = time.time()
+
+
+async def flush_demand() -> None:
+    """Add the requests counted since the last flush to the stored demand scores."""
+    global _demand
+    if not _demand:
+        return
+    pending, _demand = _demand, {}
+    try:
+        await asyncio.to_thread(_add_demand, [(key, *entry) for key, entry in pending.items()])
+    except sqlite3.Error as e:
+        logger.warning(f"Price index demand write failed ({len(pending)} products): {e}")
+
+
+async def get(product: str) -> dict | None:
+    """Indexed competitor data for `product` if fresh; records the request either way."""
+    if not settings.price_index_enabled:
+        return None
+    key = normalize_query(product)
+    _count_request(key, product)
+    try:
+        row = await asyncio.to_thread(_lookup, key)
+    except sqlite3.Error as e:
+        logger.warning(f"Price index read failed: {e}")
+        return None
+    if row is None or row[0] is None or time.time() - row[1] > settings.price_index_ttl:
+        _counters["misses"] += 1
+        return None
+    _counters["hits"] += 1
+    return {**json.loads(row[0]), "indexed_at": row[1]}
+
+
+async def get_or_fetch(product: str, fetch: Callable[[str], Awaitable[dict]]) -> dict:
+    """Indexed data for `product`, else one live `fetch` shared by concurrent misses and then indexed."""
+    indexed = await get(product)
+    if indexed is not None:
+        return indexed
+
+    key = normalize_query(product)
+    task = _inflight.get(key)
+    if task is not None:
+        _counters["coalesced"] += 1
+        return await asyncio.shield(task)
+
+    async def fetch_and_put() -> dict:
+        data = await fetch(product)
+        await put(product, data)
+        return data
+
+    task = asyncio.create_task(fetch_and_put())
+    _inflight[key] = task
+
+    def _done(t: asyncio.Task) -> None:
+        if _inflight.get(key) is t:
+            del _inflight[key]
+
+    task.add_done_callback(_done)
+    return await asyncio.shield(task)
+
+
+async def put(product: str, data: dict) -> None:
+    """Index a live result. Results without listings are not stored, so the refresher retries them."""
+    if not settings.price_index_enabled or not data.get("listings"):
+        return
+    try:
+        await asyncio.to_thread(_store, normalize_query(product), product, data)
+    except sqlite3.Error as e:
+        logger.warning(f"Price index write failed: {e}")
+
+
+async def refresh_once(fetch: Callable[[str], Awaitable[dict]]) -> int:
+    """One refresher cycle: re-fetch up to `price_index_refresh_batch` due products, most requested first."""
+    await flush_demand()
+    lease = settings.price_index_refresh_interval + settings.price_index_refresh_batch * (
+        settings.price_index_refresh_delay + settings.tool_timeout
+    )
+    if not await asyncio.to_thread(_acquire_lease, lease):
+        return 0
+    due = await asyncio.to_thread(_due, settings.price_index_refresh_batch)
+    refreshed = 0
+    for i, (_, product) in enumerate(due):
+        if i:
+            await asyncio.sleep(settings.price_index_refresh_delay)
+        try:
+            data = await asyncio.wait_for(fetch(product), timeout=settings.tool_timeout)
+        except Exception as e:
+            _counters["refresh_failures"] += 1
+            logger.warning(f"Price index refresh failed for {product!r}: {e}")
+            continue
+        await put(product, data)
+        refreshed += 1
+    await asyncio.to_thread(_decay)
+    _counters["refreshed"] += refreshed
+    _counters["cycles"] += 1
+    if due:
+        logger.info(f"Price index refreshed {refreshed}/{len(due)} products")
+    return refreshed
+
+
+async def _refresh_loop(fetch: Callable[[str], Awaitable[dict]]) -> None:
+    while True:
+        try:
+            await refresh_once(fetch)
+        except Exception as e:
+            logger.warning(f"Price index refresh cycle failed: {e}")
+        await asyncio.sleep(settings.price_index_refresh_interval)
+
+
+def start(fetch: Callable[[str], Awaitable[dict]]) -> None:
+    """Start the background refresher; `fetch` does a live lookup for one product."""
+    global _task
+    if _task is None and settings.price_index_enabled and settings.price_index_refresh_interval > 0:
+        _task = asyncio.create_task(_refresh_loop(fetch), name="price_index_refresh")
+
+
+async def stop() -> None:
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
+    await flush_demand()
+
+
+def stats() -> dict:
+    return {
+        **_counters,
+        "pending_demand": len(_demand),
+        "inflight": len(_inflight),
+        "refresher_running": _task is not None,
+    }
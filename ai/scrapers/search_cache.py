@@ -0,0 +1,93 @@
+"""In-memory cache with single-flight coalescing for web searches.
+
+Queries are normalized (case, whitespace, token order) so near-identical
+searches from different agents share an entry, and concurrent identical
+searches wait on one upstream call instead of each hitting the provider.
+"""
+
+import asyncio
+import re
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+
+from config import settings
+
+_TOKEN = re.compile(r"[^\w:.\-₹]+")
+
+
+def normalize_query(query: str) -> str:
+    tokens = _TOKEN.split(query.lower())
+    return " ".join(sorted(t for t in tokens if t))
+
+
+class SearchCache:
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # normalized query -> (results, num_results requested, stored at)
+        self._entries: OrderedDict[str, tuple[list[dict], int, float]] = OrderedDict()
+        # normalized query -> (upstream task, num_results requested)
+        self._inflight: dict[str, tuple[asyncio.Task, int]] = {}
+        self.counters = {"hits": 0, "misses": 0, "coalesced": 0}
+
+    def _lookup(self, key: str, num_results: int) -> list[dict] | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        results, fetched, stored = entry
+        if time.monotonic() - stored > self.ttl:
+            del self._entries[key]
+            return None
+        if fetched < num_results and len(results) >= fetched:
+            return None  # a smaller search was cached; more results may exist
+        self._entries.move_to_end(key)
+        return results[:num_results]
+
+    def _store(self, key: str, results: list[dict], num_results: int) -> None:
+        if not results:
+            return  # never cache failures / empty responses
+        existing = self._entries.get(key)
+        if existing is not None and existing[1] > num_results and time.monotonic() - existing[2] <= self.ttl:
+            return  # keep the larger result set
+        self._entries[key] = (results, num_results, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_or_fetch(
+        self,
+        query: str,
+        num_results: int,
+        fetch: Callable[[str, int], Awaitable[list[dict]]],
+    ) -> list[dict]:
+        key = normalize_query(query)
+        cached = self._lookup(key, num_results)
+        if cached is not None:
+            self.counters["hits"] += 1
+            return cached
+
+        inflight = self._inflight.get(key)
+        if inflight is not None and inflight[1] >= num_results:
+            self.counters["coalesced"] += 1
+            results = await asyncio.shield(inflight[0])
+            return results[:num_results]
+
+        self.counters["misses"] += 1
+        task = asyncio.create_task(fetch(query, num_results))
+        self._inflight[key] = (task, num_results)
+
+        def _done(t: asyncio.Task) -> None:
+            if self._inflight.get(key, (None,))[0] is t:
+                del self._inflight[key]
+            if not t.cancelled() and t.exception() is None:
+                self._store(key, t.result(), num_results)
+
+        task.add_done_callback(_done)
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        return {**self.counters, "entries": len(self._entries), "inflight": len(self._inflight)}
+
+
+search_cache = SearchCache(ttl=settings.search_cache_ttl, max_entries=settings.search_cache_size)
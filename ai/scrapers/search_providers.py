@@ -0,0 +1,132 @@
+"""Pluggable async search providers behind scrapers.web_search.
+
+Blocking client libraries (DDGS) run on a thread pool so a search never stalls
+the event loop. Each provider caps its own in-flight searches, and the timeout
+covers the wait for a slot as well as the search itself. The pool has one
+thread per slot, and the DDGS client gets the same timeout, so a search that
+timed out does not keep a thread busy much longer.
+"""
+
+import asyncio
+import hashlib
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+from loguru import logger
+
+from config import settings
+from scrapers import http_client
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.search_concurrency,
+    thread_name_prefix="search",
+)
+
+
+class SearchProvider:
+    """Base provider. Subclasses implement `_search` and return {title, url, snippet} dicts."""
+
+    name = "base"
+
+    def __init__(self, concurrency: int, timeout: float):
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    async def search(self, query: str, num_results: int = 5) -> list[dict]:
+        async with asyncio.timeout(self.timeout), self._semaphore:
+            return await self._search(query, num_results)
+
+    async def _search(self, query: str, num_results: int) -> list[dict]:
+        raise NotImplementedError
+
+
+class DDGSProvider(SearchProvider):
+    """DuckDuckGo via the synchronous `ddgs` client, offloaded to a worker thread."""
+
+    name = "ddgs"
+
+    def _search_sync(self, query: str, num_results: int) -> list[dict]:
+        from ddgs import DDGS
+
+        results = DDGS(timeout=math.ceil(self.timeout)).text(query, max_results=num_results, region="in-en")
+        return [
+            {
+                "title": r.get("title", ""),
+                "url": r.get("href", ""),
+                "snippet": r.get("body", ""),
+            }
+            for r in results
+        ]
+
+    async def _search(self, query: str, num_results: int) -> list[dict]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_executor, self._search_sync, query, num_results)
+
+
+class SearxNGProvider(SearchProvider):
+    """A SearxNG instance (or anything serving its JSON API) at SEARCH_URL, via the shared HTTP client."""
+
+    name = "searxng"
+
+    async def _search(self, query: str, num_results: int) -> list[dict]:
+        resp = await http_client.get(settings.search_url, params={"q": query, "format": "json"})
+        resp.raise_for_status()
+        return [
+            {
+                "title": r.get("title", ""),
+                "url": r.get("url", ""),
+                "snippet": r.get("content", ""),
+            }
+            for r in resp.json().get("results", [])[:num_results]
+        ]
+
+
+class FakeSearchProvider(SearchProvider):
+    """Deterministic offline results with simulated latency, for load tests."""
+
+    name = "fake"
+
+    def __init__(self, concurrency: int, timeout: float, latency: float = 0.0):
+        super().__init__(concurrency, timeout)
+        self.latency = latency
+
+    async def _search(self, query: str, num_results: int) -> list[dict]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        seed = int(hashlib.sha1(query.encode()).hexdigest()[:8], 16)
+        sources = ["amazon.in", "flipkart.com", "meesho.com", "indiamart.com", "jiomart.com"]
+        results = []
+        for i in range(num_results):
+            source = sources[(seed + i) % len(sources)]
+            price = 100 + (seed >> i) % 1900
+            results.append({
+                "title": f"{query.title()} - listing {i + 1}",
+                "url": f"https://www.{source}/item/{seed % 10_000}-{i}",
+                "snippet": f"Buy {query} online at ₹{price:,}. Handmade, free delivery.",
+            })
+        return results
+
+
+PROVIDERS: dict[str, type[SearchProvider]] = {
+    DDGSProvider.name: DDGSProvider,
+    SearxNGProvider.name: SearxNGProvider,
+    FakeSearchProvider.name: FakeSearchProvider,
+}
+
+_provider: SearchProvider | None = None
+
+
+def get_provider() -> SearchProvider:
+    """Return the configured provider, creating it on first use."""
+    global _provider
+    if _provider is None:
+        name = settings.search_provider
+        if name not in PROVIDERS:
+            logger.warning(f"Unknown search provider '{name}', falling back to ddgs")
+            name = DDGSProvider.name
+        kwargs = {"concurrency": settings.search_concurrency, "timeout": settings.search_timeout}
+        if name == FakeSearchProvider.name:
+            kwargs["latency"] = settings.search_fake_latency
+        _provider = PROVIDERS[name](**kwargs)
+        logger.info(f"Search provider: {name}")
+    return _provider
@@ -1,45 +1,143 @@
-"""Web search via duckduckgo-search library (reliable, no API key needed)."""
+"""Web search via pluggable providers (DuckDuckGo by default, no API key needed)."""
+
+import asyncio
+import time
 
 import httpx
-from ddgs import DDGS
-from selectolax.parser import HTMLParser
-from fake_useragent import UserAgent
 from loguru import logger
 
-ua = UserAgent()
+from config import settings
 
+from scrapers import http_client, page_cache
+from scrapers.search_cache import search_cache
+from scrapers.search_providers import get_provider
+from services import cassette, cpu_pool, metrics, tracing
 
-async def web_search(query: str, num_results: int = 5) -> list[dict]:
-    """Search the web using DuckDuckGo. Returns list of {title, url, snippet}."""
+_user_agents = None
+
+_FIRST_CHECKPOINT = 64 * 1024
+_fetch_stats = {"bytes_read": 0, "early_stops": 0, "truncated": 0}
+
+
+async def _search_upstream(query: str, num_results: int) -> list[dict]:
+    provider = get_provider()
+    source = f"search:{provider.name}"
+    started = time.perf_counter()
     try:
-        results = DDGS().text(query, max_results=num_results, region="in-en")
-        return [
-            {
-                "title": r.get("title", ""),
-                "url": r.get("href", ""),
-                "snippet": r.get("body", ""),
-            }
-            for r in results
-        ]
+        with tracing.span(source):
+            if cassette.replaying():
+                results = await cassette.replay_search(query, num_results)
+            else:
+                results = await provider.search(query, num_results=num_results)
+                if cassette.recording():
+                    await cassette.record_search(query, num_results, results, started)
+    except asyncio.TimeoutError:
+        metrics.upstream_seconds.observe(time.perf_counter() - started, source, "timeout")
+        logger.warning(f"{provider.name} search timed out after {provider.timeout}s: {query}")
+        return []
     except Exception as e:
-        logger.warning(f"DuckDuckGo search failed: {e}")
+        metrics.upstream_seconds.observe(time.perf_counter() - started, source, "error")
+        logger.warning(f"{provider.name} search failed: {e}")
         return []
+    metrics.upstream_seconds.observe(time.perf_counter() - started, source, "ok")
+    return results
 
 
-async def fetch_page_content(url: str, max_chars: int = 3000) -> str:
-    """Fetch and extract text content from a URL."""
-    headers = {"User-Agent": ua.random}
-    async with httpx.AsyncClient() as client:
-        try:
-            resp = await client.get(url, headers=headers, timeout=10, follow_redirects=True)
-            resp.raise_for_status()
-        except Exception as e:
-            return f"Failed to fetch: {e}"
+async def web_search(query: str, num_results: int = 5) -> list[dict]:
+    """Search the web via the configured provider. Returns list of {title, url, snippet}.
+
+    Results are cached per normalized query and concurrent identical searches
+    share one upstream call.
+    """
+    return await search_cache.get_or_fetch(query, num_results, _search_upstream)
+
+
+def _extract_text(html: str, max_chars: int) -> str:
+    from selectolax.parser import HTMLParser
 
-    tree = HTMLParser(resp.text)
+    tree = HTMLParser(html)
 
     for tag in tree.css("script, style, nav, footer, header, aside"):
         tag.decompose()
 
     text = tree.body.text(separator="\n", strip=True) if tree.body else ""
     return text[:max_chars]
+
+
+def random_user_agent() -> str:
+    """A random browser User-Agent; fake_useragent loads its data file on first use."""
+    global _user_agents
+    if _user_agents is None:
+        from fake_useragent import UserAgent
+
+        _user_agents = UserAgent()
+    return _user_agents.random
+
+
+async def _read_text(resp: httpx.Response, max_chars: int) -> str:
+    """Stream the body until FETCH_MAX_BYTES or until `max_chars` of text are available.
+
+    The partial document is re-parsed at doubling checkpoints, so the total
+    parse work stays proportional to the bytes actually read.
+    """
+    encoding = resp.encoding or "utf-8"
+    buf = bytearray()
+    checkpoint = _FIRST_CHECKPOINT
+    async for chunk in resp.aiter_bytes():
+        buf += chunk
+        if len(buf) >= settings.fetch_max_bytes:
+            del buf[settings.fetch_max_bytes:]
+            _fetch_stats["truncated"] += 1
+            break
+        if len(buf) >= checkpoint:
+            checkpoint *= 2
+            html = buf.decode(encoding, errors="replace")
+            text = await cpu_pool.run("html_extract", _extract_text, html, max_chars, size=len(buf))
+            if len(text) >= max_chars:
+                _fetch_stats["early_stops"] += 1
+                _fetch_stats["bytes_read"] += len(buf)
+                return text
+    _fetch_stats["bytes_read"] += len(buf)
+    html = buf.decode(encoding, errors="replace")
+    return await cpu_pool.run("html_extract", _extract_text, html, max_chars, size=len(buf))
+
+
+async def fetch_page_content(url: str, max_chars: int = 3000) -> str:
+    """Fetch and extract text content from a URL.
+
+    Extracted text is cached per URL; once older than PAGE_CACHE_TTL it is
+    revalidated with ETag / Last-Modified before being fetched again.
+    """
+    cached = await page_cache.get(url, max_chars)
+    if cached is not None and cached["fresh"]:
+        return cached["text"][:max_chars]
+
+    headers = {"User-Agent": random_user_agent()}
+    if cached is not None:
+        if cached["etag"]:
+            headers["If-None-Match"] = cached["etag"]
+        if cached["last_modified"]:
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    started = time.perf_counter()
+    try:
+        async with http_client.stream(url, headers=headers) as resp:
+            if resp.status_code == 304 and cached is not None:
+                metrics.upstream_seconds.observe(time.perf_counter() - started, "fetch_page", "not_modified")
+                await page_cache.touch(url)
+                return cached["text"][:max_chars]
+            resp.raise_for_status()
+            text = await _read_text(resp, max_chars)
+            etag = resp.headers.get("etag")
+            last_modified = resp.headers.get("last-modified")
+    except Exception as e:
+        metrics.upstream_seconds.observe(time.perf_counter() - started, "fetch_page", "error")
+        return f"Failed to fetch: {e}"
+    metrics.upstream_seconds.observe(time.perf_counter() - started, "fetch_page", "ok")
+
+    await page_cache.set(url, text, max_chars, etag, last_modified)
+    return text
+
+
+def fetch_stats() -> dict:
+    return {**_fetch_stats, **page_cache.stats()}
@@ -0,0 +1,40 @@
+"""Production entry point: `uv run python server.py`.
+
+Runs WORKERS uvicorn worker processes without reload, with the event loop,
+HTTP parser, keep-alive, backlog and concurrency limit taken from Settings.
+Each worker runs the lifespan on its own, so pools, caches and the CPU
+process pool exist once per worker. On SIGTERM / SIGINT workers stop
+accepting connections and give in-flight requests SERVER_SHUTDOWN_TIMEOUT
+seconds to finish (see services/health.py).
+
+For development use `uv run python main.py` (single process, auto-reload).
+"""
+
+import uvicorn
+from loguru import logger
+
+from config import settings
+
+
+def main() -> None:
+    logger.info(
+        f"Starting Rangaayan AI on {settings.host}:{settings.port} with {settings.workers} worker(s), "
+        f"loop={settings.server_loop} http={settings.server_http}"
+    )
+    uvicorn.run(
+        "main:app",
+        host=settings.host,
+        port=settings.port,
+        workers=settings.workers,
+        loop=settings.server_loop,
+        http=settings.server_http,
+        timeout_keep_alive=settings.server_keepalive_timeout,
+        timeout_graceful_shutdown=settings.server_shutdown_timeout,
+        backlog=settings.server_backlog,
+        limit_concurrency=settings.server_limit_concurrency or None,
+        access_log=settings.server_access_log,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,14 @@
 """AI pricing service using Kimi K2.5 via OpenRouter with tool calling."""
 
+import re
 from collections.abc import AsyncGenerator
 from datetime import datetime
+from functools import partial
 
+from config import settings
+from services import llm_routing
 from services.llm_client import chat_with_tools, chat_with_tools_stream
+from services.result_cache import ResultCache, cacheable, make_key
 from scrapers.web_search import web_search, fetch_page_content
 from scrapers.marketplace import get_competitor_data
 
@@ -127,6 +132,18 @@ async def _handle_calculate_margin(
     }
 
 
+HEADER_PATTERN = re.compile(r"SUGGESTED_PRICE:\s*₹?\s*([\d,]+(?:\.\d+)?)")
+
+
+def _parse_price_header(line: str) -> dict | None:
+    match = HEADER_PATTERN.search(line)
+    if not match:
+        return None
+    return {"suggested_price": float(match.group(1).replace(",", ""))}
+
+
+pricing_cache = ResultCache("pricing", ttl=settings.cache_pricing_ttl)
+
 TOOL_HANDLERS = {
     "web_search": _handle_web_search,
     "fetch_page": _handle_fetch_page,
@@ -158,24 +175,60 @@ def _build_messages(
     ]
 
 
-async def get_pricing_suggestion(
+def to_result(product_name: str, analysis: str, fast: bool = False) -> dict:
+    """Result body of one analysis, as returned, cached and stored for jobs.
+
+    `fast` marks answers that ran on the fast LLM route (asked for or downgraded).
+    """
+    return {
+        "product": product_name,
+        "analysis": analysis,
+        "fast": fast,
+        "generated_at": datetime.now().isoformat(),
+    }
+
+
+async def _analyze(
     product_name: str,
-    cost_price: float | None = None,
-    category: str | None = None,
-    quality: str | None = None,
-    location: str | None = None,
+    cost_price: float | None,
+    category: str | None,
+    quality: str | None,
+    location: str | None,
+    fast: bool = False,
 ) -> dict:
     messages = _build_messages(product_name, cost_price, category, quality, location)
+    routes: list[str] = []
     analysis = await chat_with_tools(
         messages=messages,
         tools=PRICING_TOOLS,
         tool_handlers=TOOL_HANDLERS,
+        endpoint="pricing",
+        fast=fast,
+        routes=routes,
     )
-    return {
-        "product": product_name,
-        "analysis": analysis,
-        "generated_at": datetime.now().isoformat(),
-    }
+    return to_result(product_name, analysis, llm_routing.ran_fast(routes))
+
+
+async def get_pricing_suggestion(
+    product_name: str,
+    cost_price: float | None = None,
+    category: str | None = None,
+    quality: str | None = None,
+    location: str | None = None,
+    fast: bool = False,
+) -> dict:
+    """Cached analysis if available; `fast` answers a miss on the fast LLM route (not cached).
+
+    Stale entries are always refreshed with a full analysis, since a fast one would not be cached.
+    """
+    key = make_key(product_name=product_name, cost_price=cost_price, category=category, quality=quality, location=location)
+    result, status = await pricing_cache.get_or_compute(
+        key,
+        partial(_analyze, product_name, cost_price, category, quality, location, fast),
+        cacheable(_parse_price_header),
+        partial(_analyze, product_name, cost_price, category, quality, location),
+    )
+    return {**result, "cache": status}
 
 
 async def get_pricing_suggestion_stream(
@@ -184,11 +237,25 @@ async def get_pricing_suggestion_stream(
     category: str | None = None,
     quality: str | None = None,
     location: str | None = None,
+    fast: bool = False,
 ) -> AsyncGenerator[dict, None]:
-    messages = _build_messages(product_name, cost_price, category, quality, location)
-    async for event in chat_with_tools_stream(
-        messages=messages,
-        tools=PRICING_TOOLS,
-        tool_handlers=TOOL_HANDLERS,
+    def events() -> AsyncGenerator[dict, None]:
+        return chat_with_tools_stream(
+            messages=_build_messages(product_name, cost_price, category, quality, location),
+            tools=PRICING_TOOLS,
+            tool_handlers=TOOL_HANDLERS,
+            endpoint="pricing",
+            header_parser=_parse_price_header,
+            fast=fast,
+        )
+
+    key = make_key(product_name=product_name, cost_price=cost_price, category=category, quality=quality, location=location)
+    async for event in pricing_cache.stream(
+        key,
+        events,
+        partial(_analyze, product_name, cost_price, category, quality, location),
+        cacheable(_parse_price_header),
+        partial(to_result, product_name),
+        _parse_price_header,
     ):
         yield event
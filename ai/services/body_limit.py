@@ -0,0 +1,51 @@
+"""Request body limits enforced before FastAPI parses multipart forms.
+
+An endpoint with File(...) parameters only runs once the whole form has been
+received and spooled, so a size check in the handler comes too late. This
+middleware rejects a request to a limited path straight away when its
+Content-Length is over the limit, and otherwise counts body bytes as they
+arrive and fails the request with 413 as soon as the limit is passed.
+"""
+
+from collections.abc import Callable
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+
+class BodyLimitMiddleware:
+    """`limits()` maps request paths to their largest accepted body in bytes."""
+
+    def __init__(self, app, limits: Callable[[], dict[str, int]]):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        path = scope["path"].rstrip("/")
+        limit = next((value for key, value in self.limits().items() if key.rstrip("/") == path), None)
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        declared = dict(scope["headers"]).get(b"content-length", b"")
+        if declared.isdigit() and int(declared) > limit:
+            response = JSONResponse({"detail": f"Request exceeds {limit} bytes"}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Raised inside form parsing; FastAPI re-raises HTTPException and renders the 413.
+                    raise HTTPException(status_code=413, detail=f"Request exceeds {limit} bytes")
+            return message
+
+        await self.app(scope, limited_receive, send)
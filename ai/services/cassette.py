@@ -0,0 +1,272 @@
+"""Record / replay of LLM, search and scraper HTTP traffic ("cassettes").
+
+CASSETTE_MODE=record appends every LLM completion (streamed chunks with their
+offsets), search-provider call and scraper HTTP response to CASSETTE_PATH, one
+JSON interaction per line. CASSETTE_MODE=replay serves them back with no
+network access, sleeping the recorded durations times CASSETTE_TIME_SCALE
+(0 replays instantly).
+
+Replay matches a request exactly (same prompt / query / URL) when it can;
+otherwise it takes the lane's next recorded interaction in recorded order,
+wrapping around. LLM lanes are endpoint + agent turn (assistant messages so
+far) + stream/plain, search has one lane and HTTP one per host. A trace
+recorded before a prompt or compaction change therefore still replays, with
+the model making the same tool calls turn by turn and results of the same
+sizes.
+
+Recorded data is redacted: inline images become hashes, credential-looking
+query parameters and the OpenRouter key are masked, and only a few response
+headers are kept.
+"""
+
+import asyncio
+import base64
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import httpx
+from loguru import logger
+
+from config import settings
+
+RECORD = "record"
+REPLAY = "replay"
+
+_SECRET_PARAM = re.compile(r"key|token|secret|passw|auth|sig", re.IGNORECASE)
+_KEPT_HEADERS = ("content-type", "etag", "last-modified", "cache-control", "retry-after")
+
+_write_lock = threading.Lock()
+_interactions: list[dict] | None = None
+_by_key: dict[str, list[dict]] = defaultdict(list)
+_by_lane: dict[str, list[dict]] = defaultdict(list)
+_cursors: dict[str, int] = defaultdict(int)
+_counters = {"recorded": 0, "replayed_exact": 0, "replayed_lane": 0, "misses": 0}
+
+
+class CassetteMiss(Exception):
+    """Replay found no recorded interaction for a request."""
+
+
+def recording() -> bool:
+    return settings.cassette_mode == RECORD
+
+
+def replaying() -> bool:
+    return settings.cassette_mode == REPLAY
+
+
+# --- Redaction / keys ------------------------------------------------------------
+
+
+def _redact_url(url: str) -> str:
+    parts = urlsplit(url)
+    query = [(k, "REDACTED" if _SECRET_PARAM.search(k) else v) for k, v in parse_qsl(parts.query, keep_blank_values=True)]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def _redact_messages(messages: list[dict]) -> list[dict]:
+    """Messages with inline (data URL) images replaced by their hash."""
+    redacted = []
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, list):
+            parts = []
+            for part in content:
+                url = (part.get("image_url") or {}).get("url", "")
+                if url.startswith("data:"):
+                    digest = hashlib.sha1(url.encode()).hexdigest()[:16]
+                    part = {**part, "image_url": {**part["image_url"], "url": f"data:redacted;sha1={digest}"}}
+                parts.append(part)
+            message = {**message, "content": parts}
+        redacted.append(message)
+    return redacted
+
+
+def _key(*parts) -> str:
+    return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _llm_lane(endpoint: str, kwargs: dict) -> str:
+    turn = sum(1 for m in kwargs.get("messages", []) if m.get("role") == "assistant")
+    return f"{endpoint}:{turn}:{'stream' if kwargs.get('stream') else 'plain'}"
+
+
+def _llm_request(kwargs: dict) -> dict:
+    return {
+        "model": kwargs.get("model"),
+        "messages": _redact_messages(kwargs.get("messages", [])),
+        "tools": [tool["function"]["name"] for tool in kwargs.get("tools") or []],
+        "max_tokens": kwargs.get("max_tokens"),
+        "stream": bool(kwargs.get("stream")),
+    }
+
+
+# --- Storage -------------------------------------------------------------------------
+
+
+def _append(line: str) -> None:
+    path = Path(settings.cassette_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with _write_lock, path.open("a", encoding="utf-8") as f:
+        f.write(line + "\n")
+
+
+async def _record(kind: str, lane: str, key: str, request: dict, response: dict, elapsed: float) -> None:
+    line = json.dumps({
+        "kind": kind, "lane": lane, "key": key, "request": request, "response": response, "elapsed": round(elapsed, 4),
+    }, ensure_ascii=False)
+    if settings.openrouter_api_key:
+        line = line.replace(settings.openrouter_api_key, "REDACTED")
+    await asyncio.to_thread(_append, line)
+    _counters["recorded"] += 1
+
+
+def load() -> int:
+    """Read CASSETTE_PATH for replay; returns the number of interactions."""
+    global _interactions
+    _interactions = []
+    _by_key.clear()
+    _by_lane.clear()
+    _cursors.clear()
+    path = Path(settings.cassette_path)
+    if not path.exists():
+        logger.warning(f"Cassette {path} not found; every replayed call will miss")
+        return 0
+    with path.open(encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                interaction = json.loads(line)
+                _interactions.append(interaction)
+                _by_key[interaction["key"]].append(interaction)
+                _by_lane[f"{interaction['kind']}:{interaction['lane']}"].append(interaction)
+    logger.info(f"Replaying {len(_interactions)} interactions from {path} (time scale {settings.cassette_time_scale})")
+    return len(_interactions)
+
+
+async def start() -> None:
+    if replaying():
+        await asyncio.to_thread(load)
+
+
+def _find(kind: str, lane: str, key: str) -> dict:
+    if _interactions is None:
+        load()
+    lane_key = f"{kind}:{lane}"
+    for name, candidates, counter in (
+        (key, _by_key.get(key), "replayed_exact"),
+        (lane_key, _by_lane.get(lane_key), "replayed_lane"),
+    ):
+        if candidates:
+            interaction = candidates[_cursors[name] % len(candidates)]
+            _cursors[name] += 1
+            _counters[counter] += 1
+            return interaction
+    _counters["misses"] += 1
+    raise CassetteMiss(f"No recorded {kind} interaction for {lane}")
+
+
+async def _sleep(seconds: float) -> None:
+    if seconds > 0 and settings.cassette_time_scale > 0:
+        await asyncio.sleep(seconds * settings.cassette_time_scale)
+
+
+# --- LLM -----------------------------------------------------------------------------
+
+
+async def record_llm(endpoint: str, kwargs: dict, response, started: float):
+    """Record a completion; streams are wrapped and recorded once fully read."""
+    request = _llm_request(kwargs)
+    key = _key("llm", request)
+    lane = _llm_lane(endpoint, kwargs)
+    if not kwargs.get("stream"):
+        await _record("llm", lane, key, request, response.model_dump(mode="json"), time.perf_counter() - started)
+        return response
+
+    async def recorded_stream():
+        chunks = []
+        async for chunk in response:
+            chunks.append([round(time.perf_counter() - started, 4), chunk.model_dump(mode="json")])
+            yield chunk
+        await _record("llm", lane, key, request, {"chunks": chunks}, time.perf_counter() - started)
+
+    return recorded_stream()
+
+
+async def replay_llm(endpoint: str, kwargs: dict):
+    """A recorded ChatCompletion, or an async iterator of ChatCompletionChunk for streams."""
+    from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+    interaction = _find("llm", _llm_lane(endpoint, kwargs), _key("llm", _llm_request(kwargs)))
+    response = interaction["response"]
+    if "chunks" not in response:
+        await _sleep(interaction["elapsed"])
+        return ChatCompletion.model_validate(response)
+
+    async def replayed_stream():
+        previous = 0.0
+        for offset, chunk in response["chunks"]:
+            await _sleep(offset - previous)
+            previous = offset
+            yield ChatCompletionChunk.model_validate(chunk)
+
+    return replayed_stream()
+
+
+# --- Search --------------------------------------------------------------------------
+
+
+async def record_search(query: str, num_results: int, results: list[dict], started: float) -> None:
+    request = {"query": query, "num_results": num_results}
+    await _record("search", "search", _key("search", request), request, {"results": results}, time.perf_counter() - started)
+
+
+async def replay_search(query: str, num_results: int) -> list[dict]:
+    request = {"query": query, "num_results": num_results}
+    interaction = _find("search", "search", _key("search", request))
+    await _sleep(interaction["elapsed"])
+    return interaction["response"]["results"]
+
+
+# --- Scraper HTTP --------------------------------------------------------------------
+
+
+def _http_key(url: str, params: dict | None) -> tuple[str, str]:
+    full = str(httpx.URL(url, params=params)) if params else url
+    redacted = _redact_url(full)
+    return redacted, _key("http", "GET", redacted)
+
+
+async def record_http(url: str, params: dict | None, resp: httpx.Response, body: bytes, started: float) -> None:
+    """Record a response under the URL the caller asked for (not where redirects led), as replay looks it up."""
+    url, key = _http_key(url, params)
+    try:
+        stored = {"text": body.decode("utf-8")}
+    except UnicodeDecodeError:
+        stored = {"base64": base64.b64encode(body).decode()}
+    response = {
+        "status": resp.status_code,
+        "headers": {k: v for k, v in resp.headers.items() if k.lower() in _KEPT_HEADERS},
+        **stored,
+    }
+    await _record("http", urlsplit(url).hostname or "", key, {"method": "GET", "url": url}, response, time.perf_counter() - started)
+
+
+async def replay_http(url: str, params: dict | None = None) -> httpx.Response:
+    redacted, key = _http_key(url, params)
+    interaction = _find("http", urlsplit(redacted).hostname or "", key)
+    await _sleep(interaction["elapsed"])
+    response = interaction["response"]
+    body = response["text"].encode("utf-8") if "text" in response else base64.b64decode(response["base64"])
+    return httpx.Response(
+        response["status"], headers=response["headers"], content=body, request=httpx.Request("GET", url, params=params)
+    )
+
+
+def stats() -> dict:
+    return {"mode": settings.cassette_mode, **_counters, "loaded": len(_interactions) if _interactions is not None else None}
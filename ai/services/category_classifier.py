@@ -0,0 +1,218 @@
+"""Local product-category classifier used in front of the LLM.
+
+A multinomial naive Bayes model over word tokens and character n-grams,
+seeded with keyword lists and retrained from the categories the LLM picks.
+Prediction takes microseconds, so confident cases skip the LLM's category
+step; ambiguous names still go to the model.
+
+Two label sets exist: "describe" (description.CATEGORIES) and "detect"
+(object_detection.PRODUCT_CATEGORIES).
+"""
+
+import asyncio
+import math
+import re
+import sqlite3
+import time
+from collections import Counter
+
+from loguru import logger
+
+from config import settings
+from services import db
+
+SEEDS: dict[str, dict[str, list[str]]] = {
+    "describe": {
+        "Weaving": ["handloom saree", "woven shawl", "cotton weave fabric", "ikat dupatta", "woollen stole", "loom woven mat", "silk saree", "khadi cloth"],
+        "Pottery": ["clay pot", "terracotta vase", "earthen diya", "ceramic mug", "clay kulhad", "matka water pot", "terracotta planter"],
+        "Embroidery": ["embroidered cushion cover", "chikankari kurta", "phulkari dupatta", "kantha stitch quilt", "mirror work bag", "hand embroidery"],
+        "Food": ["organic turmeric powder", "mango pickle", "wild honey", "jaggery", "millet flour", "spice masala", "papad", "ghee", "chutney", "dry fruit laddoo", "cold pressed mustard oil"],
+        "Jewellery": ["silver earrings", "beaded necklace", "tribal bangles", "terracotta jewellery set", "oxidised anklet", "brass nose ring", "pendant"],
+        "Painting": ["madhubani painting", "warli art canvas", "pattachitra", "gond painting", "kalamkari art", "hand painted wall hanging"],
+        "Basket Weaving": ["bamboo basket", "cane basket", "jute basket", "sabai grass tray", "woven storage basket", "wicker hamper"],
+        "Tailoring": ["stitched blouse", "cotton kurti", "school uniform", "tailored salwar suit", "petticoat", "frock", "jute bag stitched"],
+    },
+    "detect": {
+        "handicraft": ["handmade decor", "wall hanging", "showpiece", "craft item", "toran"],
+        "textile": ["cotton fabric", "kurta", "dupatta", "shawl", "bedsheet"],
+        "pottery": ["clay pot", "terracotta vase", "earthen diya", "ceramic mug", "kulhad"],
+        "jewelry": ["earrings", "necklace", "bangles", "anklet", "pendant", "bracelet", "terracotta jewellery"],
+        "food_grain": ["rice", "wheat", "millet", "ragi", "dal lentils", "flour atta"],
+        "spice": ["turmeric powder", "chilli powder", "garam masala", "cardamom", "black pepper", "cumin"],
+        "pickle": ["mango pickle", "lemon pickle", "achar", "mixed vegetable pickle", "garlic pickle"],
+        "oil": ["mustard oil", "coconut oil", "sesame oil", "groundnut oil", "cold pressed oil"],
+        "basket_weaving": ["bamboo basket", "cane basket", "grass basket", "wicker basket", "storage basket"],
+        "embroidery": ["embroidered cushion", "chikankari", "phulkari", "kantha stitch", "mirror work"],
+        "leather_craft": ["leather bag", "kolhapuri chappal", "leather wallet", "mojari", "leather belt"],
+        "metal_craft": ["brass lamp", "copper bottle", "bell metal", "dhokra figurine", "bidri ware"],
+        "wood_craft": ["wooden toy", "carved wood box", "channapatna toy", "wooden spoon", "wood carving"],
+        "bamboo_craft": ["bamboo lamp", "bamboo bottle", "bamboo furniture", "bamboo tray", "bamboo toothbrush"],
+        "jute_product": ["jute bag", "jute rug", "jute doormat", "jute tote", "jute rope"],
+        "honey": ["wild honey", "forest honey", "raw honey", "organic honey", "multiflora honey"],
+        "dairy_product": ["ghee", "paneer", "butter", "khoa", "curd"],
+        "organic_produce": ["organic vegetables", "organic fruits", "fresh produce", "organic jaggery", "farm fresh"],
+        "herbal_product": ["herbal soap", "amla hair oil", "neem powder", "ayurvedic balm", "herbal tea"],
+        "handloom": ["handloom saree", "handwoven fabric", "ikat", "khadi", "loom woven"],
+    },
+}
+
+_WORD = re.compile(r"[a-z]+")
+
+
+def _features(text: str) -> list[str]:
+    words = _WORD.findall(text.lower())
+    features = [f"w:{word}" for word in words]
+    for word in words:
+        padded = f"^{word}$"
+        for n in (3, 4):
+            features.extend(f"c:{padded[i:i + n]}" for i in range(len(padded) - n + 1))
+    return features
+
+
+class NgramClassifier:
+    """Multinomial naive Bayes with add-one smoothing.
+
+    A word contributes itself plus a dozen overlapping n-grams, and naive Bayes
+    treats all of them as independent evidence, which pushes posteriors to 1.0.
+    The log-likelihood is scaled by sqrt(words / features) to temper that, and
+    names whose words are mostly unknown (under MIN_KNOWN_FRACTION of them)
+    get no label: one shared word such as "water" or "cover" is not enough.
+    The scaling and CLASSIFIER_THRESHOLD were set with benchmarks.classifier_eval.
+    """
+
+    MIN_KNOWN_FRACTION = 0.5
+
+    def __init__(self, labels: list[str]):
+        self.labels = labels
+        self._log_prior: dict[str, float] = {}
+        self._log_likelihood: dict[str, dict[str, float]] = {}
+        self._log_unseen: dict[str, float] = {}
+        self._vocabulary: set[str] = set()
+
+    def fit(self, samples: list[tuple[str, str]]) -> None:
+        docs = Counter(label for _, label in samples)
+        counts: dict[str, Counter] = {label: Counter() for label in self.labels}
+        for text, label in samples:
+            counts[label].update(_features(text))
+        vocabulary = set().union(*counts.values())
+        total_docs = sum(docs.values())
+        for label in self.labels:
+            total = sum(counts[label].values()) + len(vocabulary)
+            self._log_prior[label] = math.log((docs[label] + 1) / (total_docs + len(self.labels)))
+            self._log_likelihood[label] = {f: math.log((c + 1) / total) for f, c in counts[label].items()}
+            self._log_unseen[label] = math.log(1 / total)
+        self._vocabulary = vocabulary
+
+    def predict(self, text: str) -> tuple[str | None, float]:
+        """Best label and its posterior probability (0.0 when too few words are known)."""
+        words = [word for word in _WORD.findall(text.lower()) if len(word) > 2]
+        known = sum(f"w:{word}" in self._vocabulary for word in words)
+        features = [f for f in _features(text) if f in self._vocabulary]
+        if not known or known < self.MIN_KNOWN_FRACTION * len(words):
+            return None, 0.0
+        weight = math.sqrt(len(words) / len(features))
+        scores = {}
+        for label in self.labels:
+            likelihood = self._log_likelihood[label]
+            unseen = self._log_unseen[label]
+            scores[label] = self._log_prior[label] + weight * sum(likelihood.get(f, unseen) for f in features)
+        best = max(scores, key=scores.get)
+        norm = sum(math.exp(score - scores[best]) for score in scores.values())
+        return best, 1 / norm
+
+
+_models: dict[str, NgramClassifier] = {}
+_pending_samples: Counter = Counter()
+_counters = {"local": 0, "llm": 0, "samples_recorded": 0, "retrains": 0}
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS category_samples (
+    label_set TEXT NOT NULL, text TEXT NOT NULL, category TEXT NOT NULL,
+    llm_ms REAL, created REAL NOT NULL, PRIMARY KEY (label_set, text));
+"""
+
+
+def _connect() -> sqlite3.Connection:
+    return db.connect(_SCHEMA)
+
+
+def load_samples(label_set: str) -> list[tuple[str, str, float | None]]:
+    """LLM-labelled (text, category, llm_ms) rows accumulated so far."""
+    with db.lock:
+        return _connect().execute(
+            "SELECT text, category, llm_ms FROM category_samples WHERE label_set = ?", (label_set,)
+        ).fetchall()
+
+
+def _insert_sample(label_set: str, text: str, category: str, llm_ms: float | None) -> None:
+    with db.lock:
+        conn = _connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO category_samples (label_set, text, category, llm_ms, created) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (label_set, text, category, llm_ms, time.time()),
+        )
+        conn.commit()
+
+
+def train(label_set: str, samples: list[tuple[str, str]] | None = None) -> NgramClassifier:
+    """Fit a model on the seed keywords plus `samples` (default: all recorded LLM labels)."""
+    seeds = SEEDS[label_set]
+    if samples is None:
+        samples = [(text, category) for text, category, _ in load_samples(label_set)]
+    model = NgramClassifier(list(seeds))
+    model.fit(
+        [(text, label) for label, texts in seeds.items() for text in texts]
+        + [(text, label) for text, label in samples if label in seeds]
+    )
+    return model
+
+
+def _model(label_set: str) -> NgramClassifier:
+    model = _models.get(label_set)
+    if model is None:
+        try:
+            model = train(label_set)
+        except sqlite3.Error as e:
+            logger.warning(f"Category samples unavailable, using seed keywords only: {e}")
+            model = train(label_set, samples=[])
+        _models[label_set] = model
+    return model
+
+
+async def load() -> None:
+    """Train all label sets off the event loop (called from the lifespan)."""
+    for label_set in SEEDS:
+        _models[label_set] = await asyncio.to_thread(_model, label_set)
+
+
+def classify(label_set: str, text: str) -> tuple[str | None, float]:
+    """Local category if confidence reaches CLASSIFIER_THRESHOLD, else (None, confidence)."""
+    if not settings.classifier_enabled or not text:
+        return None, 0.0
+    label, confidence = _model(label_set).predict(text)
+    if label is not None and confidence >= settings.classifier_threshold:
+        _counters["local"] += 1
+        return label, confidence
+    _counters["llm"] += 1
+    return None, confidence
+
+
+async def record(label_set: str, text: str, category: str | None, llm_ms: float | None = None) -> None:
+    """Store an LLM-chosen category as a training sample; retrain every CLASSIFIER_RETRAIN_EVERY samples."""
+    if not text or category not in SEEDS[label_set]:
+        return
+    try:
+        await asyncio.to_thread(_insert_sample, label_set, text.strip().lower(), category, llm_ms)
+    except sqlite3.Error as e:
+        logger.warning(f"Failed to record category sample: {e}")
+        return
+    _counters["samples_recorded"] += 1
+    _pending_samples[label_set] += 1
+    if _pending_samples[label_set] >= settings.classifier_retrain_every:
+        _pending_samples[label_set] = 0
+        _counters["retrains"] += 1
+        _models[label_set] = await asyncio.to_thread(train, label_set)
+
+
+def stats() -> dict:
+    return dict(_counters)
@@ -0,0 +1,161 @@
+"""Prompt token budget for the agent tool loop.
+
+The full message history is re-sent on every iteration, so large tool results
+(page text, competitor listings, search snippets) are paid for again and
+again. Before each LLM call the history is fitted to CONTEXT_TOKEN_BUDGET:
+tool results from earlier turns are compacted first, the latest turn's only
+if that is not enough. The caller's `messages` list keeps the full results;
+only the copy sent to the model is compacted.
+
+Token counts are estimates (UTF-8 bytes / 4), good enough for budgeting.
+"""
+
+import json
+
+from loguru import logger
+
+from config import settings
+
+_BYTES_PER_TOKEN = 4
+_MAX_LEVEL = 3
+_IMAGE_TOKENS = 765  # a 1024x1024 image at high detail; uploads are downsized below that
+
+_counters = {"requests": 0, "llm_calls": 0, "prompt_tokens": 0, "prompt_tokens_saved": 0}
+
+
+def estimate_tokens(text: str | None) -> int:
+    if not text:
+        return 0
+    return -(-len(text.encode("utf-8")) // _BYTES_PER_TOKEN)
+
+
+def _content_tokens(content: str | list | None) -> int:
+    """Text, or multimodal parts: their text plus a flat cost per image."""
+    if not isinstance(content, list):
+        return estimate_tokens(content)
+    return sum(estimate_tokens(part.get("text")) if part.get("type") == "text" else _IMAGE_TOKENS for part in content)
+
+
+def _message_tokens(message: dict) -> int:
+    tokens = 4 + _content_tokens(message.get("content"))
+    for tool_call in message.get("tool_calls") or []:
+        tokens += estimate_tokens(tool_call["function"]["name"]) + estimate_tokens(tool_call["function"]["arguments"])
+    return tokens
+
+
+def _truncate(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[:limit] + " …[truncated]"
+
+
+def _compact_competitors(data: dict, level: int) -> dict:
+    listings = data.get("listings") or []
+    compact = {"product": data.get("product"), "price_summary": data.get("price_summary")}
+    trends = data.get("trends") or {}
+    if level == 1:
+        compact["listings"] = [
+            {"title": _truncate(item.get("title", ""), 80), "price_inr": item.get("price_inr"), "source": item.get("source")}
+            for item in listings
+        ]
+        compact["trends"] = {
+            "demand_signal": trends.get("demand_signal"),
+            "related_searches": (trends.get("related_searches") or [])[:5],
+        }
+    else:
+        # Reduce listings to per-marketplace price summaries.
+        by_source: dict[str, list[float]] = {}
+        for item in listings:
+            by_source.setdefault(item.get("source", "other"), []).append(item.get("price_inr"))
+        compact["by_source"] = {
+            source: {"count": len(prices), "min": min(prices), "max": max(prices)}
+            for source, prices in by_source.items()
+        }
+        compact["demand_signal"] = trends.get("demand_signal")
+    return compact
+
+
+def _compact_search(results: list, level: int) -> list:
+    if level == 1:
+        return [{**r, "snippet": _truncate(r.get("snippet", ""), 160)} for r in results]
+    return [{"title": r.get("title", ""), "url": r.get("url", "")} for r in results[:5]]
+
+
+def compact_tool_result(name: str, content: str, level: int) -> str:
+    """Smaller version of a tool message. Level 1 trims, level 2 summarizes, level 3 is a stub."""
+    if level <= 0:
+        return content
+    if level >= _MAX_LEVEL:
+        return _truncate(content, 200)
+    try:
+        data = json.loads(content)
+    except ValueError:
+        data = None
+
+    if name == "get_competitor_prices" and isinstance(data, dict):
+        compact = json.dumps(_compact_competitors(data, level), ensure_ascii=False)
+    elif name == "web_search" and isinstance(data, list):
+        compact = json.dumps(_compact_search(data, level), ensure_ascii=False)
+    elif data is not None:
+        compact = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+        if level == 2:
+            compact = _truncate(compact, 600)
+    else:
+        compact = _truncate(content, 1200 if level == 1 else 400)
+    return compact if len(compact) < len(content) else content
+
+
+class ContextBudget:
+    """Fits one agent conversation to the prompt budget and tracks the tokens saved."""
+
+    def __init__(self, budget: int | None = None):
+        self.budget = budget or settings.context_token_budget
+        self.prompt_tokens = 0
+        self.prompt_tokens_saved = 0
+        _counters["requests"] += 1
+
+    def fit(self, messages: list[dict]) -> list[dict]:
+        """The list to send this iteration; `messages` itself is left untouched."""
+        tool_names = {
+            tool_call["id"]: tool_call["function"]["name"]
+            for message in messages
+            for tool_call in message.get("tool_calls") or []
+        }
+        # Tool messages after the last assistant turn are the ones the model has not seen yet.
+        last_assistant = max((i for i, m in enumerate(messages) if m["role"] == "assistant"), default=-1)
+        older = [i for i, m in enumerate(messages) if m["role"] == "tool" and i < last_assistant]
+        latest = [i for i, m in enumerate(messages) if m["role"] == "tool" and i > last_assistant]
+
+        fitted = list(messages)
+        full = sum(_message_tokens(m) for m in messages)
+        total = full
+
+        def compact(indices: list[int], level: int) -> None:
+            nonlocal total
+            for i in indices:
+                message = messages[i]
+                before = _message_tokens(fitted[i])
+                content = compact_tool_result(tool_names.get(message.get("tool_call_id"), ""), message["content"], level)
+                fitted[i] = {**message, "content": content}
+                total += _message_tokens(fitted[i]) - before
+
+        if settings.context_compact_older:
+            compact(older, 1)
+        for indices, level in ((older, 2), (latest, 1), (older, 3), (latest, 2), (latest, 3)):
+            if total <= self.budget:
+                break
+            compact(indices, level)
+        if total > self.budget:
+            logger.warning(f"Prompt still ~{total} tokens after compaction (budget {self.budget})")
+
+        self.prompt_tokens += total
+        self.prompt_tokens_saved += full - total
+        _counters["llm_calls"] += 1
+        _counters["prompt_tokens"] += total
+        _counters["prompt_tokens_saved"] += full - total
+        return fitted
+
+    def summary(self) -> dict:
+        return {"prompt_tokens": self.prompt_tokens, "prompt_tokens_saved": self.prompt_tokens_saved}
+
+
+def stats() -> dict:
+    return dict(_counters)
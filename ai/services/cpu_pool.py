@@ -0,0 +1,81 @@
+"""Process pool for CPU-heavy steps on the request path.
+
+HTML parsing, image encoding, price extraction and large JSON serialization
+are moved off the event loop once their input is big enough for the transfer
+cost to pay off; smaller inputs keep running inline. With `cpu_workers = 0`,
+or before the lifespan starts the pool, everything runs inline.
+"""
+
+import asyncio
+import multiprocessing
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, TypeVar
+
+from loguru import logger
+
+from config import settings
+
+T = TypeVar("T")
+
+_pool: ProcessPoolExecutor | None = None
+_counters = {"inline": 0, "offloaded": 0}
+
+
+def start() -> None:
+    global _pool
+    if _pool is None and settings.cpu_workers > 0:
+        # spawn, not fork: the server process already runs threads
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.cpu_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        logger.info(f"CPU pool started with {settings.cpu_workers} workers")
+
+
+def shutdown() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def approx_size(obj: Any, limit: int) -> int:
+    """Rough serialized size of nested JSON-like data, stopping once `limit` is passed."""
+    size = 0
+    stack = [obj]
+    while stack and size <= limit:
+        item = stack.pop()
+        if isinstance(item, (str, bytes)):
+            size += len(item)
+        elif isinstance(item, dict):
+            size += 4 * len(item)
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple)):
+            size += 2 * len(item)
+            stack.extend(item)
+        else:
+            size += 8
+    return size
+
+
+def threshold(stage: str) -> int:
+    return settings.cpu_offload_stage_min_bytes.get(stage, settings.cpu_offload_min_bytes)
+
+
+async def run(stage: str, fn: Callable[..., T], *args: Any, size: int) -> T:
+    """Run `fn(*args)` on the pool if `size` (bytes of input) reaches the stage threshold.
+
+    `fn` and its arguments must be picklable (module-level functions, plain data).
+    """
+    if _pool is None or size < threshold(stage):
+        _counters["inline"] += 1
+        return fn(*args)
+    _counters["offloaded"] += 1
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_pool, fn, *args)
+
+
+def stats() -> dict:
+    return {**_counters, "workers": settings.cpu_workers if _pool is not None else 0}
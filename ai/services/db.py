@@ -0,0 +1,39 @@
+"""The worker's SQLite connection to CACHE_DB_PATH, shared by every cache and store.
+
+Modules keep their own schema and pass it to connect(); hold `lock` around each
+use, since the connection is shared across threads. Closed once at shutdown.
+"""
+
+import sqlite3
+import threading
+from pathlib import Path
+
+from config import settings
+
+_db: sqlite3.Connection | None = None
+_schemas: set[str] = set()
+lock = threading.RLock()
+
+
+def connect(schema: str) -> sqlite3.Connection:
+    """The shared connection (opened on first use) with `schema` applied once."""
+    global _db
+    with lock:
+        if _db is None:
+            path = Path(settings.cache_db_path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            _db = sqlite3.connect(path, check_same_thread=False)
+            _db.execute("PRAGMA journal_mode=WAL")
+        if schema not in _schemas:
+            _db.executescript(schema)
+            _schemas.add(schema)
+        return _db
+
+
+def close() -> None:
+    global _db
+    with lock:
+        if _db is not None:
+            _db.close()
+            _db = None
+            _schemas.clear()
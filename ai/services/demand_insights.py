@@ -1,9 +1,14 @@
 """Demand insights service using Kimi K2.5 via OpenRouter with tool calling."""
 
+import re
 from collections.abc import AsyncGenerator
 from datetime import datetime
+from functools import partial
 
+from config import settings
+from services import llm_routing
 from services.llm_client import chat_with_tools, chat_with_tools_stream
+from services.result_cache import ResultCache, cacheable, make_key
 from scrapers.web_search import web_search
 from scrapers.marketplace import get_competitor_data
 
@@ -146,6 +151,18 @@ async def _handle_seasonal_info(category: str, month: int | None = None) -> dict
     }
 
 
+HEADER_PATTERN = re.compile(r"DEMAND_SCORE:\s*(\d{1,3})\s*/\s*100")
+
+
+def _parse_demand_header(line: str) -> dict | None:
+    match = HEADER_PATTERN.search(line)
+    if not match:
+        return None
+    return {"demand_score": int(match.group(1))}
+
+
+demand_cache = ResultCache("demand", ttl=settings.cache_demand_ttl)
+
 TOOL_HANDLERS = {
     "web_search": _handle_web_search,
     "get_competitor_prices": _handle_competitor_prices,
@@ -166,33 +183,76 @@ def _build_messages(product_name: str, category: str | None, location: str | Non
     ]
 
 
-async def get_demand_insights(
-    product_name: str,
-    category: str | None = None,
-    location: str | None = None,
-) -> dict:
+def to_result(product_name: str, analysis: str, fast: bool = False) -> dict:
+    """Result body of one analysis, as returned, cached and stored for jobs.
+
+    `fast` marks answers that ran on the fast LLM route (asked for or downgraded).
+    """
+    return {
+        "product": product_name,
+        "analysis": analysis,
+        "fast": fast,
+        "generated_at": datetime.now().isoformat(),
+    }
+
+
+async def _analyze(product_name: str, category: str | None, location: str | None, fast: bool = False) -> dict:
     messages = _build_messages(product_name, category, location)
+    routes: list[str] = []
     analysis = await chat_with_tools(
         messages=messages,
         tools=DEMAND_TOOLS,
         tool_handlers=TOOL_HANDLERS,
+        endpoint="demand",
+        fast=fast,
+        routes=routes,
     )
-    return {
-        "product": product_name,
-        "analysis": analysis,
-        "generated_at": datetime.now().isoformat(),
-    }
+    return to_result(product_name, analysis, llm_routing.ran_fast(routes))
+
+
+async def get_demand_insights(
+    product_name: str,
+    category: str | None = None,
+    location: str | None = None,
+    fast: bool = False,
+) -> dict:
+    """Cached analysis if available; `fast` answers a miss on the fast LLM route (not cached).
+
+    Stale entries are always refreshed with a full analysis, since a fast one would not be cached.
+    """
+    key = make_key(product_name=product_name, category=category, location=location)
+    result, status = await demand_cache.get_or_compute(
+        key,
+        partial(_analyze, product_name, category, location, fast),
+        cacheable(_parse_demand_header),
+        partial(_analyze, product_name, category, location),
+    )
+    return {**result, "cache": status}
 
 
 async def get_demand_insights_stream(
     product_name: str,
     category: str | None = None,
     location: str | None = None,
+    fast: bool = False,
 ) -> AsyncGenerator[dict, None]:
-    messages = _build_messages(product_name, category, location)
-    async for event in chat_with_tools_stream(
-        messages=messages,
-        tools=DEMAND_TOOLS,
-        tool_handlers=TOOL_HANDLERS,
+    def events() -> AsyncGenerator[dict, None]:
+        return chat_with_tools_stream(
+            messages=_build_messages(product_name, category, location),
+            tools=DEMAND_TOOLS,
+            tool_handlers=TOOL_HANDLERS,
+            endpoint="demand",
+            header_parser=_parse_demand_header,
+            fast=fast,
+        )
+
+    key = make_key(product_name=product_name, category=category, location=location)
+    async for event in demand_cache.stream(
+        key,
+        events,
+        partial(_analyze, product_name, category, location),
+        cacheable(_parse_demand_header),
+        partial(to_result, product_name),
+        _parse_demand_header,
     ):
         yield event
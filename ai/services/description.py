@@ -1,8 +1,17 @@
-"""Product description generation — direct LLM call, no tools, no reasoning."""
+"""Product description generation — direct LLM call, no tools (reasoning off via its LLM route)."""
 
+import asyncio
 import json
 import re
-from services.llm_client import chat_with_tools
+import time
+from collections.abc import AsyncGenerator
+
+from loguru import logger
+
+from config import settings
+from services import category_classifier
+from services.llm_client import LLMCallError, chat_with_tools
+from services.llm_scheduler import BATCH, INTERACTIVE
 
 CATEGORIES = ["Weaving", "Pottery", "Embroidery", "Food", "Jewellery", "Painting", "Basket Weaving", "Tailoring"]
 
@@ -17,6 +26,31 @@ SYSTEM_PROMPT = (
     '{"description": "...", "category": "..."}'
 )
 
+# Used when the local classifier already picked the category.
+DESCRIPTION_ONLY_PROMPT = (
+    "You write product descriptions for Rangaayan, a marketplace for rural Indian women entrepreneurs.\n\n"
+    "Rules:\n"
+    "- 1 sentence, max 100 characters\n"
+    "- Mention the product and one quality (handmade, natural, traditional)\n"
+    "- No markdown, no emojis, no filler words\n\n"
+    "Reply as raw JSON only, no code fences:\n"
+    '{"description": "..."}'
+)
+
+BATCH_SYSTEM_PROMPT = (
+    "You write product descriptions for Rangaayan, a marketplace for rural Indian women entrepreneurs.\n\n"
+    "You get a numbered list of products. For each one:\n"
+    "- 1 sentence, max 100 characters\n"
+    "- Mention the product and one quality (handmade, natural, traditional)\n"
+    "- No markdown, no emojis, no filler words\n"
+    "- Pick the best category from: " + ", ".join(CATEGORIES) + "\n\n"
+    "Reply as a raw JSON array only, no code fences, one object per product in the same order:\n"
+    '[{"id": 0, "description": "...", "category": "..."}]'
+)
+
+_OBJECT = re.compile(r"\{[^{}]*\}")
+_ID = re.compile(r'"id"\s*:\s*(\d+)')
+
 
 def _parse_response(raw: str) -> dict:
     """Extract JSON from LLM response, handling code fences."""
@@ -34,22 +68,165 @@ def _parse_response(raw: str) -> dict:
 async def generate_description(
     product_name: str,
     category: str | None = None,
+    priority: str = INTERACTIVE,
+    fast: bool = False,
+    raise_errors: bool = False,
 ) -> dict:
-    """Returns {"description": str, "category": str | None}."""
-    user_msg = product_name
-    if category:
-        user_msg += f" ({category})"
+    """Returns {"description": str, "category": str | None, "category_source": "local" | "llm" | "request"}.
+
+    Without a given category, the local classifier answers confident cases and
+    the LLM only writes the description; otherwise the LLM also picks the
+    category and its choice is recorded to train the classifier.
+    With `raise_errors`, a failed LLM call raises LLMCallError instead of
+    becoming the description.
+    """
+    local_category = None
+    if not category:
+        local_category, _ = category_classifier.classify("describe", product_name)
 
     messages = [
-        {"role": "system", "content": SYSTEM_PROMPT},
-        {"role": "user", "content": user_msg},
+        {"role": "system", "content": DESCRIPTION_ONLY_PROMPT if local_category else SYSTEM_PROMPT},
+        {"role": "user", "content": _user_line(product_name, category or local_category)},
     ]
 
+    started = time.perf_counter()
     raw = await chat_with_tools(
         messages=messages,
         tools=None,
-        max_tokens=150,
-        reasoning=False,
+        max_tokens=100 if local_category else 150,
+        priority=priority,
+        endpoint="describe" if priority == INTERACTIVE else "describe_batch",
+        fast=fast,
+        raise_errors=raise_errors,
+    )
+    result = _parse_response(raw)
+
+    if local_category:
+        return {**result, "category": local_category, "category_source": "local"}
+    if category:
+        return {**result, "category_source": "request"}
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    await category_classifier.record("describe", product_name, result["category"], elapsed_ms)
+    return {**result, "category_source": "llm"}
+
+
+async def classify_category(product_name: str) -> dict:
+    """Category only: local when confident, otherwise from a full description call."""
+    category, confidence = category_classifier.classify("describe", product_name)
+    if category:
+        return {"category": category, "confidence": round(confidence, 3), "source": "local"}
+    result = await generate_description(product_name)
+    return {"category": result["category"], "confidence": None, "source": "llm"}
+
+
+def _user_line(product_name: str, category: str | None) -> str:
+    return f"{product_name} ({category})" if category else product_name
+
+
+def _parse_batch_response(raw: str, ids: list[int]) -> dict[int, dict]:
+    """Map product ids to {"description", "category"} from a JSON-array reply.
+
+    Each object is parsed on its own with _parse_response, so one malformed
+    entry (or a truncated array) only loses that entry. Objects without an
+    "id" are matched to products by their position among the accepted objects.
+    """
+    parsed: dict[int, dict] = {}
+    accepted = 0
+    for match in _OBJECT.finditer(raw):
+        item = _parse_response(match.group(0))
+        if not item["description"] or item["description"] == match.group(0).strip():
+            continue  # not valid JSON
+        id_match = _ID.search(match.group(0))
+        item_id = int(id_match.group(1)) if id_match else (ids[accepted] if accepted < len(ids) else None)
+        if item_id in ids:
+            parsed[item_id] = item
+            accepted += 1
+    return parsed
+
+
+async def _describe_chunk(chunk: list[tuple[int, dict]], slots: asyncio.Semaphore) -> list[dict]:
+    """Describe one chunk; every LLM call, fallbacks included, holds one of `slots`.
+
+    Items the model answered but left out are described one by one. If the chunk
+    call itself fails, its items get {"index", "product_name", "error"} instead.
+    """
+    ids = [index for index, _ in chunk]
+    local = {}
+    for index, product in chunk:
+        if not product.get("category"):
+            category, _ = category_classifier.classify("describe", product["product_name"])
+            if category:
+                local[index] = category
+    user_msg = "\n".join(
+        f"{index}. {_user_line(product['product_name'], product.get('category') or local.get(index))}"
+        for index, product in chunk
     )
+    try:
+        async with slots:
+            raw = await chat_with_tools(
+                messages=[
+                    {"role": "system", "content": BATCH_SYSTEM_PROMPT},
+                    {"role": "user", "content": user_msg},
+                ],
+                tools=None,
+                max_tokens=80 * len(chunk) + 50,
+                priority=BATCH,
+                endpoint="describe_batch",
+                raise_errors=True,
+            )
+    except LLMCallError as e:
+        return [{"index": index, "product_name": product["product_name"], "error": str(e)} for index, product in chunk]
+    parsed = _parse_batch_response(raw, ids)
+
+    missing = [(index, product) for index, product in chunk if index not in parsed]
+    if missing:
+        logger.warning(f"Batch reply missing {len(missing)}/{len(chunk)} items; describing them one by one")
+
+        async def single(product: dict) -> dict:
+            try:
+                async with slots:
+                    return await generate_description(
+                        product["product_name"], product.get("category"), priority=BATCH, raise_errors=True
+                    )
+            except LLMCallError as e:
+                return {"error": str(e)}
 
-    return _parse_response(raw)
+        singles = await asyncio.gather(*(single(product) for _, product in missing))
+        parsed.update({index: result for (index, _), result in zip(missing, singles)})
+
+    results = []
+    for index, product in chunk:
+        item = {"index": index, "product_name": product["product_name"], **parsed[index]}
+        if "error" in item:
+            results.append(item)
+            continue
+        if index in local:
+            item.update(category=local[index], category_source="local")
+        elif product.get("category"):
+            item.setdefault("category_source", "request")
+        else:
+            item.setdefault("category_source", "llm")
+            await category_classifier.record("describe", product["product_name"], item["category"])
+        results.append(item)
+    return results
+
+
+async def generate_descriptions(products: list[dict]) -> AsyncGenerator[list[dict], None]:
+    """Describe many products with one LLM call per chunk of DESCRIBE_BATCH_SIZE.
+
+    Chunks run concurrently with at most DESCRIBE_BATCH_CONCURRENCY LLM calls at
+    a time, per-item fallbacks for a bad reply included. Each chunk's results
+    are yielded as soon as it completes, so the order of chunks is not
+    preserved; every item carries its input "index".
+    """
+    size = settings.describe_batch_size
+    indexed = list(enumerate(products))
+    chunks = [indexed[i:i + size] for i in range(0, len(indexed), size)]
+    slots = asyncio.Semaphore(settings.describe_batch_concurrency)
+    tasks = [asyncio.create_task(_describe_chunk(chunk, slots)) for chunk in chunks]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,115 @@
+"""Worker readiness and saturation, as reported by /health.
+
+A worker is "starting" until the lifespan has opened its pools and caches,
+"ready" while serving, and "draining" from the moment it receives SIGTERM /
+SIGINT. Uvicorn then stops accepting connections and gives in-flight
+requests (streamed analyses included) SERVER_SHUTDOWN_TIMEOUT seconds to
+finish before the lifespan shutdown closes everything. That one deadline
+starts when draining begins; background work registered with on_drain
+(analysis jobs) is told at the same moment and finishes within it too.
+
+Uvicorn installs its own exit handlers before the lifespan starts, and with
+WORKERS > 1 each worker process builds its own server, so the drain hook
+chains those handlers instead of replacing them.
+"""
+
+import functools
+import os
+import signal
+import threading
+import time
+from collections.abc import Callable
+
+from loguru import logger
+
+from config import settings
+from services import llm_scheduler, metrics, prewarm
+
+STARTING = "starting"
+READY = "ready"
+DRAINING = "draining"
+
+_EXIT_SIGNALS = (signal.SIGINT, signal.SIGTERM)
+
+_state = STARTING
+_drain_deadline: float | None = None
+_drain_listeners: list[Callable[[], None]] = []
+
+
+def mark_ready() -> None:
+    global _state
+    _state = READY
+
+
+def on_drain(listener: Callable[[], None]) -> None:
+    """Call `listener` (synchronously, possibly from a signal handler) when draining begins."""
+    if listener not in _drain_listeners:
+        _drain_listeners.append(listener)
+
+
+def begin_drain() -> None:
+    global _state, _drain_deadline
+    if _state != DRAINING:
+        _state = DRAINING
+        _drain_deadline = time.monotonic() + settings.server_shutdown_timeout
+        logger.info(f"Worker {os.getpid()} draining: {metrics.http_in_flight.value():.0f} requests in flight")
+        for listener in _drain_listeners:
+            listener()
+
+
+def draining() -> bool:
+    return _state == DRAINING
+
+
+def drain_remaining() -> float:
+    """Seconds left of the SERVER_SHUTDOWN_TIMEOUT that started with draining."""
+    if _drain_deadline is None:
+        return settings.server_shutdown_timeout
+    return max(0.0, _drain_deadline - time.monotonic())
+
+
+def _on_exit_signal(previous, sig, frame) -> None:
+    begin_drain()
+    previous(sig, frame)
+
+
+def install_drain_hook() -> None:
+    """Flip to draining on the server's exit signals, then run its own handler."""
+    if threading.current_thread() is not threading.main_thread():
+        return
+    for sig in _EXIT_SIGNALS:
+        previous = signal.getsignal(sig)
+        if callable(previous) and getattr(previous, "func", None) is not _on_exit_signal:
+            signal.signal(sig, functools.partial(_on_exit_signal, previous))
+
+
+def saturation() -> dict:
+    queued = llm_scheduler.queue_depth()
+    cooldown = llm_scheduler.cooldown_remaining()
+    return {
+        "in_flight_requests": int(metrics.http_in_flight.value()),
+        "llm_active": sum(llm_scheduler.stats()["active"].values()),
+        "llm_max_concurrency": settings.llm_max_concurrency,
+        "llm_queued": queued,
+        "llm_max_queue": settings.llm_max_queue,
+        "llm_cooldown_seconds": round(cooldown, 1),
+        "saturated": queued >= settings.llm_downgrade_queue_depth or cooldown > 0,
+    }
+
+
+def report() -> tuple[int, dict]:
+    """(HTTP status, body): 503 unless ready, or while saturated if HEALTH_FAIL_WHEN_SATURATED."""
+    load = saturation()
+    if _state != READY:
+        status = _state
+    else:
+        status = "saturated" if load["saturated"] else "ok"
+    healthy = _state == READY and not (load["saturated"] and settings.health_fail_when_saturated)
+    body = {
+        "status": status,
+        "ready": _state == READY,
+        "worker_pid": os.getpid(),
+        "prewarmed": prewarm.done(),
+        "saturation": load,
+    }
+    return (200 if healthy else 503), body
@@ -0,0 +1,84 @@
+"""Upload preprocessing for vision requests: MIME sniffing, downsizing, perceptual hash.
+
+Everything here is synchronous and CPU-bound; callers run it via cpu_pool.
+"""
+
+import io
+
+from PIL import Image, ImageOps
+
+# (offset, magic bytes, MIME type)
+_SIGNATURES = [
+    (0, b"\xff\xd8\xff", "image/jpeg"),
+    (0, b"\x89PNG\r\n\x1a\n", "image/png"),
+    (0, b"GIF87a", "image/gif"),
+    (0, b"GIF89a", "image/gif"),
+    (8, b"WEBP", "image/webp"),
+    (4, b"ftypheic", "image/heic"),
+    (4, b"ftypheix", "image/heic"),
+    (4, b"ftypmif1", "image/heif"),
+    (0, b"BM", "image/bmp"),
+]
+
+
+def sniff_mime(data: bytes) -> str | None:
+    """Real image type from magic bytes, regardless of the upload's declared type."""
+    for offset, magic, mime in _SIGNATURES:
+        if data[offset:offset + len(magic)] == magic:
+            return mime
+    return None
+
+
+def dhash(image: Image.Image, size: int = 8) -> str:
+    """64-bit difference hash: stable across resizing and recompression of the same photo."""
+    small = image.convert("L").resize((size + 1, size), Image.Resampling.LANCZOS)
+    pixels = list(small.getdata())
+    bits = 0
+    for row in range(size):
+        for col in range(size):
+            left = pixels[row * (size + 1) + col]
+            right = pixels[row * (size + 1) + col + 1]
+            bits = (bits << 1) | (left > right)
+    return f"{bits:016x}"
+
+
+def preprocess_image(data: bytes, max_dimension: int, quality: int) -> dict:
+    """Downsize to `max_dimension` and re-encode as JPEG when that makes the payload smaller.
+
+    Returns {"data", "mime", "source_mime", "phash", "width", "height"}. Raises ValueError for
+    bytes that are not a decodable image.
+    """
+    mime = sniff_mime(data)
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.load()
+    except Exception as e:
+        raise ValueError(f"Unsupported or corrupt image ({mime or 'unknown type'})") from e
+
+    image = ImageOps.exif_transpose(image)
+    phash = dhash(image)
+    resized = max(image.size) > max_dimension
+    if resized:
+        image.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+
+    if image.mode in ("RGBA", "LA", "P"):
+        rgba = image.convert("RGBA")
+        image = Image.new("RGB", rgba.size, (255, 255, 255))
+        image.paste(rgba, mask=rgba.getchannel("A"))
+    elif image.mode != "RGB":
+        image = image.convert("RGB")
+
+    out = io.BytesIO()
+    image.save(out, format="JPEG", quality=quality, optimize=True)
+    encoded = out.getvalue()
+    if not resized and mime == "image/jpeg" and len(data) <= len(encoded):
+        encoded = data  # already small enough; keep the original bytes
+
+    return {
+        "data": encoded,
+        "mime": "image/jpeg",
+        "source_mime": mime,
+        "phash": phash,
+        "width": image.width,
+        "height": image.height,
+    }
@@ -0,0 +1,379 @@
+"""Asynchronous pricing / demand analyses ("jobs").
+
+POST /api/jobs/{kind} stores a queued job in SQLite (the cache database, so
+every worker sees it) and returns its id at once. Each server worker runs
+JOB_WORKERS job workers that claim queued jobs, oldest first, and run the
+same streamed analysis as the /stream endpoints. Jobs are not claimed while
+the worker is saturated (see /health), so a backed-up LLM leaves them queued
+instead of failing them.
+
+Every event a job produces is numbered (1, 2, ...) and written to SQLite
+every JOB_FLUSH_INTERVAL seconds, together with a heartbeat. Subscribers
+get events from memory on the worker running the job and from SQLite on any
+other worker, so a client reconnecting with Last-Event-ID is replayed what
+it missed and then follows the live job; the agent loop is not restarted.
+A running job whose heartbeat is older than JOB_STALE_AFTER (its worker
+died) is failed as interrupted. Finished jobs are deleted after JOB_TTL.
+"""
+
+import asyncio
+import json
+import sqlite3
+import time
+import uuid
+from collections.abc import AsyncGenerator, Callable
+from datetime import datetime
+
+from loguru import logger
+
+from config import settings
+from services import ai_pricing, db, demand_insights, health, metrics
+from services.llm_scheduler import LLMBusyError
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+FINISHED = (SUCCEEDED, FAILED)
+
+# kind -> (event stream of the analysis, result body from (product name, analysis text))
+KINDS: dict[str, tuple[Callable[..., AsyncGenerator[dict, None]], Callable[[str, str], dict]]] = {
+    "pricing": (ai_pricing.get_pricing_suggestion_stream, ai_pricing.to_result),
+    "demand": (demand_insights.get_demand_insights_stream, demand_insights.to_result),
+}
+
+_running: dict[str, "_Run"] = {}
+_workers: list[asyncio.Task] = []
+_flusher: asyncio.Task | None = None
+_wakeup = asyncio.Event()
+_loop: asyncio.AbstractEventLoop | None = None
+_stopping = False
+_job_seconds = 30.0  # moving average, used to estimate Retry-After
+_counters = {"submitted": 0, "rejected": 0, SUCCEEDED: 0, FAILED: 0, "interrupted": 0}
+
+job_duration = metrics.Histogram("analysis_job_duration_seconds", "Run time of an analysis job", ("kind", "status"))
+metrics.Gauge("analysis_jobs_running", "Analysis jobs running in this worker", collect=lambda: {(): len(_running)})
+
+
+class _Run:
+    """Events of a job running in this worker; `changed` is replaced after every event."""
+
+    def __init__(self, job_id: str):
+        self.id = job_id
+        self.events: list[dict] = []
+        self.flushed = 0
+        self.changed = asyncio.Event()
+
+    def add(self, event: dict) -> None:
+        self.events.append(event)
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+
+# --- Storage -------------------------------------------------------------------------
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY, kind TEXT NOT NULL, params TEXT NOT NULL, status TEXT NOT NULL,
+    result TEXT, error TEXT, events INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL, started REAL, finished REAL, heartbeat REAL);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created);
+CREATE TABLE IF NOT EXISTS job_events (
+    job_id TEXT NOT NULL, seq INTEGER NOT NULL, event TEXT NOT NULL, PRIMARY KEY (job_id, seq));
+"""
+
+
+def _connect() -> sqlite3.Connection:
+    return db.connect(_SCHEMA)
+
+
+_COLUMNS = "id, kind, params, status, result, error, events, created, started, finished"
+
+
+def _row_to_job(row: tuple) -> dict:
+    job = dict(zip(_COLUMNS.split(", "), row))
+    job["params"] = json.loads(job["params"])
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+
+def _db_insert(job: dict) -> int:
+    """Insert a queued job unless JOB_MAX_QUEUE jobs are queued; returns the queue length."""
+    with db.lock:
+        conn = _connect()
+        queued = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (QUEUED,)).fetchone()[0]
+        if queued < settings.job_max_queue:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, params, status, created) VALUES (?, ?, ?, ?, ?)",
+                (job["id"], job["kind"], json.dumps(job["params"]), QUEUED, job["created"]),
+            )
+            conn.commit()
+    return queued
+
+
+def _db_get(job_id: str) -> dict | None:
+    with db.lock:
+        row = _connect().execute(f"SELECT {_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return _row_to_job(row) if row else None
+
+
+def _db_events(job_id: str, after: int) -> tuple[list[dict], str | None]:
+    """Stored events after `after` and the job's status.
+
+    Status is read first: when it says finished, the final events were committed with it.
+    """
+    with db.lock:
+        conn = _connect()
+        row = conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        events = conn.execute(
+            "SELECT event FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq", (job_id, after)
+        ).fetchall()
+    return [json.loads(event) for (event,) in events], row[0] if row else None
+
+
+def _db_claim() -> dict | None:
+    now = time.time()
+    with db.lock:
+        conn = _connect()
+        row = conn.execute(
+            f"UPDATE jobs SET status = ?, started = ?, heartbeat = ? WHERE id = "
+            f"(SELECT id FROM jobs WHERE status = ? ORDER BY created LIMIT 1) AND status = ? RETURNING {_COLUMNS}",
+            (RUNNING, now, now, QUEUED, QUEUED),
+        ).fetchone()
+        conn.commit()
+    return _row_to_job(row) if row else None
+
+
+def _write_events(conn: sqlite3.Connection, run: _Run) -> None:
+    pending = run.events[run.flushed:]
+    conn.executemany(
+        "INSERT OR REPLACE INTO job_events (job_id, seq, event) VALUES (?, ?, ?)",
+        [(run.id, run.flushed + i + 1, json.dumps(event)) for i, event in enumerate(pending)],
+    )
+    run.flushed += len(pending)
+
+
+def _db_flush(runs: list[_Run]) -> None:
+    """Write new events and a heartbeat for every running job."""
+    now = time.time()
+    with db.lock:
+        conn = _connect()
+        for run in runs:
+            _write_events(conn, run)
+            conn.execute("UPDATE jobs SET events = ?, heartbeat = ? WHERE id = ?", (run.flushed, now, run.id))
+        conn.commit()
+
+
+def _db_finish(run: _Run, status: str, result: dict | None, error: str | None) -> None:
+    with db.lock:
+        conn = _connect()
+        _write_events(conn, run)
+        conn.execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, events = ?, finished = ?, heartbeat = NULL WHERE id = ?",
+            (status, json.dumps(result) if result else None, error, run.flushed, time.time(), run.id),
+        )
+        conn.commit()
+
+
+def _db_sweep() -> int:
+    """Fail running jobs whose worker stopped heartbeating; drop jobs finished over JOB_TTL ago."""
+    now = time.time()
+    error = "Interrupted: the worker running this job stopped"
+    with db.lock:
+        conn = _connect()
+        stale = conn.execute(
+            "SELECT id, events FROM jobs WHERE status = ? AND heartbeat < ?", (RUNNING, now - settings.job_stale_after)
+        ).fetchall()
+        for job_id, events in stale:
+            conn.executemany(
+                "INSERT OR REPLACE INTO job_events (job_id, seq, event) VALUES (?, ?, ?)",
+                [
+                    (job_id, events + 1, json.dumps({"type": "error", "message": error})),
+                    (job_id, events + 2, json.dumps({"type": "done", "status": FAILED})),
+                ],
+            )
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, events = ?, finished = ?, heartbeat = NULL WHERE id = ?",
+                (FAILED, error, events + 2, now, job_id),
+            )
+        expired = now - settings.job_ttl
+        conn.execute("DELETE FROM job_events WHERE job_id IN (SELECT id FROM jobs WHERE finished < ?)", (expired,))
+        conn.execute("DELETE FROM jobs WHERE finished < ?", (expired,))
+        conn.commit()
+    return len(stale)
+
+
+# --- Running jobs --------------------------------------------------------------------
+
+
+def public(job: dict) -> dict:
+    """API view of a job row: timestamps as ISO strings."""
+    return {
+        **{k: v for k, v in job.items() if k not in ("created", "started", "finished")},
+        **{k: datetime.fromtimestamp(job[k]).isoformat() if job.get(k) else None for k in ("created", "started", "finished")},
+    }
+
+
+async def _run(job: dict) -> None:
+    global _job_seconds
+    run = _Run(job["id"])
+    _running[job["id"]] = run
+    started = time.perf_counter()
+    result = error = None
+    cache = None
+    header: dict = {}
+    stream, to_result = KINDS[job["kind"]]
+    try:
+        async for event in stream(**job["params"]):
+            run.add(event)
+            if event["type"] == "cache":
+                cache = event["status"]
+            elif event["type"] == "header":
+                header = {k: v for k, v in event.items() if k != "type"}
+            elif event["type"] == "result":
+                result = {**to_result(job["params"]["product_name"], event["content"], event.get("fast", False)), **header, "cache": cache}
+            elif event["type"] == "error":
+                error = event["message"]
+    except asyncio.CancelledError:
+        error = "Interrupted: the server shut down before the job finished"
+        run.add({"type": "error", "message": error})
+        _counters["interrupted"] += 1
+        raise
+    except Exception as e:
+        logger.exception(f"Job {job['id']} ({job['kind']}) failed")
+        error = f"AI service error: {e}"
+        run.add({"type": "error", "message": error})
+    finally:
+        status = SUCCEEDED if result is not None and error is None else FAILED
+        run.add({"type": "done", "status": status})
+        try:
+            await asyncio.shield(asyncio.to_thread(_db_finish, run, status, result, error))
+        except sqlite3.Error as e:
+            logger.warning(f"Could not store job {job['id']}: {e}")
+        _running.pop(job["id"], None)
+        run.changed.set()  # local subscribers continue from SQLite
+        elapsed = time.perf_counter() - started
+        _job_seconds = 0.9 * _job_seconds + 0.1 * elapsed
+        job_duration.observe(elapsed, job["kind"], status)
+        _counters[status] += 1
+
+
+async def _worker() -> None:
+    while not _stopping:
+        if health.saturation()["saturated"]:
+            await asyncio.sleep(settings.job_poll_interval)
+            continue
+        _wakeup.clear()
+        try:
+            job = await asyncio.to_thread(_db_claim)
+        except sqlite3.Error as e:
+            logger.warning(f"Job claim failed: {e}")
+            job = None
+        if job is None:
+            try:
+                await asyncio.wait_for(_wakeup.wait(), settings.job_poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        await _run(job)
+
+
+async def _flush_loop() -> None:
+    last_sweep = 0.0
+    while True:
+        await asyncio.sleep(settings.job_flush_interval)
+        try:
+            if _running:
+                await asyncio.to_thread(_db_flush, list(_running.values()))
+            if time.monotonic() - last_sweep >= settings.job_stale_after / 2:
+                last_sweep = time.monotonic()
+                if swept := await asyncio.to_thread(_db_sweep):
+                    logger.warning(f"Failed {swept} interrupted job(s)")
+        except sqlite3.Error as e:
+            logger.warning(f"Job flush failed: {e}")
+
+
+def _begin_stop() -> None:
+    """Stop claiming jobs; called from health.begin_drain, which may run in a signal handler."""
+    global _stopping
+    _stopping = True
+    if _loop is not None and not _loop.is_closed():
+        _loop.call_soon_threadsafe(_wakeup.set)
+
+
+async def start() -> None:
+    """Open the job tables and start JOB_WORKERS job workers (no-op with 0 workers)."""
+    global _flusher, _stopping, _loop
+    if settings.job_workers <= 0 or _workers:
+        return
+    _stopping = False
+    _loop = asyncio.get_running_loop()
+    await asyncio.to_thread(_connect)
+    _flusher = asyncio.create_task(_flush_loop())
+    _workers.extend(asyncio.create_task(_worker()) for _ in range(settings.job_workers))
+    health.on_drain(_begin_stop)
+
+
+async def stop() -> None:
+    """Stop claiming jobs, let running ones finish before the drain deadline, then cancel them.
+
+    Claiming stops as soon as the worker starts draining (health.begin_drain), so
+    running jobs share the server's SERVER_SHUTDOWN_TIMEOUT instead of getting a second one.
+    """
+    global _flusher
+    _begin_stop()
+    if _workers:
+        _, pending = await asyncio.wait(_workers, timeout=health.drain_remaining())
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*_workers, return_exceptions=True)
+        _workers.clear()
+    if _flusher is not None:
+        _flusher.cancel()
+        _flusher = None
+
+
+# --- API -----------------------------------------------------------------------------
+
+
+async def submit(kind: str, params: dict) -> dict:
+    """Queue a job; LLMBusyError (503) when JOB_MAX_QUEUE jobs are already queued."""
+    job = {"id": uuid.uuid4().hex, "kind": kind, "params": params, "created": time.time()}
+    queued = await asyncio.to_thread(_db_insert, job)
+    if queued >= settings.job_max_queue:
+        _counters["rejected"] += 1
+        retry_after = queued / max(1, settings.job_workers) * _job_seconds
+        raise LLMBusyError("Job queue is full", status_code=503, retry_after=retry_after)
+    _counters["submitted"] += 1
+    _wakeup.set()
+    return {**job, "status": QUEUED, "result": None, "error": None, "events": 0, "started": None, "finished": None}
+
+
+async def get(job_id: str) -> dict | None:
+    job = await asyncio.to_thread(_db_get, job_id)
+    run = _running.get(job_id)
+    if job is not None and run is not None:
+        job["events"] = len(run.events)
+    return job
+
+
+async def events(job_id: str, after: int = 0) -> AsyncGenerator[tuple[int, dict], None]:
+    """(seq, event) pairs after `after`, following the job until it finishes."""
+    while True:
+        run = _running.get(job_id)
+        if run is not None:
+            changed = run.changed
+            batch, status = run.events[after:], RUNNING
+        else:
+            batch, status = await asyncio.to_thread(_db_events, job_id, after)
+        for event in batch:
+            after += 1
+            yield after, event
+        if status in FINISHED or status is None:
+            return
+        if run is not None:
+            await changed.wait()
+        elif not batch:
+            await asyncio.sleep(settings.job_poll_interval)
+
+
+def stats() -> dict:
+    return {**_counters, "workers": len(_workers), "running": len(_running), "avg_seconds": round(_job_seconds, 1)}
@@ -1,22 +1,193 @@
 """OpenRouter client with tool calling support."""
 
+import asyncio
 import json
-from collections.abc import AsyncGenerator
-from openai import AsyncOpenAI
+import time
+from collections.abc import AsyncGenerator, Callable
+from contextlib import AsyncExitStack
+from functools import partial
+
 from loguru import logger
 
 from config import settings
+from services import cassette, cpu_pool, llm_retry, llm_routing, llm_scheduler, metrics, tracing
+from services.llm_scheduler import LLMBusyError
+from services.context_budget import ContextBudget
+
+_client = None
+
+
+class LLMCallError(Exception):
+    """The LLM call failed or came back empty (raised only with raise_errors=True)."""
+
+
+def get_client():
+    """The shared AsyncOpenAI client. `openai` takes most of the app's import time,
+    so it is imported here on first use (or by services.prewarm at startup)."""
+    global _client
+    if _client is None:
+        from openai import AsyncOpenAI
+
+        _client = AsyncOpenAI(
+            base_url=settings.openrouter_base_url,
+            api_key=settings.openrouter_api_key,
+            timeout=settings.llm_request_timeout,
+            max_retries=0,  # retries and hedging are handled by services.llm_retry
+        )
+    return _client
+
+
+# Reply size when neither the caller nor the route sets max_tokens.
+_DEFAULT_MAX_TOKENS = 2048
+
+# Turns the first line of a streamed answer into header event fields, or None.
+HeaderParser = Callable[[str], dict | None]
+
+TOOL_STATUS = {
+    "web_search": "Searching the web...",
+    "get_competitor_prices": "Checking competitor prices...",
+    "get_seasonal_info": "Checking seasonal trends...",
+    "fetch_page": "Reading market data...",
+    "calculate_margin": "Calculating margins...",
+}
+
+
+async def _run_tool(fn_name: str, fn_args: dict | None, tool_handlers: dict) -> str:
+    """Run one tool handler under its timeout and return the tool message content."""
+    handler = tool_handlers.get(fn_name)
+    if not handler:
+        metrics.tool_errors.inc(fn_name, "no_handler")
+        return f"Error: no handler for tool '{fn_name}'"
+    if fn_args is None:
+        metrics.tool_errors.inc(fn_name, "invalid_args")
+        return f"Error: invalid arguments for tool '{fn_name}'"
+    timeout = settings.tool_timeouts.get(fn_name, settings.tool_timeout)
+    metrics.tool_in_flight.inc(fn_name)
+    try:
+        with metrics.tool_seconds.time(fn_name), tracing.span(f"tool:{fn_name}"):
+            result = await asyncio.wait_for(handler(**fn_args), timeout=timeout)
+    except asyncio.TimeoutError:
+        metrics.tool_errors.inc(fn_name, "timeout")
+        logger.warning(f"Tool {fn_name} timed out after {timeout}s")
+        return f"Error: tool '{fn_name}' timed out after {timeout}s"
+    except Exception as e:
+        metrics.tool_errors.inc(fn_name, "error")
+        logger.warning(f"Tool {fn_name} failed: {e}")
+        return f"Error: tool '{fn_name}' failed: {e}"
+    finally:
+        metrics.tool_in_flight.dec(fn_name)
+    if isinstance(result, str):
+        return result
+    size = cpu_pool.approx_size(result, cpu_pool.threshold("json_dumps"))
+    return await cpu_pool.run("json_dumps", json.dumps, result, size=size)
+
+
+def _start_tool_calls(tool_calls: list[dict], tool_handlers: dict) -> tuple[dict[str, asyncio.Task], list[tuple[str, str]]]:
+    """Start every distinct tool call of one turn concurrently.
+
+    Identical calls (same name and arguments) share one task. Returns the tasks
+    keyed by call signature and the (tool_call_id, signature) pairs in the order
+    the model issued them.
+    """
+    tasks: dict[str, asyncio.Task] = {}
+    order: list[tuple[str, str]] = []
+    for tool_call in tool_calls:
+        fn_name = tool_call["function"]["name"]
+        try:
+            fn_args = json.loads(tool_call["function"]["arguments"] or "{}")
+        except json.JSONDecodeError:
+            fn_args = None
+        key = f"{fn_name}:{json.dumps(fn_args, sort_keys=True)}"
+        if key not in tasks:
+            logger.info(f"Tool call: {fn_name}({fn_args})")
+            tasks[key] = asyncio.create_task(_run_tool(fn_name, fn_args, tool_handlers), name=fn_name)
+        order.append((tool_call["id"], key))
+    return tasks, order
+
+
+def _tool_messages(tasks: dict[str, asyncio.Task], order: list[tuple[str, str]]) -> list[dict]:
+    return [
+        {"role": "tool", "tool_call_id": tool_call_id, "content": tasks[key].result()}
+        for tool_call_id, key in order
+    ]
+
+
+def _cancel_pending(tasks: dict[str, asyncio.Task]) -> None:
+    for task in tasks.values():
+        if not task.done():
+            task.cancel()
+
+
+async def _create_once(priority: str, endpoint: str, kwargs: dict):
+    """One completion attempt under a scheduler slot."""
+    async with llm_scheduler.slot(priority):
+        return await _request(endpoint, kwargs)
+
+
+async def _request(endpoint: str, kwargs: dict):
+    """One upstream call. Non-stream calls are recorded here; streams when they end (_stream_turn)."""
+    started = time.perf_counter()
+    try:
+        if cassette.replaying():
+            response = await cassette.replay_llm(endpoint, kwargs)
+        else:
+            response = await get_client().chat.completions.create(**kwargs)
+            if cassette.recording():
+                response = await cassette.record_llm(endpoint, kwargs, response, started)
+    except Exception as e:
+        metrics.llm_errors.inc(endpoint, type(e).__name__)
+        if llm_retry.is_rate_limited(e):
+            llm_scheduler.note_rate_limited(llm_retry.retry_after(e))
+        raise
+    if not kwargs.get("stream"):
+        _observe_call(endpoint, kwargs["model"], started, response.usage)
+    return response
+
+
+def _observe_call(endpoint: str, model: str, started: float, usage) -> None:
+    metrics.llm_call_seconds.observe(time.perf_counter() - started, endpoint, model)
+    if usage is not None:
+        metrics.llm_tokens.inc(endpoint, model, "prompt", value=usage.prompt_tokens or 0)
+        metrics.llm_tokens.inc(endpoint, model, "completion", value=usage.completion_tokens or 0)
+
+
+def _busy(error: Exception) -> LLMBusyError:
+    return LLMBusyError(
+        "LLM provider is rate limiting",
+        status_code=429,
+        retry_after=llm_retry.retry_after(error) or llm_scheduler.cooldown_remaining(),
+    )
 
-client = AsyncOpenAI(
-    base_url="https://openrouter.ai/api/v1",
-    api_key=settings.openrouter_api_key,
-)
 
-# Reasoning effort levels for Kimi K2.5.
-# "none" disables reasoning (fast, cheap — use for simple generation).
-# "low" / "medium" / "high" controls reasoning depth (use for complex analysis).
-REASONING_NONE = {"reasoning": {"effort": "none"}}
-REASONING_LOW = {"reasoning": {"effort": "low"}}
+async def _create(priority: str, endpoint: str, **kwargs):
+    """Completion call with retries/hedging; a 429 that outlasts the retries becomes LLMBusyError."""
+    try:
+        return await llm_retry.call(endpoint, partial(_create_once, priority, endpoint, kwargs))
+    except Exception as e:
+        if llm_retry.is_rate_limited(e):
+            raise _busy(e) from e
+        raise
+
+
+def _route_kwargs(
+    endpoint: str, iteration: int, fast: bool, model: str | None, max_tokens: int | None, routes: list[str]
+) -> dict:
+    route = llm_routing.resolve(endpoint, iteration, fast)
+    routes.append(route["route"])
+    kwargs = llm_routing.request_kwargs(route)
+    if model:
+        kwargs["model"] = model
+    kwargs["max_tokens"] = max_tokens or route["max_tokens"] or _DEFAULT_MAX_TOKENS
+    logger.debug(f"[{endpoint} iter {iteration}] route={route['route']} model={kwargs['model']} reasoning={route['reasoning']}")
+    return kwargs
+
+
+def _log_budget(budget: ContextBudget, calls: int) -> None:
+    if calls > 1:
+        logger.info(
+            f"Prompt ~{budget.prompt_tokens} tokens over {calls} calls, "
+            f"~{budget.prompt_tokens_saved} saved by compaction"
+        )
 
 
 async def chat_with_tools(
@@ -25,134 +196,249 @@ async def chat_with_tools(
     tool_handlers: dict | None = None,
     model: str | None = None,
     max_iterations: int = 5,
-    max_tokens: int = 2048,
-    reasoning: bool = True,
+    max_tokens: int | None = None,
+    priority: str = llm_scheduler.ANALYSIS,
+    endpoint: str = "default",
+    fast: bool = False,
+    routes: list[str] | None = None,
+    raise_errors: bool = False,
 ) -> str:
     """Call the LLM with optional tool-calling loop.
 
     Args:
-        reasoning: If False, disables the model's internal reasoning/thinking.
-                   Use False for simple generation tasks (descriptions, rewrites).
-                   Use True (default) for complex analysis that benefits from reasoning.
+        model: Overrides the routed model for every iteration.
+        max_tokens: Reply size chosen by the caller. When None, the route's
+                    max_tokens is used, else 2048.
+        priority: Scheduler class (llm_scheduler.INTERACTIVE / BATCH / ANALYSIS).
+        endpoint: Task name: selects the LLM_ROUTES entry (model, reasoning effort,
+                  max_tokens) and the retry/hedge budget.
+        fast: Use LLM_FAST_ROUTE (cheaper model / no reasoning) for every iteration.
+        routes: If given, the route name of every iteration is appended to it, so
+                callers can tell a downgraded answer (llm_routing.ran_fast).
+        raise_errors: Raise LLMCallError on an API error or empty reply instead
+                      of returning the error text as the answer.
+
+    Raises LLMBusyError when no LLM capacity is available in time.
     """
-    model = model or settings.llm_model
     tool_handlers = tool_handlers or {}
+    budget = ContextBudget()
+    routes = [] if routes is None else routes
 
     for i in range(max_iterations):
-        kwargs: dict = {"model": model, "messages": messages, "max_tokens": max_tokens}
+        kwargs = _route_kwargs(endpoint, i, fast, model, max_tokens, routes)
+        kwargs["messages"] = budget.fit(messages)
         last_round = i == max_iterations - 1
         if tools and not last_round:
             kwargs["tools"] = tools
-        if not reasoning:
-            kwargs["extra_body"] = REASONING_NONE
 
         try:
-            response = await client.chat.completions.create(**kwargs)
+            with tracing.span(f"llm:{endpoint}", iteration=i, model=kwargs["model"]):
+                response = await _create(priority, endpoint, **kwargs)
+        except LLMBusyError:
+            raise
         except Exception as e:
             logger.error(f"OpenRouter API error: {e}")
+            if raise_errors:
+                raise LLMCallError(f"AI service error: {e}") from e
             return f"AI service error: {e}"
 
         if not response.choices:
             logger.warning(f"Empty choices from OpenRouter")
+            if raise_errors:
+                raise LLMCallError("AI service returned an empty response")
             return "AI service returned an empty response. Please try again."
 
         choice = response.choices[0]
         logger.debug(f"[iter {i}] finish_reason={choice.finish_reason}, content_len={len(choice.message.content or '')}, tool_calls={bool(choice.message.tool_calls)}")
 
         if not last_round and (choice.finish_reason == "tool_calls" or choice.message.tool_calls):
-            messages.append(choice.message.model_dump())
-            for tool_call in choice.message.tool_calls:
-                fn_name = tool_call.function.name
-                fn_args = json.loads(tool_call.function.arguments)
-                logger.info(f"Tool call: {fn_name}({fn_args})")
-                handler = tool_handlers.get(fn_name)
-                if handler:
-                    result = await handler(**fn_args)
-                else:
-                    result = f"Error: no handler for tool '{fn_name}'"
-                messages.append({
-                    "role": "tool",
-                    "tool_call_id": tool_call.id,
-                    "content": json.dumps(result) if not isinstance(result, str) else result,
-                })
+            message = choice.message.model_dump()
+            messages.append(message)
+            with tracing.span("tools", iteration=i):
+                tasks, order = _start_tool_calls(message.get("tool_calls") or [], tool_handlers)
+                try:
+                    await asyncio.gather(*tasks.values())
+                finally:
+                    _cancel_pending(tasks)
+            messages.extend(_tool_messages(tasks, order))
         else:
             content = choice.message.content or ""
             if not content:
                 logger.warning(f"Empty content from LLM. finish_reason={choice.finish_reason}")
+            _log_budget(budget, i + 1)
+            metrics.agent_iterations.observe(i + 1, endpoint)
             return content
 
+    metrics.agent_iterations.observe(max_iterations, endpoint)
     return "Analysis could not be completed."
 
 
+async def _stream_turn(
+    kwargs: dict, turn: dict, iteration: int, header_parser: HeaderParser | None, priority: str, endpoint: str
+) -> AsyncGenerator[dict, None]:
+    """Stream one completion, yielding delta/header events and filling `turn`.
+
+    On return `turn` holds the assembled "content", "tool_calls" (message
+    format) and "finish_reason". Opening the stream is retried, but not hedged
+    and not retried once text has arrived.
+    """
+    request = {**kwargs, "stream": True, "stream_options": {"include_usage": True}}
+    async with AsyncExitStack() as held:
+        try:
+            stream, started = await llm_retry.call(
+                endpoint, partial(_open_stream, priority, endpoint, request, held), hedge=False
+            )
+        except Exception as e:
+            if llm_retry.is_rate_limited(e):
+                raise _busy(e) from e
+            raise
+        async for event in _read_stream(stream, turn, iteration, header_parser):
+            yield event
+        _observe_call(endpoint, kwargs["model"], started, turn.get("usage"))
+
+
+async def _open_stream(priority: str, endpoint: str, request: dict, held: AsyncExitStack) -> tuple:
+    """One attempt at opening a stream under a scheduler slot; returns (stream, started).
+
+    The slot is released if the attempt fails, so retry backoff does not hold it.
+    On success it moves to `held` and stays taken until the stream has been read.
+    """
+    async with AsyncExitStack() as attempt:
+        await attempt.enter_async_context(llm_scheduler.slot(priority))
+        started = time.perf_counter()
+        stream = await _request(endpoint, request)
+        held.push_async_exit(attempt.pop_all())
+    return stream, started
+
+
+async def _read_stream(stream, turn: dict, iteration: int, header_parser: HeaderParser | None) -> AsyncGenerator[dict, None]:
+    content_parts: list[str] = []
+    tool_calls: dict[int, dict] = {}
+    header_pending = header_parser is not None
+
+    async for chunk in stream:
+        if chunk.usage is not None:
+            turn["usage"] = chunk.usage
+        if not chunk.choices:
+            continue
+        choice = chunk.choices[0]
+        delta = choice.delta
+        if delta.content:
+            content_parts.append(delta.content)
+            yield {"type": "delta", "content": delta.content, "iteration": iteration}
+            if header_pending:
+                text = "".join(content_parts).lstrip()
+                if "\n" in text:
+                    header_pending = False
+                    header = header_parser(text.split("\n", 1)[0])
+                    if header:
+                        yield {"type": "header", **header}
+        for tc in delta.tool_calls or []:
+            slot = tool_calls.setdefault(
+                tc.index, {"id": "", "type": "function", "function": {"name": "", "arguments": ""}}
+            )
+            if tc.id:
+                slot["id"] = tc.id
+            if tc.function and tc.function.name:
+                slot["function"]["name"] += tc.function.name
+            if tc.function and tc.function.arguments:
+                slot["function"]["arguments"] += tc.function.arguments
+        if choice.finish_reason:
+            turn["finish_reason"] = choice.finish_reason
+
+    content = "".join(content_parts)
+    if header_pending and content.strip():
+        header = header_parser(content.strip().split("\n", 1)[0])
+        if header:
+            yield {"type": "header", **header}
+    turn["content"] = content
+    turn["tool_calls"] = [tool_calls[index] for index in sorted(tool_calls)]
+
+
 async def chat_with_tools_stream(
     messages: list[dict],
     tools: list[dict] | None = None,
     tool_handlers: dict | None = None,
     model: str | None = None,
     max_iterations: int = 5,
-    max_tokens: int = 2048,
+    max_tokens: int | None = None,
+    header_parser: HeaderParser | None = None,
+    priority: str = llm_scheduler.ANALYSIS,
+    endpoint: str = "default",
+    fast: bool = False,
 ) -> AsyncGenerator[dict, None]:
     """Like chat_with_tools but yields SSE-style progress events.
 
-    Always uses reasoning (tool-calling tasks are complex enough to benefit).
+    Every completion is streamed: text arrives as "delta" events tagged with
+    the agent iteration, and once the first line of a completion is complete
+    `header_parser` may turn it into a structured "header" event. The full
+    answer is still sent as a final "result" event, with `fast` set when any
+    iteration ran on the fast route (asked for or downgraded).
+
+    Model and reasoning effort are routed per iteration as in chat_with_tools.
+    Without LLM capacity the stream ends with an "error" event carrying
+    `retry_after` (seconds).
     """
-    model = model or settings.llm_model
     tool_handlers = tool_handlers or {}
+    budget = ContextBudget()
+
+    routes: list[str] = []
 
     yield {"type": "status", "message": "Starting analysis..."}
 
     for i in range(max_iterations):
-        kwargs: dict = {"model": model, "messages": messages, "max_tokens": max_tokens}
+        kwargs = _route_kwargs(endpoint, i, fast, model, max_tokens, routes)
+        kwargs["messages"] = budget.fit(messages)
         last_round = i == max_iterations - 1
         if tools and not last_round:
             kwargs["tools"] = tools
 
+        turn: dict = {"content": "", "tool_calls": [], "finish_reason": None}
         try:
-            response = await client.chat.completions.create(**kwargs)
+            with tracing.span(f"llm:{endpoint}", iteration=i, model=kwargs["model"]):
+                async for event in _stream_turn(kwargs, turn, i, header_parser, priority, endpoint):
+                    yield event
+        except LLMBusyError as e:
+            yield {"type": "error", "message": str(e), "retry_after": e.retry_after_seconds}
+            return
         except Exception as e:
             logger.error(f"OpenRouter API error: {e}")
             yield {"type": "error", "message": f"AI service error: {e}"}
             return
 
-        if not response.choices:
-            yield {"type": "error", "message": "AI service returned an empty response."}
-            return
-        choice = response.choices[0]
+        content = turn["content"]
+        if not last_round and (turn["finish_reason"] == "tool_calls" or turn["tool_calls"]):
+            messages.append({"role": "assistant", "content": content or None, "tool_calls": turn["tool_calls"]})
+            with tracing.span("tools", iteration=i):
+                tasks, order = _start_tool_calls(turn["tool_calls"], tool_handlers)
+                for task in tasks.values():
+                    fn_name = task.get_name()
+                    yield {"type": "status", "message": TOOL_STATUS.get(fn_name, f"Running {fn_name}...")}
 
-        if not last_round and (choice.finish_reason == "tool_calls" or choice.message.tool_calls):
-            messages.append(choice.message.model_dump())
-            for tool_call in choice.message.tool_calls:
-                fn_name = tool_call.function.name
-                fn_args = json.loads(tool_call.function.arguments)
-                logger.info(f"Tool call: {fn_name}({fn_args})")
-
-                status_map = {
-                    "web_search": "Searching the web...",
-                    "get_competitor_prices": "Checking competitor prices...",
-                    "get_seasonal_info": "Checking seasonal trends...",
-                    "fetch_page": "Reading market data...",
-                    "calculate_margin": "Calculating margins...",
-                }
-                yield {"type": "status", "message": status_map.get(fn_name, f"Running {fn_name}...")}
-
-                handler = tool_handlers.get(fn_name)
-                if handler:
-                    result = await handler(**fn_args)
-                else:
-                    result = f"Error: no handler for tool '{fn_name}'"
-                messages.append({
-                    "role": "tool",
-                    "tool_call_id": tool_call.id,
-                    "content": json.dumps(result) if not isinstance(result, str) else result,
-                })
-        else:
+                started = time.perf_counter()
+                pending = set(tasks.values())
+                try:
+                    while pending:
+                        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                        for task in done:
+                            yield {
+                                "type": "status",
+                                "message": f"Finished {task.get_name()} ({time.perf_counter() - started:.1f}s)",
+                                "tool": task.get_name(),
+                            }
+                finally:
+                    _cancel_pending(tasks)
+            messages.extend(_tool_messages(tasks, order))
             yield {"type": "status", "message": "Generating analysis..."}
-            content = choice.message.content or ""
+        else:
             if not content:
-                logger.warning(f"Empty content in stream. finish_reason={choice.finish_reason}")
+                logger.warning(f"Empty content in stream. finish_reason={turn['finish_reason']}")
                 yield {"type": "error", "message": "AI returned empty response. Try again."}
             else:
-                yield {"type": "result", "content": content}
+                _log_budget(budget, i + 1)
+                metrics.agent_iterations.observe(i + 1, endpoint)
+                yield {"type": "result", "content": content, "fast": llm_routing.ran_fast(routes), **budget.summary()}
             return
 
+    metrics.agent_iterations.observe(max_iterations, endpoint)
     yield {"type": "error", "message": "Analysis could not be completed."}
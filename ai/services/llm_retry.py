@@ -0,0 +1,179 @@
+"""Retries and hedged requests for LLM calls, bounded per endpoint.
+
+Retryable failures (429, 5xx, timeouts, connection errors) are retried with
+full-jitter exponential backoff, honouring Retry-After. For endpoints listed
+in LLM_HEDGE_ENDPOINTS, a call still running after the endpoint's observed
+LLM_HEDGE_PERCENTILE latency gets a duplicate request, and the first
+response wins.
+
+Retries and hedges both spend from a per-endpoint budget that refills by
+LLM_RETRY_BUDGET_RATIO per call, so a degraded upstream sees at most that
+fraction of extra traffic instead of a retry storm.
+"""
+
+import asyncio
+import random
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from typing import TypeVar
+
+from loguru import logger
+
+from config import settings
+
+T = TypeVar("T")
+
+
+class EndpointPolicy:
+    """Latency history and retry/hedge budget of one endpoint."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.latencies: deque[float] = deque(maxlen=200)
+        self.tokens = float(settings.llm_retry_budget_burst)
+        self.counters = {"calls": 0, "retries": 0, "hedges": 0, "hedge_wins": 0, "budget_exhausted": 0}
+
+    def start_call(self) -> None:
+        self.counters["calls"] += 1
+        self.tokens = min(settings.llm_retry_budget_burst, self.tokens + settings.llm_retry_budget_ratio)
+
+    def spend(self) -> bool:
+        if self.tokens < 1:
+            self.counters["budget_exhausted"] += 1
+            return False
+        self.tokens -= 1
+        return True
+
+    def percentile(self, q: float) -> float | None:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def hedge_delay(self) -> float | None:
+        if self.name not in settings.llm_hedge_endpoints or len(self.latencies) < settings.llm_hedge_min_samples:
+            return None
+        return self.percentile(settings.llm_hedge_percentile)
+
+    def stats(self) -> dict:
+        p50, p99 = self.percentile(0.5), self.percentile(0.99)
+        return {
+            **self.counters,
+            "budget": round(self.tokens, 2),
+            "p50_ms": round(p50 * 1000) if p50 is not None else None,
+            "p99_ms": round(p99 * 1000) if p99 is not None else None,
+            "hedge_after_ms": round(d * 1000) if (d := self.hedge_delay()) is not None else None,
+        }
+
+
+_policies: dict[str, EndpointPolicy] = {}
+
+
+def policy(endpoint: str) -> EndpointPolicy:
+    if endpoint not in _policies:
+        _policies[endpoint] = EndpointPolicy(endpoint)
+    return _policies[endpoint]
+
+
+def is_rate_limited(error: Exception) -> bool:
+    """Whether `error` is an upstream 429.
+
+    openai is imported lazily (see llm_client.get_client); by the time an error
+    is inspected here the client, and so the module, exists.
+    """
+    from openai import RateLimitError
+
+    return isinstance(error, RateLimitError)
+
+
+def retry_after(error: Exception) -> float | None:
+    """Seconds from the error's Retry-After header, if any."""
+    from openai import APIStatusError
+
+    if not isinstance(error, APIStatusError):
+        return None
+    try:
+        return float(error.response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(error: Exception) -> bool:
+    """Timeouts, connection errors, 429 and 5xx; imports openai lazily like is_rate_limited."""
+    from openai import APIConnectionError, APIStatusError, APITimeoutError, RateLimitError
+
+    if isinstance(error, (APITimeoutError, APIConnectionError, RateLimitError, asyncio.TimeoutError)):
+        return True
+    return isinstance(error, APIStatusError) and error.status_code >= 500
+
+
+def _backoff(attempt: int, error: Exception) -> float | None:
+    """Delay before retry `attempt` (1-based), or None if the server asks us to wait too long."""
+    delay = random.uniform(0, min(settings.llm_retry_max_delay, settings.llm_retry_base_delay * 2 ** attempt))
+    wait = retry_after(error)
+    if wait is None and is_rate_limited(error):
+        wait = settings.llm_rate_limit_cooldown
+    if wait is not None:
+        if wait > settings.llm_retry_max_delay:
+            return None
+        delay = max(delay, wait)
+    return delay
+
+
+async def _hedged(endpoint: EndpointPolicy, attempt: Callable[[], Awaitable[T]]) -> T:
+    """Run `attempt`; past the hedge delay, race it against a duplicate."""
+    primary = asyncio.create_task(attempt())
+    delay = endpoint.hedge_delay()
+    if delay is None:
+        return await primary
+
+    tasks = {primary}
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if not done and endpoint.spend():
+            endpoint.counters["hedges"] += 1
+            tasks.add(asyncio.create_task(attempt()))
+        error: BaseException | None = None
+        while tasks:
+            done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is not primary:
+                        endpoint.counters["hedge_wins"] += 1
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def call(endpoint_name: str, attempt: Callable[[], Awaitable[T]], hedge: bool = True) -> T:
+    """Call `attempt` with retries, and hedging if `hedge` and enabled for the endpoint.
+
+    Pass hedge=False when a losing duplicate could not be cleaned up (e.g. an opened stream).
+    """
+    endpoint = policy(endpoint_name)
+    endpoint.start_call()
+    retries = 0
+    while True:
+        started = time.monotonic()
+        try:
+            result = await (_hedged(endpoint, attempt) if hedge else attempt())
+        except Exception as e:
+            retryable = is_retryable(e) and retries < settings.llm_max_retries
+            delay = _backoff(retries + 1, e) if retryable else None
+            if delay is None or not endpoint.spend():
+                raise
+            retries += 1
+            endpoint.counters["retries"] += 1
+            logger.warning(f"LLM call for {endpoint_name} failed ({type(e).__name__}); retry {retries} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            continue
+        endpoint.latencies.append(time.monotonic() - started)
+        return result
+
+
+def stats() -> dict:
+    return {name: endpoint.stats() for name, endpoint in _policies.items()}
@@ -0,0 +1,84 @@
+"""Per-task model / reasoning-effort / max_tokens routing for LLM calls.
+
+Routes are DEFAULT_ROUTES with LLM_ROUTES merged over them field by field, so
+overriding one task's model keeps its default reasoning effort. For agent
+iteration `i` of task `t` the most specific entry wins: "t:i", then "t", then
+"default". Fields left out fall back to the next entry, then to LLM_MODEL.
+A route's max_tokens only applies when the caller did not size the reply.
+
+Requests flagged fast, and every call while the LLM queue holds at least
+LLM_DOWNGRADE_QUEUE_DEPTH waiters, get LLM_FAST_ROUTE laid over the result.
+
+Reasoning efforts: "default" sends nothing (the model's own behaviour),
+"none" disables thinking, "low" / "medium" / "high" set its depth.
+"""
+
+from collections import Counter
+
+from config import settings
+from services import llm_scheduler
+
+# Short single-shot tasks skip reasoning; agents plan their tool calls with a little.
+DEFAULT_ROUTES: dict[str, dict[str, str | int]] = {
+    "describe": {"reasoning": "none"},
+    "describe_batch": {"reasoning": "none"},
+    "detect": {"reasoning": "none"},
+    "detect_batch": {"reasoning": "none"},
+    "pricing:0": {"reasoning": "low"},
+    "demand:0": {"reasoning": "low"},
+}
+
+# Appended to the route name of calls that got LLM_FAST_ROUTE.
+FAST_SUFFIX = "+fast"
+
+_counters = {"fast": 0, "downgraded": 0}
+_routes_used: Counter = Counter()
+
+
+def routes() -> dict[str, dict[str, str | int]]:
+    """DEFAULT_ROUTES with LLM_ROUTES merged over them, per entry and field."""
+    merged = {key: dict(fields) for key, fields in DEFAULT_ROUTES.items()}
+    for key, fields in settings.llm_routes.items():
+        merged.setdefault(key, {}).update(fields)
+    return merged
+
+
+def resolve(task: str, iteration: int = 0, fast: bool = False) -> dict:
+    """{"model", "reasoning", "max_tokens" (or None), "route"} for one LLM call."""
+    table = routes()
+    route = {"model": settings.llm_model, "reasoning": "default", "max_tokens": None}
+    name = task
+    for key in ("default", task, f"{task}:{iteration}"):
+        if key in table:
+            route.update(table[key])
+    if f"{task}:{iteration}" in table:
+        name = f"{task}:{iteration}"
+
+    if fast:
+        _counters["fast"] += 1
+    elif llm_scheduler.queue_depth() >= settings.llm_downgrade_queue_depth:
+        _counters["downgraded"] += 1
+        fast = True
+    if fast:
+        route.update(settings.llm_fast_route)
+        name += FAST_SUFFIX
+
+    _routes_used[name] += 1
+    return {**route, "route": name}
+
+
+def ran_fast(routes: list[str]) -> bool:
+    """Whether any of these route names (as resolved above) used the fast route, asked for or downgraded."""
+    return any(name.endswith(FAST_SUFFIX) for name in routes)
+
+
+def request_kwargs(route: dict) -> dict:
+    """Model and reasoning parameters for chat.completions.create."""
+    kwargs: dict = {"model": route["model"]}
+    if route["reasoning"] != "default":
+        kwargs["extra_body"] = {"reasoning": {"effort": route["reasoning"]}}
+    return kwargs
+
+
+def stats() -> dict:
+    return {**_counters, "routes": dict(_routes_used)}
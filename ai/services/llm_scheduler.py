@@ -0,0 +1,171 @@
+"""Priority scheduler in front of the shared LLM client.
+
+Every completion call takes a slot. At most LLM_MAX_CONCURRENCY calls run at
+once, and each priority class can be capped below that (LLM_CLASS_LIMITS) so
+long agent analyses cannot occupy every slot. Waiters are served highest
+priority first. A waiter that does not get a slot within its class's queue
+timeout, or that arrives while the queue is full, gets LLMBusyError. Routers
+turn that into 429/503 with Retry-After instead of piling up coroutines.
+
+After an upstream 429 the scheduler cools down: until the Retry-After passes,
+only interactive calls are admitted.
+"""
+
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from contextlib import asynccontextmanager
+
+from config import settings
+from services import metrics, tracing
+
+INTERACTIVE = "interactive"  # single describe / detect calls the add-product page waits on
+BATCH = "batch"  # describe/detect batch endpoints
+ANALYSIS = "analysis"  # pricing / demand agent loops
+
+PRIORITIES = {INTERACTIVE: 0, BATCH: 1, ANALYSIS: 2}
+
+
+class LLMBusyError(Exception):
+    """The LLM is saturated; retry after `retry_after` seconds."""
+
+    def __init__(self, message: str, status_code: int = 503, retry_after: float = 1.0):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_seconds(self) -> int:
+        """Whole seconds, as sent in the Retry-After header."""
+        return max(1, math.ceil(self.retry_after))
+
+
+_active: dict[str, int] = {name: 0 for name in PRIORITIES}
+_waiters: list[tuple[int, int, str, asyncio.Future]] = []
+_sequence = itertools.count()
+_cooldown_until = 0.0
+_call_seconds = 10.0  # moving average, used to estimate Retry-After
+_counters = {"admitted": 0, "queued": 0, "rejected": 0, "timed_out": 0, "upstream_429": 0}
+
+
+def _can_run(priority: str) -> bool:
+    limit = settings.llm_class_limits.get(priority, settings.llm_max_concurrency)
+    return sum(_active.values()) < settings.llm_max_concurrency and _active[priority] < limit
+
+
+def _waiting() -> int:
+    return sum(1 for *_, future in _waiters if not future.done())
+
+
+def _retry_after(ahead: int) -> float:
+    """Rough time until `ahead` queued calls have been served."""
+    backlog = ahead / max(1, settings.llm_max_concurrency) * _call_seconds
+    return max(backlog, _cooldown_until - time.monotonic(), 1.0)
+
+
+def _wake() -> None:
+    """Hand free slots to the highest-priority waiters that fit their class limit."""
+    skipped = []
+    while _waiters:
+        entry = heapq.heappop(_waiters)
+        _, _, priority, future = entry
+        if future.done():
+            continue
+        if _can_run(priority):
+            _active[priority] += 1
+            future.set_result(None)
+        elif sum(_active.values()) >= settings.llm_max_concurrency:
+            heapq.heappush(_waiters, entry)
+            break
+        else:
+            skipped.append(entry)  # its class is at its cap; a lower class may still fit
+    for entry in skipped:
+        heapq.heappush(_waiters, entry)
+
+
+def check_admission(priority: str) -> None:
+    """Raise LLMBusyError right away if a call of this class would be rejected (used before streaming)."""
+    waiting = _waiting()
+    if waiting >= settings.llm_max_queue:
+        _counters["rejected"] += 1
+        raise LLMBusyError("LLM queue is full", status_code=429, retry_after=_retry_after(waiting))
+    if priority != INTERACTIVE and time.monotonic() < _cooldown_until:
+        _counters["rejected"] += 1
+        raise LLMBusyError("LLM provider is rate limiting", status_code=429, retry_after=_retry_after(waiting))
+
+
+@asynccontextmanager
+async def slot(priority: str = ANALYSIS):
+    """Hold one LLM slot for the duration of a completion call."""
+    global _call_seconds
+    if not _waiters and _can_run(priority) and not (priority != INTERACTIVE and time.monotonic() < _cooldown_until):
+        _active[priority] += 1
+    else:
+        check_admission(priority)
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(_waiters, (PRIORITIES[priority], next(_sequence), priority, future))
+        _counters["queued"] += 1
+        _wake()  # capacity may be free with only abandoned waiters ahead
+        timeout = settings.llm_queue_timeouts.get(priority, settings.llm_queue_timeout)
+        try:
+            with tracing.span("llm.queue", priority=priority):
+                await asyncio.wait_for(asyncio.shield(future), timeout=timeout)
+        except asyncio.TimeoutError:
+            if not future.done():
+                future.cancel()
+                _counters["timed_out"] += 1
+                raise LLMBusyError(
+                    f"No LLM capacity within {timeout}s", status_code=503, retry_after=_retry_after(_waiting())
+                )
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                _release(priority)  # the slot was granted just as we were cancelled
+            else:
+                future.cancel()
+            raise
+    _counters["admitted"] += 1
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        _call_seconds = 0.9 * _call_seconds + 0.1 * (time.monotonic() - started)
+        _release(priority)
+
+
+def _release(priority: str) -> None:
+    _active[priority] -= 1
+    _wake()
+
+
+def note_rate_limited(retry_after: float | None) -> None:
+    """Record an upstream 429 and start the cooldown."""
+    global _cooldown_until
+    delay = retry_after if retry_after is not None else settings.llm_rate_limit_cooldown
+    _cooldown_until = max(_cooldown_until, time.monotonic() + delay)
+    _counters["upstream_429"] += 1
+
+
+def cooldown_remaining() -> float:
+    return max(0.0, _cooldown_until - time.monotonic())
+
+
+def queue_depth() -> int:
+    return _waiting()
+
+
+metrics.Gauge(
+    "llm_calls_in_flight", "LLM calls holding a scheduler slot", ("priority",),
+    collect=lambda: {(name,): count for name, count in _active.items()},
+)
+metrics.Gauge("llm_calls_queued", "LLM calls waiting for a slot", collect=lambda: {(): _waiting()})
+
+
+def stats() -> dict:
+    return {
+        **_counters,
+        "active": dict(_active),
+        "waiting": _waiting(),
+        "cooldown_seconds": round(cooldown_remaining(), 1),
+    }
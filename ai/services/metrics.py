@@ -0,0 +1,210 @@
+"""Prometheus text-format metrics, served at GET /metrics.
+
+A deliberately small implementation: recording is a dict lookup plus a
+bisect, with no locks (everything runs on the event loop thread), and all
+formatting happens at scrape time. Gauges that mirror state owned elsewhere
+(scheduler slots, ...) are read through callbacks when scraped.
+"""
+
+import bisect
+import math
+import time
+from collections.abc import Callable
+
+_registry: list["_Metric"] = []
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+ITERATION_BUCKETS = (1, 2, 3, 4, 5, 6, 8, 10)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        _registry.append(self)
+
+    def _samples(self) -> list[str]:
+        raise NotImplementedError
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", *self._samples()]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, *labels, value: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + value
+
+    def _samples(self) -> list[str]:
+        return [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in self._values.items()]
+
+
+class Gauge(_Metric):
+    """Gauge set by the caller, or read from `collect()` ({label values: value}) at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: tuple[str, ...] = (),
+        collect: Callable[[], dict[tuple, float]] | None = None,
+    ):
+        super().__init__(name, help, labelnames)
+        self._values: dict[tuple, float] = {}
+        self._collect = collect
+
+    def inc(self, *labels, value: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + value
+
+    def dec(self, *labels, value: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) - value
+
+    def value(self, *labels) -> float:
+        return self._values.get(labels, 0.0)
+
+    def _samples(self) -> list[str]:
+        values = self._collect() if self._collect else self._values
+        return [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in values.items()]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._series: dict[tuple, list[float]] = {}
+
+    def observe(self, value: float, *labels) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0.0] * (len(self.buckets) + 2)
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def time(self, *labels) -> "_Timer":
+        return _Timer(self, labels)
+
+    def _samples(self) -> list[str]:
+        lines = []
+        for labels, series in self._series.items():
+            cumulative = 0.0
+            for bound, count in zip((*self.buckets, math.inf), series):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {_number(cumulative)}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(series[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {_number(cumulative)}")
+        return lines
+
+
+class _Timer:
+    """`with histogram.time(*labels):` observes the block's duration in seconds."""
+
+    __slots__ = ("histogram", "labels", "started")
+
+    def __init__(self, histogram: Histogram, labels: tuple):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self) -> "_Timer":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.histogram.observe(time.perf_counter() - self.started, *self.labels)
+
+
+def render() -> str:
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# --- HTTP routes -----------------------------------------------------------------
+
+http_request_seconds = Histogram(
+    "http_request_duration_seconds", "Request latency by route (streams: until the last byte)",
+    ("method", "route", "status"),
+)
+http_in_flight = Gauge("http_requests_in_flight", "Requests being handled")
+
+# --- LLM ---------------------------------------------------------------------------
+
+llm_call_seconds = Histogram(
+    "llm_call_duration_seconds", "Latency of one LLM completion (streams: until the last chunk)",
+    ("endpoint", "model"),
+)
+llm_tokens = Counter("llm_tokens_total", "Tokens reported in response.usage", ("endpoint", "model", "kind"))
+llm_errors = Counter("llm_call_errors_total", "Failed LLM completion attempts", ("endpoint", "error"))
+agent_iterations = Histogram(
+    "agent_iterations", "LLM iterations per chat_with_tools request", ("endpoint",), buckets=ITERATION_BUCKETS
+)
+
+# --- Tools / scrapers ------------------------------------------------------------
+
+tool_seconds = Histogram("tool_duration_seconds", "Agent tool call latency", ("tool",))
+tool_errors = Counter("tool_errors_total", "Agent tool calls that failed or timed out", ("tool", "kind"))
+tool_in_flight = Gauge("tool_calls_in_flight", "Agent tool calls running", ("tool",))
+upstream_seconds = Histogram(
+    "scraper_upstream_duration_seconds", "Latency of scraper upstream calls", ("source", "outcome")
+)
+
+
+class ASGIMetricsMiddleware:
+    """Per-route latency and in-flight requests. Pure ASGI, so streaming bodies are not buffered."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_in_flight.dec()
+            # Label with the route template, not the raw path, to keep cardinality bounded.
+            route = getattr(scope.get("route"), "path", "unmatched")
+            http_request_seconds.observe(time.perf_counter() - started, scope["method"], route, str(status))
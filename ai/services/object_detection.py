@@ -1,11 +1,18 @@
 """Product detection and categorization using Kimi K2.5 vision."""
 
+import asyncio
 import base64
 import json
 import re
+import time
 from loguru import logger
 
-from services.llm_client import chat_with_tools
+from config import settings
+from services import category_classifier, cpu_pool
+from services.image_preprocess import preprocess_image
+from services.llm_client import LLMCallError, chat_with_tools
+from services.llm_scheduler import BATCH, INTERACTIVE
+from services.result_cache import MISS, ResultCache
 
 PRODUCT_CATEGORIES = [
     "handicraft",
@@ -30,6 +37,9 @@ PRODUCT_CATEGORIES = [
     "handloom",
 ]
 
+detect_cache = ResultCache("detect", ttl=settings.detect_cache_ttl, stale_ttl=0)
+_counters = {"bytes_received": 0, "bytes_sent": 0}
+
 SYSTEM_PROMPT = (
     "You are a product categorization expert for Rangaayan, a marketplace for rural Indian artisans.\n\n"
     "Given an image, identify the product(s) and categorize them.\n\n"
@@ -39,6 +49,16 @@ SYSTEM_PROMPT = (
     '"suggested_categories": ["..."]}'
 )
 
+BATCH_SYSTEM_PROMPT = (
+    "You are a product categorization expert for Rangaayan, a marketplace for rural Indian artisans.\n\n"
+    "You get several numbered images (Image 0, Image 1, ...), usually photos of the same listing. "
+    "For each image, identify the product(s) and categorize them.\n\n"
+    "Available categories: " + ", ".join(PRODUCT_CATEGORIES) + "\n\n"
+    "Reply as raw JSON only (no code fences), one entry per image in order:\n"
+    '{"images": [{"image": 0, "products": [{"name": "...", "category": "...", "confidence": 0.0-1.0}], '
+    '"suggested_categories": ["..."]}]}'
+)
+
 
 def _parse_response(raw: str) -> dict:
     cleaned = re.sub(r"```(?:json)?\s*", "", raw).strip().rstrip("`")
@@ -58,10 +78,45 @@ def _parse_response(raw: str) -> dict:
         return {"detections": [], "suggested_categories": ["handicraft"], "object_count": 0}
 
 
-async def detect_products(image_bytes: bytes) -> dict:
-    """Detect and categorize products in an image using LLM vision."""
-    b64 = base64.b64encode(image_bytes).decode()
-    data_url = f"data:image/jpeg;base64,{b64}"
+def _to_data_url(image_bytes: bytes, mime: str = "image/jpeg") -> str:
+    return f"data:{mime};base64,{base64.b64encode(image_bytes).decode()}"
+
+
+async def prepare_image(image_bytes: bytes) -> dict:
+    """Downsize/recompress an upload and hash it. Raises ValueError for non-images."""
+    image = await cpu_pool.run(
+        "image_preprocess",
+        preprocess_image,
+        image_bytes,
+        settings.detect_max_dimension,
+        settings.detect_jpeg_quality,
+        size=len(image_bytes),
+    )
+    _counters["bytes_received"] += len(image_bytes)
+    _counters["bytes_sent"] += len(image["data"])
+    image["original_bytes"] = len(image_bytes)
+    return image
+
+
+def _preprocess_report(image: dict) -> dict:
+    return {
+        "source_mime": image["source_mime"],
+        "original_bytes": image["original_bytes"],
+        "sent_bytes": len(image["data"]),
+        "bytes_saved": image["original_bytes"] - len(image["data"]),
+        "width": image["width"],
+        "height": image["height"],
+    }
+
+
+async def _detect_prepared(image: dict, priority: str = INTERACTIVE, raise_errors: bool = False) -> tuple[dict, str]:
+    cached, status = await detect_cache.get(image["phash"])
+    if cached is not None:
+        return cached, status
+
+    data_url = await cpu_pool.run(
+        "image_base64", _to_data_url, image["data"], image["mime"], size=len(image["data"])
+    )
 
     messages = [
         {"role": "system", "content": SYSTEM_PROMPT},
@@ -74,11 +129,187 @@ async def detect_products(image_bytes: bytes) -> dict:
         },
     ]
 
+    started = time.perf_counter()
     raw = await chat_with_tools(
         messages=messages,
         tools=None,
         max_tokens=512,
-        reasoning=False,
+        priority=priority,
+        endpoint="detect" if priority == INTERACTIVE else "detect_batch",
+        raise_errors=raise_errors,
     )
 
-    return _parse_response(raw)
+    result = _parse_response(raw)
+    if result["object_count"]:
+        await detect_cache.set(image["phash"], result)
+        await _record_categories(result, (time.perf_counter() - started) * 1000)
+    return result, status
+
+
+async def _record_categories(result: dict, llm_ms: float | None = None) -> None:
+    """Feed the vision model's name -> category pairs to the local classifier."""
+    for detection in result["detections"]:
+        await category_classifier.record("detect", str(detection.get("name", "")), detection.get("category"), llm_ms)
+
+
+async def detect_products(image_bytes: bytes, product_name: str | None = None) -> dict:
+    """Detect and categorize products in an image using LLM vision.
+
+    The upload is downsized before it is sent, and results are cached by the
+    image's perceptual hash so re-uploads of the same photo skip the LLM. A
+    seller-typed `product_name` does not replace the vision call; when the
+    local classifier is confident about it, its category is returned alongside
+    the detections as `name_category`.
+    """
+    image = await prepare_image(image_bytes)
+    result, status = await _detect_prepared(image)
+    response = {**result, "cache": status, "preprocess": _preprocess_report(image)}
+    if product_name:
+        category, confidence = category_classifier.classify("detect", product_name)
+        if category:
+            response["name_category"] = {"category": category, "confidence": round(confidence, 3)}
+    return response
+
+
+def _parse_group_response(raw: str, count: int) -> dict[int, dict]:
+    """Per-image results from a multi-image reply, keyed by image number."""
+    cleaned = re.sub(r"```(?:json)?\s*", "", raw).strip().rstrip("`")
+    try:
+        entries = json.loads(cleaned).get("images", [])
+    except (json.JSONDecodeError, AttributeError):
+        logger.warning(f"Failed to parse batch detection response: {raw[:200]}")
+        return {}
+    results = {}
+    for position, entry in enumerate(entries):
+        if not isinstance(entry, dict):
+            continue
+        number = entry.get("image", position)
+        if isinstance(number, int) and 0 <= number < count:
+            results[number] = _parse_response(json.dumps(entry))
+    return results
+
+
+async def _detect_group(images: list[dict], slots: asyncio.Semaphore) -> tuple[list[dict], int]:
+    """One vision request for several images; images missing from the reply are retried alone.
+
+    Every vision request, retries included, holds one of `slots`; the retries run
+    concurrently. Images whose request failed get an {"error"} result and are not
+    retried. Returns the per-image results and the number of vision requests made.
+    """
+    content: list[dict] = []
+    for number, image in enumerate(images):
+        data_url = await cpu_pool.run(
+            "image_base64", _to_data_url, image["data"], image["mime"], size=len(image["data"])
+        )
+        content.append({"type": "text", "text": f"Image {number}:"})
+        content.append({"type": "image_url", "image_url": {"url": data_url}})
+    content.append({"type": "text", "text": "What product(s) are in each image? Categorize them."})
+
+    try:
+        async with slots:
+            raw = await chat_with_tools(
+                messages=[
+                    {"role": "system", "content": BATCH_SYSTEM_PROMPT},
+                    {"role": "user", "content": content},
+                ],
+                tools=None,
+                max_tokens=256 * len(images) + 128,
+                priority=BATCH,
+                endpoint="detect_batch",
+                raise_errors=True,
+            )
+    except LLMCallError as e:
+        return [{"error": str(e)} for _ in images], 1
+    parsed = _parse_group_response(raw, len(images))
+
+    async def retry(image: dict) -> tuple[dict, str]:
+        try:
+            async with slots:
+                return await _detect_prepared(image, priority=BATCH, raise_errors=True)
+        except LLMCallError as e:
+            return {"error": str(e)}, MISS
+
+    missing = [number for number in range(len(images)) if number not in parsed]
+    retried = dict(zip(missing, await asyncio.gather(*(retry(images[number]) for number in missing))))
+
+    results = []
+    for number, image in enumerate(images):
+        if number in retried:
+            result, _ = retried[number]
+        else:
+            result = parsed[number]
+            if result["object_count"]:
+                await detect_cache.set(image["phash"], result)
+                await _record_categories(result)
+        results.append(result)
+    requests = 1 + sum(1 for _, status in retried.values() if status == MISS)
+    return results, requests
+
+
+def _consolidate_categories(results: list[dict]) -> list[str]:
+    """Rank categories across images by summed detection confidence."""
+    scores: dict[str, float] = {}
+    for result in results:
+        for detection in result.get("detections", []):
+            category = detection.get("category")
+            if category:
+                scores[category] = scores.get(category, 0.0) + float(detection.get("confidence") or 0.5)
+        for category in result.get("suggested_categories", []):
+            scores[category] = scores.get(category, 0.0) + 0.1
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+async def detect_products_batch(images: list[bytes]) -> dict:
+    """Detect products in several photos of a listing with few vision requests.
+
+    Uncached images are grouped DETECT_BATCH_GROUP_SIZE per request and groups
+    run concurrently (DETECT_BATCH_CONCURRENCY). Identical photos in one batch
+    are sent once. Images that cannot be decoded, or whose vision request
+    failed, get an "error" entry.
+    """
+    prepared = await asyncio.gather(*(prepare_image(data) for data in images), return_exceptions=True)
+    results: list[dict | None] = [None] * len(images)
+    pending: dict[str, list[int]] = {}
+
+    for index, image in enumerate(prepared):
+        if isinstance(image, ValueError):
+            results[index] = {"index": index, "error": str(image)}
+            continue
+        if isinstance(image, BaseException):
+            raise image
+        cached, status = await detect_cache.get(image["phash"])
+        if cached is not None:
+            results[index] = {"index": index, **cached, "cache": status, "preprocess": _preprocess_report(image)}
+        else:
+            pending.setdefault(image["phash"], []).append(index)
+
+    unique = [indices[0] for indices in pending.values()]
+    size = settings.detect_batch_group_size
+    groups = [unique[i:i + size] for i in range(0, len(unique), size)]
+    slots = asyncio.Semaphore(settings.detect_batch_concurrency)
+    outcomes = await asyncio.gather(*(_detect_group([prepared[index] for index in group], slots) for group in groups))
+
+    for group, (group_results, _) in zip(groups, outcomes):
+        for index, result in zip(group, group_results):
+            for duplicate in pending[prepared[index]["phash"]]:
+                if "error" in result:
+                    results[duplicate] = {"index": duplicate, **result}
+                    continue
+                results[duplicate] = {
+                    "index": duplicate,
+                    **result,
+                    "cache": MISS,
+                    "preprocess": _preprocess_report(prepared[duplicate]),
+                }
+
+    detected = [result for result in results if "error" not in result]
+    return {
+        "images": results,
+        "suggested_categories": _consolidate_categories(detected),
+        "object_count": sum(result["object_count"] for result in detected),
+        "vision_requests": sum(requests for _, requests in outcomes),
+    }
+
+
+def stats() -> dict:
+    return {**_counters, "bytes_saved": _counters["bytes_received"] - _counters["bytes_sent"]}
@@ -0,0 +1,68 @@
+"""Pay the first-use cost of lazily imported dependencies before traffic does.
+
+openai, ddgs, selectolax and fake_useragent are imported where they are first
+used, so a new worker imports the app and starts serving quickly. With
+PREWARM enabled the lifespan runs these steps in a background thread right
+after startup; a request that needs a module before then imports it itself.
+"""
+
+import asyncio
+import time
+
+from loguru import logger
+
+from config import settings
+
+_timings: dict[str, float] = {}
+_task: asyncio.Task | None = None
+
+
+def _openai() -> None:
+    from services import llm_client
+
+    llm_client.get_client()
+
+
+def _search() -> None:
+    if settings.search_provider == "ddgs":
+        import ddgs  # noqa: F401
+
+
+def _html() -> None:
+    import selectolax.parser  # noqa: F401
+
+
+def _user_agent() -> None:
+    from scrapers import web_search
+
+    web_search.random_user_agent()
+
+
+STEPS = {"openai": _openai, "ddgs": _search, "selectolax": _html, "user_agent": _user_agent}
+
+
+def _run() -> None:
+    for name, step in STEPS.items():
+        started = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            logger.warning(f"Prewarm step {name} failed: {e}")
+            continue
+        _timings[name] = round((time.perf_counter() - started) * 1000, 1)
+    logger.info(f"Prewarmed in {sum(_timings.values()):.0f} ms: {_timings}")
+
+
+def start() -> None:
+    """Start prewarming in the background (no-op when PREWARM is off)."""
+    global _task
+    if settings.prewarm and _task is None:
+        _task = asyncio.create_task(asyncio.to_thread(_run))
+
+
+def done() -> bool:
+    return _task is not None and _task.done()
+
+
+def stats() -> dict:
+    return {"enabled": settings.prewarm, "done": done(), "step_ms": dict(_timings)}
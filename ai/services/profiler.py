@@ -0,0 +1,83 @@
+"""Sampling profiler for single requests ("X-Profile: 1", see services/tracing.py).
+
+A daemon thread samples the event loop thread's stack every PROFILE_INTERVAL
+seconds and counts identical stacks. Profiles are kept in memory (the last
+PROFILE_KEEP) and served at GET /debug/profiles/{id} in collapsed-stack format
+("frame;frame;frame count" per line), which flamegraph.pl and speedscope read.
+
+The loop is shared, so samples include other requests running at the same
+time; idle time shows up as the loop's selector wait. One profile runs at a
+time; a request asking while another is being profiled is served unprofiled.
+"""
+
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from loguru import logger
+
+from config import settings
+
+_active: "Profile | None" = None
+_profiles: OrderedDict[str, "Profile"] = OrderedDict()
+_counters = {"started": 0, "skipped_busy": 0}
+
+
+class Profile:
+    def __init__(self, profile_id: str):
+        self.id = profile_id
+        self.samples: Counter[str] = Counter()
+        self.seconds = 0.0
+        self._thread_id = threading.get_ident()  # start() runs on the event loop thread
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"profiler-{profile_id}", daemon=True)
+
+    def _run(self) -> None:
+        started = time.monotonic()
+        deadline = started + settings.profile_max_seconds
+        while not self._stop.wait(settings.profile_interval) and time.monotonic() < deadline:
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+        self.seconds = time.monotonic() - started
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+def start(profile_id: str) -> Profile | None:
+    """Start profiling, or None if profiling is disabled or already running."""
+    global _active
+    if not settings.profile_enabled:
+        return None
+    if _active is not None:
+        _counters["skipped_busy"] += 1
+        return None
+    _active = Profile(profile_id)
+    _active._thread.start()
+    _counters["started"] += 1
+    return _active
+
+
+def stop(profile: Profile) -> None:
+    global _active
+    profile._stop.set()
+    profile._thread.join()
+    _active = None
+    _profiles[profile.id] = profile
+    while len(_profiles) > settings.profile_keep:
+        _profiles.popitem(last=False)
+    logger.info(f"Profile {profile.id}: {sum(profile.samples.values())} samples over {profile.seconds:.1f}s")
+
+
+def get(profile_id: str) -> Profile | None:
+    return _profiles.get(profile_id)
+
+
+def stats() -> dict:
+    return {**_counters, "running": _active is not None, "kept": len(_profiles)}
@@ -0,0 +1,225 @@
+"""Two-tier cache for finished agent analyses (pricing, demand).
+
+An in-memory LRU sits in front of a shared SQLite file so results survive
+restarts and are shared between workers. Entries older than `ttl` are served
+as "stale" for a further `stale_ttl` seconds while one background refresh
+recomputes them (stale-while-revalidate).
+"""
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import time
+from collections import OrderedDict
+from collections.abc import AsyncGenerator, Awaitable, Callable
+from functools import partial
+
+from loguru import logger
+
+from config import settings
+from services import db
+
+HIT, STALE, MISS = "hit", "stale", "miss"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, created REAL NOT NULL,
+    PRIMARY KEY (namespace, key));
+"""
+_caches: dict[str, "ResultCache"] = {}
+
+
+def _connect() -> sqlite3.Connection:
+    return db.connect(_SCHEMA)
+
+
+async def open_db() -> None:
+    """Open the SQLite file at startup (once per worker) instead of on the first request."""
+    if settings.cache_enabled:
+        await asyncio.to_thread(_connect)
+
+
+def _db_get(namespace: str, key: str) -> tuple[dict, float] | None:
+    with db.lock:
+        row = _connect().execute(
+            "SELECT value, created FROM results WHERE namespace = ? AND key = ?", (namespace, key)
+        ).fetchone()
+    return (json.loads(row[0]), row[1]) if row else None
+
+
+def _db_set(namespace: str, key: str, value: dict, created: float, max_age: float) -> None:
+    with db.lock:
+        conn = _connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO results (namespace, key, value, created) VALUES (?, ?, ?, ?)",
+            (namespace, key, json.dumps(value), created),
+        )
+        conn.execute("DELETE FROM results WHERE namespace = ? AND created < ?", (namespace, created - max_age))
+        conn.commit()
+
+
+def make_key(**fields) -> str:
+    """Stable key from request fields: case, whitespace and None/'' differences are ignored.
+
+    Only None and '' are treated as missing; 0 and False are values of their own.
+    """
+    normalized = {}
+    for name, value in sorted(fields.items()):
+        if isinstance(value, str):
+            value = " ".join(value.lower().split())
+        elif isinstance(value, float):
+            value = round(value, 2)
+        normalized[name] = "" if value is None else value
+    return hashlib.sha256(json.dumps(normalized, sort_keys=True).encode()).hexdigest()
+
+
+def is_complete(result: dict, header_parser: Callable[[str], dict | None]) -> bool:
+    """Only cache full analyses that start with the required header line.
+
+    Fast-route answers (asked for, or downgraded under load) are served but never
+    cached in place of full analyses.
+    """
+    if result.get("fast"):
+        return False
+    return header_parser(result["analysis"].strip().split("\n", 1)[0]) is not None
+
+
+def cacheable(header_parser: Callable[[str], dict | None]) -> Callable[[dict], bool]:
+    return partial(is_complete, header_parser=header_parser)
+
+
+class ResultCache:
+    def __init__(self, namespace: str, ttl: float, stale_ttl: float | None = None, max_entries: int | None = None):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.stale_ttl = settings.cache_stale_ttl if stale_ttl is None else stale_ttl
+        self.max_entries = max_entries or settings.cache_memory_entries
+        self._memory: OrderedDict[str, tuple[dict, float]] = OrderedDict()
+        self._refreshing: dict[str, asyncio.Task] = {}
+        self.counters = {HIT: 0, STALE: 0, MISS: 0, "refreshes": 0}
+        _caches[namespace] = self
+
+    def _remember(self, key: str, value: dict, created: float) -> None:
+        self._memory[key] = (value, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    async def get(self, key: str) -> tuple[dict | None, str]:
+        """Look up memory, then disk. Returns (value, HIT | STALE | MISS)."""
+        if not settings.cache_enabled:
+            return None, MISS
+        entry = self._memory.get(key)
+        if entry is not None:
+            self._memory.move_to_end(key)
+        else:
+            try:
+                entry = await asyncio.to_thread(_db_get, self.namespace, key)
+            except sqlite3.Error as e:
+                logger.warning(f"Result cache read failed: {e}")
+                entry = None
+            if entry is not None:
+                self._remember(key, *entry)
+
+        if entry is not None:
+            value, created = entry
+            age = time.time() - created
+            if age < self.ttl:
+                self.counters[HIT] += 1
+                return value, HIT
+            if age < self.ttl + self.stale_ttl:
+                self.counters[STALE] += 1
+                return value, STALE
+        self.counters[MISS] += 1
+        return None, MISS
+
+    async def set(self, key: str, value: dict) -> None:
+        if not settings.cache_enabled:
+            return
+        created = time.time()
+        self._remember(key, value, created)
+        try:
+            await asyncio.to_thread(_db_set, self.namespace, key, value, created, self.ttl + self.stale_ttl)
+        except sqlite3.Error as e:
+            logger.warning(f"Result cache write failed: {e}")
+
+    async def _compute_and_store(self, key: str, compute: Callable[[], Awaitable[dict]], cacheable: Callable[[dict], bool]) -> dict:
+        value = await compute()
+        if cacheable(value):
+            await self.set(key, value)
+        return value
+
+    def refresh(self, key: str, compute: Callable[[], Awaitable[dict]], cacheable: Callable[[dict], bool]) -> None:
+        """Recompute `key` in the background unless a refresh is already running."""
+        if key in self._refreshing:
+            return
+        self.counters["refreshes"] += 1
+        task = asyncio.create_task(self._compute_and_store(key, compute, cacheable))
+        self._refreshing[key] = task
+
+        def _done(t: asyncio.Task) -> None:
+            self._refreshing.pop(key, None)
+            if not t.cancelled() and t.exception() is not None:
+                logger.warning(f"Background refresh of {self.namespace} entry failed: {t.exception()}")
+
+        task.add_done_callback(_done)
+
+    async def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[dict]],
+        cacheable: Callable[[dict], bool],
+        refresh: Callable[[], Awaitable[dict]] | None = None,
+    ) -> tuple[dict, str]:
+        """Cached value, or `compute` on a miss. A stale entry is served while
+        `refresh` (default `compute`) recomputes it in the background."""
+        value, status = await self.get(key)
+        if status == HIT:
+            return value, status
+        if status == STALE:
+            self.refresh(key, refresh or compute, cacheable)
+            return value, status
+        return await self._compute_and_store(key, compute, cacheable), MISS
+
+    async def stream(
+        self,
+        key: str,
+        events: Callable[[], AsyncGenerator[dict, None]],
+        compute: Callable[[], Awaitable[dict]],
+        cacheable: Callable[[dict], bool],
+        to_value: Callable[[str, bool], dict],
+        header_parser: Callable[[str], dict | None] | None = None,
+    ) -> AsyncGenerator[dict, None]:
+        """Streaming counterpart of get_or_compute.
+
+        A cached analysis is replayed as cache/header/delta/result events; on a
+        miss the live stream is forwarded and its "result" (content, fast) stored
+        via `to_value`. `compute` only refreshes stale entries in the background.
+        """
+        value, status = await self.get(key)
+        yield {"type": "cache", "status": status}
+        if value is not None:
+            if status == STALE:
+                self.refresh(key, compute, cacheable)
+            analysis = value.get("analysis", "")
+            header = header_parser(analysis.strip().split("\n", 1)[0]) if header_parser else None
+            if header:
+                yield {"type": "header", **header}
+            yield {"type": "delta", "content": analysis, "iteration": 0}
+            yield {"type": "result", "content": analysis}
+            return
+
+        async for event in events():
+            if event["type"] == "result":
+                value = to_value(event["content"], event.get("fast", False))
+                if cacheable(value):
+                    await self.set(key, value)
+            yield event
+
+
+def stats() -> dict:
+    return {
+        name: {**cache.counters, "memory_entries": len(cache._memory)}
+        for name, cache in _caches.items()
+    }
@@ -0,0 +1,154 @@
+"""Per-request spans: where the time of one request went.
+
+TracingMiddleware opens a Trace per HTTP request; code on the request path
+marks sections with `with tracing.span("tool:web_search"):`. Tasks created
+inside a span inherit it as their parent (contextvars), so concurrent tool
+calls nest under the agent iteration that started them. Outside a request
+`span()` is a no-op.
+
+Finished traces slower than TRACE_LOG_MIN_SECONDS are logged as one JSON
+line. Stream endpoints sent "X-Trace-Timing: 1" end with a "timing" event
+carrying the same summary, and "X-Profile: 1" runs the sampling profiler
+(services/profiler.py) for the request.
+"""
+
+import json
+import time
+import uuid
+from contextvars import ContextVar
+
+from loguru import logger
+
+from config import settings
+from services import profiler
+
+_trace: ContextVar["Trace | None"] = ContextVar("trace", default=None)
+_parent: ContextVar[int | None] = ContextVar("trace_parent", default=None)
+
+
+class Trace:
+    def __init__(self, name: str, timing_event: bool = False):
+        self.id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.timing_event = timing_event
+        self.started = time.perf_counter()
+        self.spans: list[dict] = []
+
+    def summary(self) -> dict:
+        """Spans in start order plus summed milliseconds per span name.
+
+        Concurrent spans (parallel tool calls) overlap, so totals can exceed total_ms.
+        """
+        totals: dict[str, float] = {}
+        for span in self.spans:
+            if span["ms"] is not None:
+                totals[span["name"]] = round(totals.get(span["name"], 0.0) + span["ms"], 1)
+        return {
+            "trace_id": self.id,
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 1),
+            "totals_ms": totals,
+            "spans": self.spans,
+        }
+
+
+class Span:
+    """Context manager returned by span()."""
+
+    __slots__ = ("name", "attrs", "trace", "record", "previous")
+
+    def __init__(self, name: str, **attrs):
+        self.name = name
+        self.attrs = attrs
+        self.trace = None
+
+    def __enter__(self) -> "Span":
+        self.trace = _trace.get()
+        if self.trace is None:
+            return self
+        self.record = {
+            "id": len(self.trace.spans),
+            "parent": _parent.get(),
+            "name": self.name,
+            "start_ms": round((time.perf_counter() - self.trace.started) * 1000, 1),
+            "ms": None,
+            **self.attrs,
+        }
+        self.trace.spans.append(self.record)
+        self.previous = _parent.get()
+        _parent.set(self.record["id"])
+        return self
+
+    def set(self, **attrs) -> None:
+        """Attach attributes known only inside the block (model, status, ...)."""
+        if self.trace is not None:
+            self.record.update(attrs)
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if self.trace is None:
+            return
+        elapsed = time.perf_counter() - self.trace.started
+        self.record["ms"] = round(elapsed * 1000 - self.record["start_ms"], 1)
+        if exc_type is not None:
+            self.record["error"] = exc_type.__name__
+        # set() rather than reset(token): async generators may be closed from another context
+        _parent.set(self.previous)
+
+
+def span(name: str, **attrs) -> Span:
+    """`with span(name, **attrs):` records the block as a child of the enclosing span."""
+    return Span(name, **attrs)
+
+
+def current() -> Trace | None:
+    return _trace.get()
+
+
+def timing_event() -> dict | None:
+    """Final "timing" SSE event, if the client asked for one with X-Trace-Timing."""
+    trace = _trace.get()
+    if trace is None or not trace.timing_event:
+        return None
+    return {"type": "timing", **trace.summary()}
+
+
+def _log(trace: Trace, status: int) -> None:
+    summary = trace.summary()
+    if not trace.spans or summary["total_ms"] < settings.trace_log_min_seconds * 1000:
+        return
+    logger.info(f"trace {trace.name} {status} {json.dumps(summary)}")
+
+
+class TracingMiddleware:
+    """Open a Trace per request; X-Trace-Id (and X-Profile-Id) come back as response headers."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.trace_enabled:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        trace = Trace(f"{scope['method']} {scope['path']}", timing_event=headers.get(b"x-trace-timing") == b"1")
+        profile = profiler.start(trace.id) if headers.get(b"x-profile") == b"1" else None
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                extra = [(b"x-trace-id", trace.id.encode())]
+                if profile is not None:
+                    extra.append((b"x-profile-id", profile.id.encode()))
+                message = {**message, "headers": [*message.get("headers", []), *extra]}
+            await send(message)
+
+        token = _trace.set(trace)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _trace.reset(token)
+            if profile is not None:
+                profiler.stop(profile)
+            _log(trace, status)
@@ -0,0 +1,85 @@
+"""Cassette recording of scraper traffic."""
+
+import gzip
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from config import settings
+from scrapers import http_client
+from services import cassette, db
+from scrapers.web_search import fetch_page_content
+
+PAGE = "<html><body><p>Handwoven jute bags from Bengal, 250 rupees each.</p></body></html>"
+
+
+class _GzipPage(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/moved":
+            # Redirect to another host name for the same server.
+            self.send_response(302)
+            self.send_header("Location", f"http://localhost:{self.server.server_port}/bags")
+            self.end_headers()
+            return
+        body = gzip.compress(PAGE.encode())
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def gzip_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _GzipPage)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def record_to(tmp_path, monkeypatch):
+    path = tmp_path / "cassette.jsonl"
+    monkeypatch.setattr(settings, "cassette_mode", "record")
+    monkeypatch.setattr(settings, "cassette_path", str(path))
+    monkeypatch.setattr(settings, "cache_db_path", str(tmp_path / "cache.sqlite3"))
+    return path
+
+
+@pytest.mark.asyncio
+async def test_record_gzip_page(gzip_server, record_to):
+    try:
+        text = await fetch_page_content(f"{gzip_server}/bags")
+    finally:
+        await http_client.close()
+        db.close()
+
+    assert "Handwoven jute bags" in text
+    [interaction] = [json.loads(line) for line in record_to.read_text().splitlines()]
+    assert interaction["request"]["url"] == f"{gzip_server}/bags"
+    assert interaction["response"]["text"] == PAGE
+
+
+@pytest.mark.asyncio
+async def test_redirected_page_replays_under_requested_url(gzip_server, record_to, monkeypatch):
+    try:
+        await fetch_page_content(f"{gzip_server}/moved")
+    finally:
+        await http_client.close()
+        db.close()
+
+    monkeypatch.setattr(settings, "cassette_mode", "replay")
+    monkeypatch.setattr(settings, "cassette_time_scale", 0.0)
+    cassette.load()
+    async with http_client.stream(f"{gzip_server}/moved") as resp:
+        body = await resp.aread()
+
+    assert body.decode() == PAGE
+    assert cassette.stats()["replayed_exact"] == 1
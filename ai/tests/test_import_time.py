@@ -0,0 +1,8 @@
+"""Startup budget: `import main` stays fast and leaves heavy dependencies for later."""
+
+from benchmarks import import_time
+
+
+def test_import_main_within_budget():
+    _, failures = import_time.check()
+    assert not failures, "; ".join(failures)
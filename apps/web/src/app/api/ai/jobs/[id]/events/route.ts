@@ -0,0 +1,30 @@
+import { NextRequest, NextResponse } from "next/server";
+
+const AI_URL = process.env.AI_SERVICE_URL || "http://localhost:8000";
+
+// Job events as SSE; a reconnect with Last-Event-ID resumes after that event
+export async function GET(
+  req: NextRequest,
+  { params }: { params: Promise<{ id: string }> },
+) {
+  const { id } = await params;
+  const lastEventId = req.headers.get("last-event-id");
+
+  const res = await fetch(`${AI_URL}/api/jobs/${encodeURIComponent(id)}/events`, {
+    headers: lastEventId ? { "Last-Event-ID": lastEventId } : {},
+    signal: req.signal,
+  });
+
+  if (!res.ok || !res.body) {
+    const data = await res.json().catch(() => ({ error: "AI service unavailable" }));
+    return NextResponse.json(data, { status: res.status });
+  }
+
+  return new Response(res.body, {
+    headers: {
+      "Content-Type": "text/event-stream",
+      "Cache-Control": "no-cache",
+      Connection: "keep-alive",
+    },
+  });
+}
@@ -0,0 +1,13 @@
+import { NextResponse } from "next/server";
+
+const AI_URL = process.env.AI_SERVICE_URL || "http://localhost:8000";
+
+export async function GET(
+  _request: Request,
+  { params }: { params: Promise<{ id: string }> },
+) {
+  const { id } = await params;
+  const res = await fetch(`${AI_URL}/api/jobs/${encodeURIComponent(id)}`);
+  const data = await res.json();
+  return NextResponse.json(data, { status: res.status });
+}
@@ -0,0 +1,26 @@
+import { NextRequest, NextResponse } from "next/server";
+
+const AI_URL = process.env.AI_SERVICE_URL || "http://localhost:8000";
+const KINDS = ["pricing", "demand"];
+
+// Submit a background analysis: { kind: "pricing" | "demand", ...request fields }
+export async function POST(req: NextRequest) {
+  const { kind, ...body } = await req.json();
+  if (!KINDS.includes(kind)) {
+    return NextResponse.json({ error: "Unknown job kind" }, { status: 400 });
+  }
+
+  const res = await fetch(`${AI_URL}/api/jobs/${kind}`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify(body),
+  });
+
+  // A full job queue answers 503 with Retry-After; pass it on so clients back off.
+  const data = await res.json();
+  const retryAfter = res.headers.get("retry-after");
+  return NextResponse.json(data, {
+    status: res.status,
+    headers: retryAfter ? { "Retry-After": retryAfter } : undefined,
+  });
+}